@@ -1,18 +1,94 @@
 import json
+import os
+import random
+import re
+import sqlite3
+import subprocess
+import sys
 import time
+import tracemalloc
+import urllib.error
+import urllib.request
+from contextlib import nullcontext
 from dataclasses import replace
+from datetime import date, datetime, timezone
 from typing import Dict, List
 from unittest import mock
 
 import pytest
 
 from scripts.wigg_reddit_seed import (
+    BulkModerator,
     CandidateMoment,
+    CrawlStats,
     DatabaseDiscovery,
     DiscoveryResult,
+    Document,
+    SupabaseMetaFetcher,
+    refresh_threads,
+    PayloadExport,
+    RequestBudget,
+    Ruleset,
+    RulesetEvaluator,
+    ScanLimits,
+    DEFAULT_RULESET,
+    ModerationRule,
+    CANDIDATE_FIELDS,
+    JsonCodec,
+    ScoreRefresher,
+    SubmissionTriage,
     SupabaseWriter,
+    TableDiff,
+    TopKRetainer,
+    TriageDecision,
+    TriagePolicy,
+    UpsertResult,
+    YieldScheduler,
+    crawl_unit,
     decode_supabase_role,
+    index_submission,
+    install_codec,
+    write_index_migration,
+    load_ruleset,
+    make_codec,
+    make_reddit,
+    default_evaluator,
+    plan_work_units,
+    search_time_filter,
+    normalize_show_title,
+    refreshed_confidence,
+    ruleset_from_config,
+    run_queue_worker,
+    snippet,
+    triage_submission,
 )
+from scripts.wigg_seed_profiling import StageProfiler, install_profiler
+from scripts.wigg_seed_storage import (
+    CountHistogram,
+    DumpIndex,
+    CheckpointStore,
+    PayloadHashIndex,
+    SQLiteWorkQueue,
+    StreamCheckpoint,
+    TableMirror,
+    TitleAggregateStore,
+    TitleAliasStore,
+    WorkUnit,
+    YieldStore,
+    canonical_json,
+    payload_digest,
+    coerce_to_column,
+    title_core,
+)
+from scripts.wigg_seed_streams import CandidateBuffer, StreamDaemon, reprocess_dumps
+from scripts.benchmarks.bench_regex import PATHOLOGICAL, fuzz_document
+from scripts.check_reddit_auth import plan_capacity, sample_reddit, sample_supabase
+from scripts.query_mirror import main as query_mirror_main, run_query, stale_edits_note
+from scripts.benchmarks.bench_startup import HEAVY_MODULES, REPO_ROOT, parse_importtime
+from scripts.benchmarks.synthetic_reddit import CorpusConfig, SyntheticCorpus
+from scripts.standins import postgrest
+from scripts.standins.fake_supabase import FakeSupabaseClient
+from scripts.standins.reddit_api import FaultConfig, RedditCorpus, RedditStandIn
 
 
 class StubFetcher:
@@ -35,89 +111,6 @@ class StubFetcher:
         return self._rls_map
 
 
-class FakeSupabaseError(Exception):
-    def __init__(self, status_code: int, message: str = ""):
-        super().__init__(message or f"status {status_code}")
-        self.status_code = status_code
-
-
-class FakeSupabaseClient:
-    def __init__(self, on_conflict: List[str]):
-        self.storage: Dict[str, Dict] = {}
-        self.on_conflict = on_conflict
-        self.failures_before_success = 0
-        self.upsert_attempts = 0
-        self.count_calls = 0
-
-    def table(self, name: str):
-        return FakeTable(self, name)
-
-    def row_count(self, table: str) -> int:
-        table_bucket = self.storage.get(table, {})
-        return len(table_bucket)
-
-
-class FakeTable:
-    def __init__(self, client: FakeSupabaseClient, table: str):
-        self.client = client
-        self.table = table
-
-    def select(self, *_args, **_kwargs):
-        self.client.count_calls += 1
-        return FakeSelectOp(self.client, self.table)
-
-    def upsert(self, payloads, on_conflict: str):
-        return FakeUpsertOp(self.client, self.table, payloads, on_conflict)
-
-
-class FakeSelectOp:
-    def __init__(self, client: FakeSupabaseClient, table: str):
-        self.client = client
-        self.table = table
-
-    def limit(self, _value):
-        return self
-
-    def execute(self):
-        count = self.client.row_count(self.table)
-        return FakeResponse([], count)
-
-
-class FakeUpsertOp:
-    def __init__(self, client: FakeSupabaseClient, table: str, payloads, on_conflict: str):
-        self.client = client
-        self.table = table
-        self.payloads = payloads
-        self.on_conflict = [c.strip() for c in on_conflict.split(',')]
-
-    def execute(self):
-        self.client.upsert_attempts += 1
-        if self.client.failures_before_success > 0:
-            self.client.failures_before_success -= 1
-            raise FakeSupabaseError(429)
-
-        table_bucket = self.client.storage.setdefault(self.table, {})
-        inserted = 0
-        updated = 0
-        for payload in self.payloads:
-            key = tuple(payload.get(col) for col in self.on_conflict)
-            if key in table_bucket:
-                table_bucket[key].update(payload)
-                updated += 1
-            else:
-                table_bucket[key] = dict(payload)
-                inserted += 1
-        return FakeResponse(self.payloads, len(table_bucket), inserted=inserted, updated=updated)
-
-
-class FakeResponse:
-    def __init__(self, data, count, inserted=0, updated=0):
-        self.data = data
-        self.count = count
-        self.inserted = inserted
-        self.updated = updated
-
-
 class ListLogger:
     def __init__(self):
         self.messages: List[str] = []
@@ -146,6 +139,100 @@ class ListLogger:
         return "\n".join(self.messages)
 
 
+class FakeComments:
+    def __init__(self, comments):
+        self._comments = comments
+        self.replace_more_calls = 0
+
+    def replace_more(self, limit=None):
+        self.replace_more_calls += 1
+        return []
+
+    def list(self):
+        return list(self._comments)
+
+
+class Comment:
+    def __init__(self, id, body, score=1, created_utc=1700000000, subreddit="television", submission=None):
+        self.id = id
+        self.body = body
+        self.score = score
+        self.created_utc = created_utc
+        self.subreddit = subreddit
+        self.permalink = f"/r/{subreddit}/comments/x/{id}"
+        self.submission = submission
+        self.link_id = f"t3_{submission.id}" if submission is not None else "t3_x"
+
+
+class Submission:
+    def __init__(self, id, title, selftext="", comments=(), score=5, created_utc=1700000000, num_comments=None, subreddit="television"):
+        self.id = id
+        self.title = title
+        self.selftext = selftext
+        self.score = score
+        self.created_utc = created_utc
+        self.subreddit = subreddit
+        self.permalink = f"/r/{subreddit}/comments/{id}"
+        self.comments = FakeComments(list(comments))
+        self.num_comments = len(self.comments.list()) if num_comments is None else num_comments
+
+
+class FakeStream:
+    def __init__(self, reddit):
+        self.reddit = reddit
+
+    def submissions(self, pause_after=None, skip_existing=False):
+        return self._generate("submissions")
+
+    def comments(self, pause_after=None, skip_existing=False):
+        return self._generate("comments")
+
+    def _generate(self, kind):
+        for item in self.reddit.stream_items.get(kind, []):
+            yield item
+        while True:
+            yield None
+
+
+class FakeSubreddit:
+    def __init__(self, reddit, name):
+        self.reddit = reddit
+        self.name = name
+        self.stream = FakeStream(reddit)
+
+    def new(self, limit=None):
+        return iter(list(reversed(self.reddit.stream_items.get("submissions", [])))[:limit])
+
+    def comments(self, limit=None):
+        return iter(list(reversed(self.reddit.stream_items.get("comments", [])))[:limit])
+
+    def search(self, query, sort="new", limit=None, time_filter="all"):
+        self.reddit.search_calls.append((self.name, query, limit, time_filter))
+        return iter(self.reddit.listings.get((self.name, query), [])[:limit])
+
+
+class FakeThing:
+    def __init__(self, fullname, score):
+        self.fullname = fullname
+        self.score = score
+
+
+class FakeReddit:
+    def __init__(self, listings=None, scores=None):
+        self.listings = listings or {}
+        self.scores = scores or {}
+        self.search_calls = []
+        self.info_calls = []
+        self.stream_items = {}
+
+    def subreddit(self, name):
+        return FakeSubreddit(self, name)
+
+    def info(self, fullnames=None):
+        self.info_calls.append(list(fullnames))
+        return iter([FakeThing(name, self.scores[name]) for name in fullnames if name in self.scores])
+
+
 @pytest.fixture
 def canonical_discovery_result():
     tables = [{"table_schema": "public", "table_name": "moments_seed"}]
@@ -365,3 +452,1341 @@ def test_decode_supabase_role_handles_service_key():
     assert decode_supabase_role(service_key) == "service_role"
     anon_key = "header.eyJyb2xlIjoiYW5vbiJ9.sig"
     assert decode_supabase_role(anon_key) == "anon"
+
+
+def test_import_does_not_load_heavy_clients():
+    probe = (
+        "import sys, scripts.wigg_reddit_seed as seed; "
+        "seed.extract_moments('It gets good at S1E3'); "
+        "print(','.join(m for m in %r if m in sys.modules))"
+    ) % (HEAVY_MODULES,)
+    proc = subprocess.run([sys.executable, "-c", probe], cwd=REPO_ROOT, capture_output=True, text=True, check=True)
+    assert proc.stdout.strip() == ""
+
+
+def test_parse_importtime_reads_cumulative_column():
+    stderr = (
+        "import time: self [us] | cumulative | imported package\n"
+        "import time:       120 |        120 |   re\n"
+        "import time:      4000 |      18000 | scripts.wigg_reddit_seed\n"
+    )
+    timings = parse_importtime(stderr)
+    assert timings["scripts.wigg_reddit_seed"] == 18000
+    assert timings["re"] == 120
+
+
+def test_plan_work_units_and_crawl_bound_the_search_by_time(canonical_discovery_result):
+    units = plan_work_units(["r/a", "r/b"], ["q1"], since_ts=86400 * 10)
+    assert units == [WorkUnit("r/a", "q1", 86400 * 10), WorkUnit("r/b", "q1", 86400 * 10)]
+    assert plan_work_units(["r/a"], ["q1", "q2"]) == [WorkUnit("r/a", "q1"), WorkUnit("r/a", "q2")]
+
+    now = int(time.time())
+    assert search_time_filter(0) == "all"
+    assert search_time_filter(now - 3 * 86400, now) == "week"
+    assert search_time_filter(now - 400 * 86400, now) == "all"
+
+    # Results come newest first, so paging stops at the first submission older than the window.
+    listing = [Submission(f"s{i}", f"Andor S1E{i + 1}", created_utc=now - i * 86400) for i in range(6)]
+    reddit = FakeReddit({("a", "q1"): listing})
+    writer = SupabaseWriter(
+        client=FakeSupabaseClient(canonical_discovery_result.on_conflict_columns),
+        discovery=canonical_discovery_result,
+        dry_run=True,
+        logger=ListLogger(),
+        service_key_role="service_role",
+    )
+    stats = crawl_unit(reddit, writer, WorkUnit("r/a", "q1", now - 2 * 86400), limit=100)
+    assert stats.processed == 3
+    assert reddit.search_calls == [("a", "q1", 100, "week")]
+
+
+def test_sqlite_queue_reassigns_expired_leases(tmp_path):
+    now = [1000.0]
+    queue = SQLiteWorkQueue(str(tmp_path / "queue.db"), clock=lambda: now[0])
+    assert queue.enqueue(plan_work_units(["r/a"], ["q1"])) == 1
+    assert queue.enqueue(plan_work_units(["r/a"], ["q1"])) == 0
+
+    unit = queue.lease("worker-1", lease_seconds=60)
+    assert unit is not None and unit.attempts == 1
+    assert queue.lease("worker-2", lease_seconds=60) is None
+    assert queue.heartbeat(unit, "worker-1", 60)
+    assert not queue.heartbeat(unit, "worker-2", 60)
+
+    now[0] += 61
+    reclaimed = queue.lease("worker-2", lease_seconds=60)
+    assert reclaimed is not None and reclaimed.unit_id == unit.unit_id and reclaimed.attempts == 2
+    assert not queue.heartbeat(unit, "worker-1", 60)
+    assert not queue.complete(unit, "worker-1", mock.Mock(processed=1, inserted=1, updated=0))
+
+
+def test_sqlite_queue_leases_by_the_latest_yield_priority(tmp_path):
+    queue = SQLiteWorkQueue(str(tmp_path / "queue.db"))
+    a, b, c = plan_work_units(["r/a", "r/b", "r/c"], ["q1"])
+    assert queue.enqueue([a, b, c]) == 3
+    # Re-enqueueing in a new yield order adds nothing but reorders what is still pending.
+    assert queue.enqueue([c, a, b]) == 0
+    assert queue.lease("w1", 60).unit_id == c.unit_id
+    assert queue.prioritize([b, a, c]) == 1  # c is leased, a keeps its rank
+    assert [queue.lease("w1", 60).unit_id for _ in range(2)] == [b.unit_id, a.unit_id]
+    queue.close()
+
+
+def test_queue_workers_share_units_and_aggregate_stats(tmp_path, canonical_discovery_result):
+    client = FakeSupabaseClient(canonical_discovery_result.on_conflict_columns)
+    writer = SupabaseWriter(
+        client=client,
+        discovery=canonical_discovery_result,
+        dry_run=False,
+        logger=ListLogger(),
+        service_key_role="service_role",
+    )
+    reddit = FakeReddit(
+        {
+            ("a", "q1"): [Submission("s1", "When does Severance get good?", comments=[Comment("c1", "It gets good at S1E3")])],
+            ("b", "q1"): [Submission("s2", "Does Andor get good", comments=[Comment("c2", "picks up at episode 4")])],
+        }
+    )
+    path = str(tmp_path / "queue.db")
+    SQLiteWorkQueue(path).enqueue(plan_work_units(["r/a", "r/b"], ["q1"]))
+
+    first_queue = SQLiteWorkQueue(path)
+    second_queue = SQLiteWorkQueue(path)
+    first_unit = first_queue.lease("w1", 60)
+    first_queue.fail(first_unit, "w1", "transient")
+    second = run_queue_worker(reddit, writer, second_queue, worker_id="w2", limit=10)
+    assert second.processed == 2
+
+    aggregate = first_queue.aggregate_stats()
+    assert aggregate["done"] == 2
+    assert aggregate["pending"] == 0
+    assert aggregate["processed"] == 2
+    assert aggregate["inserted"] == 2
+
+
+def test_yield_scheduler_prefers_high_yield_and_tries_unseen_pairs_first(tmp_path):
+    store = YieldStore(str(tmp_path / "yield.db"))
+    gold = WorkUnit("r/television", "when does it get good")
+    beard = WorkUnit("r/PeacockTV", "grow the beard")
+    fresh = WorkUnit("r/anime", "does it get good")
+    store.record(gold, CrawlStats(processed=10, inserted=30, updated=10, candidates=40, requests=11))
+    store.record(beard, CrawlStats(processed=10, inserted=0, updated=1, candidates=1, requests=11))
+    store.record(beard, CrawlStats(processed=5, inserted=0, updated=0, candidates=0, requests=6))
+
+    history = store.get_all()
+    assert history[("r/PeacockTV", "grow the beard")].runs == 2
+    assert history[("r/PeacockTV", "grow the beard")].requests == 17
+    assert history[("r/television", "when does it get good")].new_ratio == 0.75
+
+    greedy = YieldScheduler(store, explore=0.0).order([beard, gold, fresh])
+    assert greedy == [fresh, gold, beard]
+
+    class AlwaysExplore:
+        def random(self):
+            return 0.0
+
+        def randrange(self, start, stop):
+            return stop - 1
+
+    exploring = YieldScheduler(store, explore=1.0, rng=AlwaysExplore()).order([beard, gold])
+    assert exploring == [beard, gold]
+
+
+def test_crawl_unit_stops_at_request_budget(canonical_discovery_result):
+    writer = SupabaseWriter(
+        client=FakeSupabaseClient(canonical_discovery_result.on_conflict_columns),
+        discovery=canonical_discovery_result,
+        dry_run=True,
+        logger=ListLogger(),
+        service_key_role="service_role",
+    )
+    submissions = [Submission(f"s{i}", "Does it get good", comments=[Comment(f"c{i}", "gets good at S1E2")]) for i in range(10)]
+    reddit = FakeReddit({("a", "q"): submissions})
+    budget = RequestBudget(max_requests=4)
+
+    stats = crawl_unit(reddit, writer, WorkUnit("r/a", "q"), 100, budget=budget)
+
+    assert reddit.search_calls == [("a", "q", 3, "all")]
+    assert stats.processed == 3
+    assert stats.requests == 4
+    assert stats.candidates == 3
+    assert budget.exhausted
+
+
+def test_triage_skips_cheap_losers_and_scales_comment_budget():
+    policy = TriagePolicy(min_comments=3, max_comment_budget=200, weak_title_budget=50)
+    assert triage_submission(Submission("a", "[Discussion] (spoilers)", num_comments=40), policy).reason == "empty_title"
+    assert triage_submission(Submission("b", "When does The Wire get good?", num_comments=2), policy).reason == "few_comments"
+    assert triage_submission(Submission("c", "Favourite soundtrack moments", num_comments=90), policy).reason == "off_topic"
+
+    strong = triage_submission(Submission("d", "When does The Wire get good?", num_comments=500), policy)
+    assert strong.fetch_comments and strong.comment_budget == 200
+    weak = triage_submission(Submission("e", "Is Andor worth watching?", num_comments=500), policy)
+    assert weak.fetch_comments and weak.comment_budget == 50
+    small = triage_submission(Submission("f", "Does Severance get good", num_comments=12), policy)
+    assert small.comment_budget == 12
+
+
+def test_crawl_unit_triage_avoids_comment_fetches_and_reports(canonical_discovery_result):
+    writer = SupabaseWriter(
+        client=FakeSupabaseClient(canonical_discovery_result.on_conflict_columns),
+        discovery=canonical_discovery_result,
+        dry_run=True,
+        logger=ListLogger(),
+        service_key_role="service_role",
+    )
+    quiet = Submission("s1", "Does Foundation get good by S1E4?", comments=[Comment("c1", "S1E5")], num_comments=1)
+    busy = Submission("s2", "When does Foundation get good", comments=[Comment(f"c{i}", "gets good at S1E4") for i in range(5)])
+    triage = SubmissionTriage()
+
+    stats = crawl_unit(FakeReddit({("a", "q"): [quiet, busy]}), writer, WorkUnit("r/a", "q"), 10, triage=triage)
+
+    assert quiet.comments.replace_more_calls == 0
+    assert busy.comments.replace_more_calls == 1
+    assert stats.candidates == 1 + 5
+    assert stats.requests == 1 + 1
+    assert triage.reasons == {"few_comments": 1, "strong_title": 1}
+    assert triage.skip_rate == 0.5
+    logger = ListLogger()
+    triage.log_report(logger)
+    assert "skip_rate=50.0%" in logger.joined()
+
+
+def test_refreshed_confidence_swaps_score_bonus_for_comments_only():
+    assert refreshed_confidence(0.55, 20, 40, "comment") == 0.6
+    assert refreshed_confidence(0.6, 40, 0, "comment") == 0.5
+    assert refreshed_confidence(0.5, 0, 400, "submission") == 0.5
+
+
+def test_score_refresher_batches_info_calls_and_patches_only_changed_rows():
+    supabase = pytest.importorskip("supabase")
+    key = postgrest.standin_service_key()
+    # A required column outside the conflict key: a partial upsert would fail its NOT NULL check.
+    catalog = postgrest.SQLiteCatalog(schema_sql=postgrest.DEFAULT_SCHEMA.replace("source_url text,", "source_url text NOT NULL,"))
+    with postgrest.PostgrestStandIn(catalog) as standin:
+        discovery = DatabaseDiscovery(SupabaseMetaFetcher(standin.url, key), logger=ListLogger()).discover("moments_seed")
+        writer = SupabaseWriter(
+            client=supabase.create_client(standin.url, key),
+            discovery=discovery,
+            dry_run=False,
+            logger=ListLogger(),
+            service_key_role=decode_supabase_role(key),
+        )
+        candidates = [make_candidate(source_id=f"c{i:03d}", score=0, confidence=0.5, source_kind="comment") for i in range(250)]
+        writer.upsert_candidates(candidates)
+        upserts = standin.stats.snapshot()["requests_upsert"]
+
+        scores = {f"t1_c{i:03d}": 0 for i in range(250)}
+        scores["t1_c007"] = 40
+        scores["t1_c180"] = 10
+        del scores["t1_c249"]
+        reddit = FakeReddit(scores=scores)
+
+        stats = ScoreRefresher(reddit, writer, page_size=120, logger=ListLogger()).run()
+
+        assert [len(batch) for batch in reddit.info_calls] == [100, 20, 100, 20, 10]
+        assert stats.scanned == 250
+        assert stats.missing == 1
+        assert stats.changed == 2
+        counters = standin.stats.snapshot()
+        assert counters["requests_upsert"] == upserts
+        assert (counters["requests_update"], counters["rows_updated"]) == (2, 2)
+        stored = {row["source_id"]: row for row in standin.catalog.conn.execute("SELECT * FROM moments_seed")}
+        assert (stored["c007"]["score"], stored["c007"]["confidence"]) == (40, 0.6)
+        assert stored["c180"]["confidence"] == 0.525
+        assert stored["c001"]["confidence"] == 0.5
+        assert stored["c007"]["source_url"] == candidates[7].source_url and stored["c007"]["quote"] == candidates[7].quote
+
+
+def test_candidate_buffer_flushes_on_size_or_timer(canonical_discovery_result):
+    client = FakeSupabaseClient(canonical_discovery_result.on_conflict_columns)
+    writer = SupabaseWriter(
+        client=client,
+        discovery=canonical_discovery_result,
+        dry_run=False,
+        logger=ListLogger(),
+        service_key_role="service_role",
+    )
+    now = [0.0]
+    buffer = CandidateBuffer(writer, max_rows=3, flush_interval=30.0, clock=lambda: now[0])
+    buffer.add(make_candidate(source_id="a"))
+    buffer.add(make_candidate(source_id="a"))
+    assert len(buffer) == 1
+    assert not buffer.due()
+    now[0] = 31.0
+    assert buffer.due()
+    buffer.add(make_candidate(source_id="b"))
+    buffer.add(make_candidate(source_id="c"))
+    assert buffer.flush().inserted == 3
+    assert client.upsert_attempts == 1
+    assert not buffer.due()
+
+    # Per-ruleset rows stay apart when the unique key includes the ruleset, and share a row when it doesn't.
+    by_ruleset = replace(
+        canonical_discovery_result,
+        column_mapping={**canonical_discovery_result.column_mapping, "ruleset": "ruleset"},
+        on_conflict_columns=[*canonical_discovery_result.on_conflict_columns, "ruleset"],
+    )
+    for discovery, rows in ((by_ruleset, 2), (canonical_discovery_result, 1)):
+        buffer = CandidateBuffer(
+            SupabaseWriter(client=client, discovery=discovery, dry_run=True, logger=ListLogger(), service_key_role="service_role")
+        )
+        buffer.add(make_candidate(source_id="a", ruleset="default"))
+        buffer.add(make_candidate(source_id="a", ruleset="enhanced"))
+        assert len(buffer) == rows
+
+
+def test_stream_daemon_resumes_from_checkpoint_without_gaps_or_replays(tmp_path, canonical_discovery_result):
+    assert default_evaluator().passes_prefilter("it picks up around S2E4")
+    assert not default_evaluator().passes_prefilter("lol same")
+
+    client = FakeSupabaseClient(canonical_discovery_result.on_conflict_columns)
+    writer = SupabaseWriter(
+        client=client,
+        discovery=canonical_discovery_result,
+        dry_run=False,
+        logger=ListLogger(),
+        service_key_role="service_role",
+    )
+    thread = Submission("s1", "When does Severance get good?", selftext="I'm on S1E2", created_utc=100)
+    reddit = FakeReddit()
+    reddit.stream_items = {
+        "submissions": [thread],
+        "comments": [
+            Comment("c1", "gets good at episode 4", created_utc=101, submission=thread),
+            Comment("c2", "lol same", created_utc=102, submission=thread),
+        ],
+    }
+    path = str(tmp_path / "checkpoints.db")
+
+    first = StreamDaemon(reddit, CandidateBuffer(writer), CheckpointStore(path), ["r/television"], idle_sleep=0, logger=ListLogger())
+    stats = first.run(max_cycles=1)
+    assert stats["candidates"] == 2
+    assert stats["prefiltered"] == 1
+    assert client.row_count(canonical_discovery_result.table_name) == 2
+
+    # While the daemon was down two more comments arrived; the stream only replays the recent tail.
+    reddit.stream_items["comments"] += [
+        Comment("c3", "honestly S1E5 is where it clicks", created_utc=103, submission=thread),
+        Comment("c4", "ep 6 for me", created_utc=104, submission=thread),
+    ]
+    client.upsert_attempts = 0
+    second = StreamDaemon(reddit, CandidateBuffer(writer), CheckpointStore(path), ["r/television"], idle_sleep=0, logger=ListLogger())
+    stats = second.run(max_cycles=1)
+    assert stats["candidates"] == 2
+    assert stats["skipped_checkpoint"] == 5
+    assert client.upsert_attempts == 1
+    assert client.row_count(canonical_discovery_result.table_name) == 4
+    assert CheckpointStore(path).get("television:comments").created_utc == 104
+
+
+def test_stream_daemon_keeps_buffer_and_checkpoints_when_a_flush_fails(tmp_path, canonical_discovery_result):
+    client = FakeSupabaseClient(canonical_discovery_result.on_conflict_columns)
+    writer = SupabaseWriter(
+        client=client,
+        discovery=canonical_discovery_result,
+        dry_run=False,
+        logger=ListLogger(),
+        service_key_role="service_role",
+        base_backoff=0.0,
+    )
+    thread = Submission("s1", "When does Severance get good?", selftext="I'm on S1E2", created_utc=100)
+    reddit = FakeReddit()
+    reddit.stream_items = {"submissions": [thread], "comments": [Comment("c1", "gets good at episode 4", created_utc=101, submission=thread)]}
+    path = str(tmp_path / "checkpoints.db")
+
+    # Every attempt of both the due() flush and the final flush in run()'s finally fails.
+    client.failures_before_success = 10_000
+    buffer = CandidateBuffer(writer, max_rows=1)
+    with pytest.raises(Exception):
+        StreamDaemon(reddit, buffer, CheckpointStore(path), ["r/television"], idle_sleep=0, logger=ListLogger()).run(max_cycles=1)
+    assert len(buffer) == 2
+    assert CheckpointStore(path).get("television:comments") is None
+    assert CheckpointStore(path).get("television:submissions") is None
+
+    # After a restart nothing is skipped: both items are re-read and written.
+    client.failures_before_success = 0
+    stats = StreamDaemon(reddit, CandidateBuffer(writer), CheckpointStore(path), ["r/television"], idle_sleep=0, logger=ListLogger()).run(max_cycles=1)
+    assert stats["candidates"] == 2
+    assert client.row_count(canonical_discovery_result.table_name) == 2
+    assert CheckpointStore(path).get("television:comments").created_utc == 101
+
+
+@pytest.mark.parametrize("mode", ["cpu", "mem"])
+def test_stage_profiler_writes_per_stage_output(tmp_path, canonical_discovery_result, mode):
+    writer = SupabaseWriter(
+        client=FakeSupabaseClient(canonical_discovery_result.on_conflict_columns),
+        discovery=canonical_discovery_result,
+        dry_run=False,
+        logger=ListLogger(),
+        service_key_role="service_role",
+    )
+    comments = [Comment(f"c{i}", f"gets good at S1E{i % 9 + 1} around 20 minutes in") for i in range(10)]
+    reddit = FakeReddit({("a", "q"): [Submission("s1", "When does Andor get good?", comments=comments)]})
+    profiler = StageProfiler(mode, str(tmp_path), sample_interval=0.001, capture_interval=0.0).start()
+    assert not tracemalloc.is_tracing()
+    install_profiler(profiler)
+    try:
+        crawl_unit(reddit, writer, WorkUnit("r/a", "q"), 10)
+        assert not tracemalloc.is_tracing()
+    finally:
+        install_profiler(None)
+        profiler.stop()
+    written = {path.name for path in profiler.write()}
+
+    assert {"search", "comment_expansion", "extract_moments", "to_payload", "upsert"} <= set(profiler.timings)
+    assert profiler.timings["extract_moments"][0] == 11
+    assert "summary.txt" in written
+    if mode == "cpu":
+        assert {"extract_moments.pstats", "upsert.pstats", "cpu.collapsed"} <= written
+    else:
+        assert "upsert.tracemalloc.txt" in written
+
+
+def test_synthetic_corpus_is_deterministic_and_feeds_the_pipeline(canonical_discovery_result):
+    config = CorpusConfig(comments=600, seed=7)
+    first = [(s.title, [c.body for c in s.comments.list()]) for s in SyntheticCorpus(config)]
+    second = [(s.title, [c.body for c in s.comments.list()]) for s in SyntheticCorpus(config)]
+    assert first == second
+    assert sum(len(bodies) for _, bodies in first) == 600
+
+    client = FakeSupabaseClient(canonical_discovery_result.on_conflict_columns)
+    writer = SupabaseWriter(
+        client=client,
+        discovery=canonical_discovery_result,
+        dry_run=False,
+        logger=ListLogger(),
+        service_key_role="service_role",
+    )
+    corpus = SyntheticCorpus(config)
+    candidates = sum(index_submission(submission, writer).candidates for submission in corpus)
+    assert corpus.comments == 600
+    assert candidates > 0
+    assert client.upsert_attempts == candidates
+    kinds = {row["source_kind"] for row in client.storage[canonical_discovery_result.table_name].values()}
+    assert "comment" in kinds
+
+
+def test_reddit_standin_serves_praw_crawl_with_rate_limit_headers(canonical_discovery_result):
+    pytest.importorskip("praw")
+    corpus = RedditCorpus.synthetic(1500, seed=11)
+    client = FakeSupabaseClient(canonical_discovery_result.on_conflict_columns)
+    writer = SupabaseWriter(
+        client=client,
+        discovery=canonical_discovery_result,
+        dry_run=False,
+        logger=ListLogger(),
+        service_key_role="service_role",
+    )
+    with RedditStandIn(corpus, FaultConfig(ratelimit_budget=500)) as standin:
+        env = {"REDDIT_CLIENT_ID": "id", "REDDIT_CLIENT_SECRET": "secret", "REDDIT_URL": standin.url, "REDDIT_OAUTH_URL": standin.url}
+        with mock.patch.dict(os.environ, env):
+            reddit = make_reddit()
+        stats = crawl_unit(reddit, writer, WorkUnit("r/television+anime+netflix", '"get good"'), 20)
+        counts = dict(standin.state.counts)
+        used = standin.state.window_used
+
+    assert stats.processed > 0
+    assert stats.candidates > 0
+    assert counts["search"] >= 1
+    assert counts["comments"] == stats.requests - counts["search"]
+    assert used == sum(counts.values())
+
+
+def test_thread_refresh_fetches_only_comments_past_the_watermark(tmp_path, canonical_discovery_result):
+    pytest.importorskip("praw")
+    corpus = RedditCorpus.synthetic(200, seed=5)
+    sid = max(corpus.thread_comments, key=lambda k: len(corpus.thread_comments[k]))
+    client = FakeSupabaseClient(canonical_discovery_result.on_conflict_columns)
+    writer = SupabaseWriter(
+        client=client,
+        discovery=canonical_discovery_result,
+        dry_run=False,
+        logger=ListLogger(),
+        service_key_role="service_role",
+    )
+    watermarks = CheckpointStore(str(tmp_path / "threads.db"))
+    with RedditStandIn(corpus) as standin:
+        env = {"REDDIT_CLIENT_ID": "id", "REDDIT_CLIENT_SECRET": "secret", "REDDIT_URL": standin.url, "REDDIT_OAUTH_URL": standin.url}
+        with mock.patch.dict(os.environ, env):
+            reddit = make_reddit()
+        first = index_submission(reddit.submission(id=sid), writer, None, None, watermarks)
+        assert watermarks.streams("thread:") == [f"thread:{sid}"]
+        latest = max(corpus.comments[c]["created_utc"] for c in corpus.thread_comments[sid])
+        assert watermarks.get(f"thread:{sid}").created_utc == latest
+
+        first_reply = corpus.thread_comments[sid][0]
+        corpus.add_comment(sid, "new1", "Stick with it, it gets good at S3E2.", latest + 10)
+        corpus.add_comment(sid, "new2", "Agreed, the 12 minute mark of S3E4 is great.", latest + 10, parent_id=f"t1_{first_reply}")
+        refreshed = refresh_threads(reddit, writer, watermarks)
+        assert (refreshed.processed, refreshed.requests) == (1, 1)
+        assert refreshed.candidates == 2
+        assert {(r["season"], r["episode"]) for r in client.storage["moments_seed"].values() if r["source_id"].startswith("new")} == {(3, 2), (3, 4)}
+        assert watermarks.get(f"thread:{sid}") == StreamCheckpoint(latest + 10, ("new1", "new2"))
+
+        again = refresh_threads(reddit, writer, watermarks)
+        assert again.candidates == 0
+        assert standin.state.counts["comments"] == 3
+    assert first.candidates > 0
+    watermarks.close()
+
+
+def test_thread_watermark_follows_processed_comments_and_holds_only_for_newer_stubs(tmp_path, canonical_discovery_result):
+    writer = SupabaseWriter(
+        client=FakeSupabaseClient(canonical_discovery_result.on_conflict_columns),
+        discovery=canonical_discovery_result,
+        dry_run=False,
+        logger=ListLogger(),
+        service_key_role="service_role",
+    )
+    watermarks = CheckpointStore(str(tmp_path / "threads.db"))
+
+    class Stub:
+        def __init__(self, parent_id):
+            self.parent_id = parent_id
+
+    class StubbedComments(FakeComments):
+        def __init__(self, comments, stubs):
+            super().__init__(comments)
+            self.stubs = stubs
+
+        def replace_more(self, limit=None):
+            super().replace_more(limit)
+            return list(self.stubs)  # MoreComments stubs dropped unexpanded
+
+    def thread(sid, comments, *stubs):
+        subm = Submission(sid, "When does Andor get good?", comments=comments)
+        subm.comments = StubbedComments(list(comments), stubs)
+        return subm
+
+    comments = [Comment(f"c{i}", f"gets good at S1E{i + 1}", created_utc=1_700_000_000 + i) for i in range(3)]
+    # Triage skipped the comments: nothing to refresh from.
+    index_submission(thread("a", comments), writer, TriageDecision(False, 0, "off_topic"), None, watermarks)
+    assert watermarks.get("thread:a") is None
+    # Cut by the comment budget: the newest comment processed.
+    index_submission(thread("b", comments), writer, TriageDecision(True, 2, "hooked"), None, watermarks)
+    assert watermarks.get("thread:b") == StreamCheckpoint(1_700_000_001, ("c1",))
+    # A top-level stub trails the page and does not hold the watermark back.
+    index_submission(thread("c", comments, Stub("t3_c")), writer, None, None, watermarks)
+    assert watermarks.get("thread:c") == StreamCheckpoint(1_700_000_002, ("c2",))
+
+    newer = [*comments, Comment("c8", "S2E1 is where it clicks", created_utc=1_700_000_008), Comment("c9", "S2E2", created_utc=1_700_000_009)]
+    # Replies hidden under c8, which is newer than the old watermark: hold at c8 so they stay ahead of it.
+    assert index_submission(thread("c", newer, Stub("t1_c8"), Stub("t1_c1")), writer, None, None, watermarks).candidates == 2
+    assert watermarks.get("thread:c") == StreamCheckpoint(1_700_000_008, ("c8",))
+    # Next pass: c8 is behind the watermark, so its stub no longer holds it back.
+    index_submission(thread("c", newer, Stub("t1_c8")), writer, None, None, watermarks)
+    assert watermarks.get("thread:c") == StreamCheckpoint(1_700_000_009, ("c9",))
+    watermarks.close()
+
+
+def test_preflight_samples_reddit_and_supabase_and_scales_the_plan():
+    pytest.importorskip("praw")
+    corpus = RedditCorpus.synthetic(1500, seed=11)
+    units = [WorkUnit("r/television+anime+netflix", '"get good"'), WorkUnit("r/television+anime+netflix", '"zzzz qqqq"')]
+    with RedditStandIn(corpus, FaultConfig(ratelimit_budget=500)) as standin, postgrest.PostgrestStandIn() as store:
+        env = {"REDDIT_CLIENT_ID": "id", "REDDIT_CLIENT_SECRET": "secret", "REDDIT_URL": standin.url, "REDDIT_OAUTH_URL": standin.url}
+        with mock.patch.dict(os.environ, env):
+            reddit = make_reddit()
+        sample = sample_reddit(reddit, units, RulesetEvaluator([DEFAULT_RULESET]), sample_limit=2)
+        counts = dict(standin.state.counts)
+        rtt = sample_supabase(SupabaseMetaFetcher(store.url, postgrest.standin_service_key()), "moments_seed", repeats=3)
+
+    assert (sample.units, sample.submissions, sample.saturated_units) == (2, 2, 1)
+    assert sample.requests == sample.requests_used == sum(counts.values())
+    assert sample.search_requests == counts["search"] == 2
+    assert sample.rate_quota == 500 and sample.rate_remaining == 500 - sample.requests
+    assert sample.candidates > 0 and sample.payload_bytes > 0
+
+    plan = plan_capacity(40, 250, sample, sample_limit=2, supabase_rtt=rtt)
+    # One unit in two fills any limit, so ~125 submissions per unit and two search pages each.
+    assert plan.submissions_per_unit == 125.0
+    assert plan.search_requests == 80
+    assert plan.total_requests == plan.search_requests + plan.comment_requests
+    assert plan.rate_per_second == round(500 / 600, 3)
+    assert plan.seconds_with_workers >= plan.total_requests / (500 / 600) - 1
+    assert plan.recommended_workers >= 1
+    assert 50 <= plan.recommended_batch_size <= 500 and plan.recommended_batch_size % 50 == 0
+
+
+def test_reddit_standin_injects_429_and_exhausts_window():
+    corpus = RedditCorpus.synthetic(50)
+    with RedditStandIn(corpus, FaultConfig(ratelimit_budget=2)) as standin:
+        statuses = []
+        for _ in range(3):
+            try:
+                with urllib.request.urlopen(f"{standin.url}/r/television/search?q=good") as resp:
+                    statuses.append((resp.status, resp.headers["x-ratelimit-remaining"]))
+            except urllib.error.HTTPError as exc:
+                statuses.append((exc.code, exc.headers["x-ratelimit-remaining"]))
+    assert statuses == [(200, "1.0"), (200, "0.0"), (429, "0.0")]
+    with RedditStandIn(corpus, FaultConfig(error_rate=1.0)) as standin:
+        with pytest.raises(urllib.error.HTTPError) as err:
+            urllib.request.urlopen(f"{standin.url}/api/info?id=t3_s1")
+    assert err.value.code == 429
+
+
+def test_postgrest_standin_supports_discovery_upserts_and_retries():
+    supabase = pytest.importorskip("supabase")
+    key = postgrest.standin_service_key()
+    with postgrest.PostgrestStandIn() as standin:
+        discovery = DatabaseDiscovery(SupabaseMetaFetcher(standin.url, key), logger=ListLogger()).discover("moments_seed")
+        assert discovery.unique_constraint_name == "moments_seed_uniq_idx"
+        assert discovery.primary_key_columns == ["id"]
+        assert discovery.columns["confidence"].data_type == "double precision"
+        discovery_connections = standin.stats.snapshot()["connections"]
+
+        writer = SupabaseWriter(
+            client=supabase.create_client(standin.url, key),
+            discovery=discovery,
+            dry_run=False,
+            logger=ListLogger(),
+            service_key_role=decode_supabase_role(key),
+            base_backoff=0.0,
+        )
+        payloads = [
+            {"content_title": "Andor", "season": 1, "episode": ep, "minute": 10, "source_id": f"t1_{ep}", "score": ep}
+            for ep in range(1, 6)
+        ]
+        assert writer.upsert_payloads(payloads) == UpsertResult(inserted=5, updated=0, candidates=5)
+
+        calls = {"n": 0}
+        original = standin.catalog.upsert
+
+        def flaky_upsert(*args, **kwargs):
+            calls["n"] += 1
+            if calls["n"] == 1:
+                raise postgrest.PostgrestError(503, "503", "stand-in injected 503")
+            return original(*args, **kwargs)
+
+        with mock.patch.object(standin.catalog, "upsert", flaky_upsert):
+            result = writer.upsert_payloads([dict(payloads[0], score=99), dict(payloads[0], source_id="t1_new")])
+        assert result == UpsertResult(inserted=1, updated=1, candidates=2)
+        assert calls["n"] == 2
+        assert standin.row_count("moments_seed") == 6
+        stats = standin.stats.snapshot()
+        assert stats["errors_503"] == 1
+        assert stats["requests_upsert"] == 3
+        # supabase-py keeps one HTTP/1.1 connection alive across every write and count.
+        assert stats["connections"] - discovery_connections == 1
+
+        # Any failure mid-batch rolls the whole batch back and leaves no transaction open.
+        bad = [dict(payloads[0], source_id="t1_partial"), dict(payloads[0], source_id="t1_bad", quote=object())]
+        with pytest.raises(sqlite3.Error):
+            standin.catalog.upsert("moments_seed", bad, "source_id,content_title,season,episode,minute", "merge", False)
+        assert not standin.catalog.conn.in_transaction
+        assert standin.row_count("moments_seed") == 6
+        assert writer.upsert_payloads([dict(payloads[0], source_id="t1_after")]).inserted == 1
+
+
+def test_index_check_reports_missing_lookup_indexes_probes_and_writes_a_migration(tmp_path):
+    key = postgrest.standin_service_key()
+    with postgrest.PostgrestStandIn() as standin:
+        for i in range(3):
+            standin.catalog.conn.execute(
+                "INSERT INTO moments_seed (content_title, season, episode, minute, source_id) VALUES ('Andor', 1, ?, 10, ?)",
+                (i, f"t1_{i}"),
+            )
+        engine = DatabaseDiscovery(SupabaseMetaFetcher(standin.url, key), logger=ListLogger())
+        discovery = engine.discover("moments_seed")
+        report = engine.check_indexes(discovery, probe=True)
+        assert standin.stats.snapshot()["requests_rpc"] == 4
+
+        bare = postgrest.SQLiteCatalog(schema_sql="CREATE TABLE moments_seed (id integer PRIMARY KEY, content_title text, source_id text);")
+    with postgrest.PostgrestStandIn(bare) as standin:
+        bare_report = DatabaseDiscovery(SupabaseMetaFetcher(standin.url, key), logger=ListLogger()).check_indexes(
+            replace(discovery, on_conflict_columns=["source_id", "content_title"])
+        )
+
+    assert {i.name for i in report.indexes} == {"moments_seed_pkey", "moments_seed_uniq_idx"}
+    assert report.conflict_index == "moments_seed_uniq_idx" and not report.healthy
+    assert report.statements == ["create index if not exists moments_seed_status_idx on public.moments_seed (status);"]
+    assert report.probes["upsert"][0].startswith("Index") and report.probes["source_id"][0].startswith("Index")
+    assert report.probes["status"][0] == "Seq Scan"
+    assert bare_report.conflict_index is None
+    assert bare_report.statements[0] == (
+        "create unique index if not exists moments_seed_source_id_content_title_key on public.moments_seed (source_id, content_title);"
+    )
+
+    path = write_index_migration(report, str(tmp_path))
+    assert path is not None and path.name.endswith("_wigg_index_health_moments_seed.sql")
+    assert "no index leads with status" in path.read_text(encoding="utf-8")
+    assert write_index_migration(report, str(tmp_path)) is None
+
+
+def test_bulk_moderator_patches_matching_rows_in_pages_and_resumes(tmp_path):
+    supabase = pytest.importorskip("supabase")
+    key = postgrest.standin_service_key()
+    now = 1_700_000_000
+    with postgrest.PostgrestStandIn() as standin:
+        for i in range(30):
+            standin.catalog.conn.execute(
+                "INSERT INTO moments_seed (content_title, episode, source_id, source_subreddit, confidence, created_utc, status) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (
+                    "Andor" if i % 3 else "Severance",
+                    i,
+                    f"t1_{i}",
+                    "television" if i % 2 else "anime",
+                    0.3 if i < 20 else 0.9,
+                    now - (40 if i % 5 else 1) * 86400,
+                    "approved" if i == 7 else "needs_review",
+                ),
+            )
+        discovery = DatabaseDiscovery(SupabaseMetaFetcher(standin.url, key), logger=ListLogger()).discover("moments_seed")
+        writer = SupabaseWriter(
+            client=supabase.create_client(standin.url, key),
+            discovery=discovery,
+            dry_run=False,
+            logger=ListLogger(),
+            service_key_role="service_role",
+            base_backoff=0.0,
+        )
+        # Low confidence, older than 30 days, Andor only: rows 1..19 with i%3 and i%5, minus the approved row 7.
+        expected = {i for i in range(20) if i % 3 and i % 5 and i != 7}
+        rule = ModerationRule(to_status="rejected", max_confidence=0.5, older_than_days=30, titles=("Andor",))
+        checkpoints = CheckpointStore(str(tmp_path / "progress.db"))
+
+        dry_writer = SupabaseWriter(
+            client=writer.client, discovery=discovery, dry_run=True, logger=ListLogger(), service_key_role="service_role"
+        )
+        preview = BulkModerator(dry_writer, rule, checkpoints=checkpoints, page_size=3, now=now).run()
+        assert (preview.matched, preview.updated) == (len(expected), 0)
+
+        original = writer.update_rows
+        calls = {"n": 0}
+
+        def interrupted(*args, **kwargs):
+            calls["n"] += 1
+            if calls["n"] == 3:
+                raise RuntimeError("connection reset")
+            return original(*args, **kwargs)
+
+        with mock.patch.object(writer, "update_rows", interrupted):
+            with pytest.raises(RuntimeError):
+                BulkModerator(writer, rule, checkpoints=checkpoints, page_size=3, now=now).run()
+        updates_before = standin.stats.snapshot()["requests_update"]
+        interrupted_at = checkpoints.last_key(BulkModerator(writer, rule).job)
+        assert isinstance(interrupted_at, int)
+        resumed = BulkModerator(writer, rule, checkpoints=checkpoints, page_size=3, now=now).run()
+        assert resumed.resumed_after == interrupted_at
+        assert resumed.updated == len(expected) - 6
+        assert standin.stats.snapshot()["requests_update"] - updates_before == resumed.pages
+        # A full pass clears the checkpoint: the next run of the rule starts over instead of resuming past the end.
+        moderator = BulkModerator(writer, rule, checkpoints=checkpoints, page_size=3, now=now)
+        assert checkpoints.last_key(moderator.job) is None
+        assert moderator.run().resumed_after is None
+
+        rows = standin.catalog.conn.execute("SELECT episode, status FROM moments_seed").fetchall()
+        assert {r["episode"] for r in rows if r["status"] == "rejected"} == expected
+        assert sum(r["status"] == "approved" for r in rows) == 1
+        checkpoints.close()
+
+
+def test_mirror_syncs_incrementally_and_serves_local_queries(tmp_path, capsys):
+    pytest.importorskip("supabase")
+    from supabase import create_client
+
+    key = postgrest.standin_service_key()
+    day = 86400
+    now = 1_700_000_000
+    path = str(tmp_path / "mirror.db")
+    with postgrest.PostgrestStandIn() as standin:
+        conn = standin.catalog.conn
+        for i in range(12):
+            conn.execute(
+                "INSERT INTO moments_seed (id, content_title, episode, source_id, source_subreddit, confidence, created_utc, status) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, 'needs_review')",
+                (i + 1, "Andor" if i % 3 else "Severance", i, f"t1_{i}", "anime" if i % 2 else "television", 0.9 if i < 4 else 0.4, now - (12 - i) * day),
+            )
+        discovery = DatabaseDiscovery(SupabaseMetaFetcher(standin.url, key), logger=ListLogger()).discover("moments_seed")
+        client = create_client(standin.url, key)
+        mirror = TableMirror(path, discovery)
+        # No updated_at or insert-time column: the integer key is the cursor, never the Reddit created_utc.
+        assert (mirror.cursor_column, mirror.tracks_edits) == ("id", False)
+
+        first = mirror.sync(client, page_size=5, now=now)
+        assert (first.full, first.pages, first.inserted) == (True, 3, 12)
+        assert first.cursor == 12
+
+        # Upstream: two rows are moderated, one is deleted and a backfill adds a row for an old post.
+        conn.execute("UPDATE moments_seed SET status = 'approved' WHERE id IN (1, 11)")
+        conn.execute("DELETE FROM moments_seed WHERE id = 2")
+        conn.execute(
+            "INSERT INTO moments_seed (id, content_title, episode, source_id, source_subreddit, confidence, created_utc, status) "
+            "VALUES (13, 'Andor', 13, 't1_13', 'anime', 0.95, ?, 'needs_review')",
+            (now - 30 * day,),
+        )
+        reads_before = standin.stats.snapshot()["requests_select"]
+        second = mirror.sync(client, page_size=5, lookback=2 * day, now=now + day)
+        assert (second.full, second.fetched, second.inserted, second.changed, second.deleted) == (False, 2, 1, 0, 0)
+        assert standin.stats.snapshot()["requests_select"] - reads_before == 1
+        assert second.cursor == 13
+        log = ListLogger()
+        mirror.log_report(log)
+        assert any("arrive with --mirror-full" in m for m in log.messages)
+        assert "has no updated_at column" in stale_edits_note(path)
+
+        third = mirror.sync(client, full=True, now=now + 2 * day)
+        assert (third.changed, third.deleted, third.unchanged) == (2, 1, 10)
+        mirror.close()
+
+    columns, rows = run_query(path, "titles")
+    assert columns == ["title", "seeds", "sources", "avg_confidence"]
+    assert [r[:2] for r in rows] == [("Andor", 8), ("Severance", 4)]
+    _, changed = run_query(path, "changed", days=1.5, now=now + 2 * day)
+    assert sorted(changed)[0][:3] == ("Andor", "approved", 1)
+    assert query_mirror_main([path, "sql", "SELECT COUNT(*) AS n FROM moments_seed WHERE status = 'approved'", "--json"]) == 0
+    assert json.loads(capsys.readouterr().out) == [{"n": 2}]
+    assert query_mirror_main([path, "sql", "DELETE FROM moments_seed"]) == 1
+
+
+def test_payload_hash_index_skips_unchanged_rows_and_rebuilds_from_table(tmp_path):
+    supabase = pytest.importorskip("supabase")
+    key = postgrest.standin_service_key()
+    with postgrest.PostgrestStandIn() as standin:
+        discovery = DatabaseDiscovery(SupabaseMetaFetcher(standin.url, key), logger=ListLogger()).discover("moments_seed")
+        client = supabase.create_client(standin.url, key)
+
+        def make_writer(index):
+            return SupabaseWriter(
+                client=client,
+                discovery=discovery,
+                dry_run=False,
+                logger=ListLogger(),
+                service_key_role=decode_supabase_role(key),
+                hash_index=index,
+            )
+
+        candidates = [
+            CandidateMoment(
+                content_title="Andor", season=1, episode=ep, minute=10, source_url=f"https://reddit.com/{ep}",
+                source_type="reddit", source_subreddit="andor", source_kind="comment", source_id=f"t1_{ep}",
+                score=ep, confidence=0.8, quote="gets good", created_utc=1_700_000_000 + ep,
+            )
+            for ep in range(1, 6)
+        ]
+        index = PayloadHashIndex(str(tmp_path / "hashes.db"))
+        writer = make_writer(index)
+        assert writer.upsert_candidates(candidates) == UpsertResult(inserted=5, updated=0, candidates=5)
+        upserts = standin.stats.snapshot()["requests_upsert"]
+
+        assert writer.upsert_candidates(candidates) == UpsertResult(inserted=0, updated=0, candidates=5)
+        assert standin.stats.snapshot()["requests_upsert"] == upserts
+
+        candidates[2] = replace(candidates[2], score=99)
+        bytes_before = standin.stats.snapshot()["bytes_in"]
+        assert writer.upsert_candidates(candidates) == UpsertResult(inserted=0, updated=1, candidates=5)
+        assert standin.stats.snapshot()["requests_upsert"] == upserts + 1
+        assert (index.hits, index.misses) == (9, 6)
+        log = ListLogger()
+        index.log_report(log)
+        assert "unchanged_skipped=9 written=6" in log.messages[-1]
+        index.close()
+
+        rebuilt = PayloadHashIndex(str(tmp_path / "rebuilt.db"))
+        assert rebuilt.rebuild(client, discovery, page_size=2) == 5
+        assert make_writer(rebuilt).upsert_candidates(candidates).candidates == 5
+        assert standin.stats.snapshot()["requests_upsert"] == upserts + 1
+        assert rebuilt.hits == 5
+
+        # Stored rows come back with their own types and extra columns; both sides normalize alike.
+        payload = candidates[0].to_payload(discovery.column_mapping)
+        stored = {**payload, "id": 1, "score": str(payload["score"]), "confidence": "0.80", "created_utc": float(payload["created_utc"])}
+        assert PayloadHashIndex.keyed(stored, discovery) == PayloadHashIndex.keyed(payload, discovery)
+
+        # Score refreshes write partial rows and leave the index alone.
+        entries = rebuilt._conn.execute("SELECT conflict_key, digest FROM payload_hashes ORDER BY 1").fetchall()
+        reddit = FakeReddit(scores={"t1_t1_1": 500})
+        refreshed = ScoreRefresher(reddit, make_writer(rebuilt), page_size=10, logger=ListLogger()).run()
+        assert refreshed.changed == 1
+        assert rebuilt._conn.execute("SELECT conflict_key, digest FROM payload_hashes ORDER BY 1").fetchall() == entries
+        rebuilt.close()
+
+
+@pytest.mark.parametrize("backend", ["json", "orjson", "msgspec"])
+def test_json_codecs_emit_identical_bytes_and_skip_dicts_when_native(backend):
+    if backend != "json":
+        pytest.importorskip(backend)
+    codec = make_codec(backend)
+    identity = {name: name for name in CANDIDATE_FIELDS}
+    candidates = [
+        CandidateMoment(
+            content_title="Shōgun", season=1, episode=ep, minute=minute, source_url="https://reddit.com/x",
+            source_type="reddit", source_subreddit="shogun", source_kind="comment", source_id=f"t1_{ep}",
+            score=3, confidence=0.85, quote="“it gets good”", created_utc=1_700_000_000,
+        )
+        for ep, minute in [(1, 12), (2, None)]
+    ]
+    expected = JsonCodec().dumps([c.to_payload(identity) for c in candidates])
+    assert codec.encode_candidates(candidates, identity) == expected
+    assert codec.loads(expected)[0]["content_title"] == "Shōgun"
+    assert codec.dumps({"b": 1, "a": [None, 0.5]}, sort_keys=True) == b'{"a":[null,0.5],"b":1}'
+
+    if codec.native_dataclasses:
+        with mock.patch.object(CandidateMoment, "to_payload", side_effect=AssertionError("built a dict")):
+            assert codec.encode_candidates(candidates, identity) == expected
+    # A renamed column or a minute that needs clamping falls back to to_payload.
+    renamed = {**identity, "content_title": "title"}
+    assert codec.loads(codec.encode_candidates(candidates, renamed))[0]["title"] == "Shōgun"
+    late = [replace(candidates[0], minute=500)]
+    assert codec.loads(codec.encode_candidates(late, identity))[0]["minute"] == 180
+
+
+def test_payload_digest_is_the_same_under_every_installed_codec():
+    payload = {
+        "created_at": datetime(2023, 11, 14, 22, 13, 20, tzinfo=timezone.utc),
+        "day": date(2023, 11, 14),
+        "confidence": 0.1 + 0.2,
+        "score": 10**16,
+        "big": 1e16,
+        "tags": ("a", "b"),
+        "nested": {"z": None, "a": [1.5, True]},
+    }
+    digests = {}
+    encodings = set()
+    try:
+        for backend in ("json", "orjson", "msgspec"):
+            try:
+                codec = make_codec(backend)
+            except ImportError:
+                continue
+            install_codec(codec)
+            digests[backend] = payload_digest(payload)
+            encodings.add(codec.dumps(payload, sort_keys=True))
+    finally:
+        install_codec(None)
+    assert len(set(digests.values())) == 1, digests
+    if len(digests) > 1:
+        assert len(encodings) > 1  # the transport codecs themselves disagree, which is why digests don't use them
+    assert canonical_json(payload).startswith(b'{"big":1e+16,"confidence":0.30000000000000004,"created_at":"2023-11-14T22:13:20+00:00"')
+
+
+def test_writer_posts_encoded_candidates_through_the_postgrest_session():
+    supabase = pytest.importorskip("supabase")
+    key = postgrest.standin_service_key()
+    install_codec(make_codec("auto"))
+    try:
+        with postgrest.PostgrestStandIn() as standin:
+            discovery = DatabaseDiscovery(SupabaseMetaFetcher(standin.url, key), logger=ListLogger()).discover("moments_seed")
+            writer = SupabaseWriter(
+                client=supabase.create_client(standin.url, key),
+                discovery=discovery,
+                dry_run=False,
+                logger=ListLogger(),
+                service_key_role=decode_supabase_role(key),
+                base_backoff=0.0,
+            )
+            candidates = [
+                CandidateMoment(
+                    content_title="Andor", season=1, episode=ep, minute=10, source_url="https://reddit.com/x",
+                    source_type="reddit", source_subreddit="andor", source_kind="comment", source_id=f"t1_{ep}",
+                    score=ep, confidence=0.5, quote="q", created_utc=1_700_000_000, ruleset="default",
+                )
+                for ep in range(1, 4)
+            ]
+            native = make_codec("auto").native_dataclasses
+            with mock.patch.object(CandidateMoment, "to_payload", side_effect=AssertionError("built a dict")) if native else nullcontext():
+                assert writer.upsert_candidates(candidates) == UpsertResult(inserted=3, updated=0, candidates=3)
+            assert writer.upsert_candidates([replace(candidates[0], score=50)]).updated == 1
+            stored = {row["episode"]: row for row in standin.catalog.select("public", "moments_seed", postgrest.Query.parse([]), False)[0]}
+            # The stand-in table has no ruleset column; ?columns= makes it drop that key.
+            assert stored[1]["score"] == 50 and "ruleset" not in stored[3]
+    finally:
+        install_codec(None)
+
+
+def test_dry_run_exports_every_payload_and_diffs_against_stored_rows(tmp_path):
+    supabase = pytest.importorskip("supabase")
+    key = postgrest.standin_service_key()
+    with postgrest.PostgrestStandIn() as standin:
+        discovery = DatabaseDiscovery(SupabaseMetaFetcher(standin.url, key), logger=ListLogger()).discover("moments_seed")
+        client = supabase.create_client(standin.url, key)
+        stored = [
+            {"content_title": "Andor", "season": 1, "episode": ep, "minute": 10, "source_id": f"t1_{ep},x", "score": ep}
+            for ep in range(1, 8)
+        ]
+        live = SupabaseWriter(client=client, discovery=discovery, dry_run=False, logger=ListLogger(), service_key_role="service_role")
+        live.upsert_payloads(stored)
+
+        diff = TableDiff(client, discovery, page_size=2)
+        diff.IN_CHUNK = 3
+        export = PayloadExport(str(tmp_path / "backfill.ndjson"), discovery)
+        dry = SupabaseWriter(
+            client=client, discovery=discovery, dry_run=True, logger=ListLogger(),
+            service_key_role="service_role", export=export, diff=diff,
+        )
+        upserts = standin.stats.snapshot()["requests_upsert"]
+        backfill = [dict(row) for row in stored[:5]]
+        backfill[0]["score"] = 40
+        backfill[1]["score"] = "2"  # same value as stored, different type
+        backfill.append(dict(stored[0], source_id="t1_new"))
+        assert dry.upsert_payloads(backfill[:3]).candidates == 3
+        # The second batch repeats a key of the first: the diff counts it once.
+        assert dry.upsert_payloads([*backfill[3:], backfill[0]]).candidates == 4
+        export.close()
+        assert diff.pages == 0
+
+        diff.finish()
+        assert standin.stats.snapshot()["requests_upsert"] == upserts
+        assert (diff.new, diff.changed, diff.unchanged) == (1, 1, 4)
+        assert diff.changed_columns == {"score": 1}
+        assert diff.samples[0].changes == {"score": (1, 40)}
+        # One diff at the end of the run: two in.(...) chunks of 3 values, read 2 rows per page.
+        assert diff.pages == 3
+        log = ListLogger()
+        diff.log_report(log)
+        assert "[Diff] new=1 changed=1 unchanged=4 pages_read=3 changed_columns=score:1" in log.messages[0]
+        assert "score: 1 -> 40" in log.messages[1]
+
+        lines = (tmp_path / "backfill.ndjson").read_bytes().splitlines()
+        assert [json.loads(line)["source_id"] for line in lines] == [row["source_id"] for row in [*backfill, backfill[0]]]
+
+        # Payloads the hash index skips as unchanged are still exported and diffed.
+        index = PayloadHashIndex(str(tmp_path / "hashes.db"))
+        index.record(discovery.table_name, index.filter_changed(discovery, backfill)[1])
+        indexed_diff = TableDiff(client, discovery)
+        indexed_export = PayloadExport(str(tmp_path / "indexed.ndjson"), discovery)
+        indexed = SupabaseWriter(
+            client=client, discovery=discovery, dry_run=True, logger=ListLogger(), service_key_role="service_role",
+            export=indexed_export, diff=indexed_diff, hash_index=index,
+        )
+        assert indexed.upsert_payloads(backfill).candidates == 6
+        indexed_export.close()
+        indexed_diff.finish()
+        assert indexed_export.rows == 6 and (indexed_diff.new, indexed_diff.changed, indexed_diff.unchanged) == (1, 1, 4)
+        index.close()
+
+        assert coerce_to_column("0.50", "numeric") == 0.5 and coerce_to_column("7", "bigint") == 7
+        assert coerce_to_column(1_700_000_000, "timestamp with time zone") == coerce_to_column("2023-11-14T22:13:20Z", "timestamptz")
+        assert coerce_to_column('{"a": 1}', "jsonb") == {"a": 1} and coerce_to_column("n/a", "integer") == "n/a"
+
+        pq = pytest.importorskip("pyarrow.parquet")
+        parquet = PayloadExport(str(tmp_path / "backfill.parquet"), discovery)
+        parquet.write([{"source_id": "t1_a", "season": None}, {"source_id": "t1_b", "season": 2, "confidence": 0.5}])
+        parquet.close()
+        table = pq.read_table(str(tmp_path / "backfill.parquet"))
+        assert str(table.schema.field("season").type) == "int64"
+        assert table.column("season").to_pylist() == [None, 2]
+        assert table.num_rows == parquet.rows == 2
+
+
+def test_title_aliases_cluster_variants_and_resolve_from_the_persisted_map(tmp_path, canonical_discovery_result):
+    pytest.importorskip("rapidfuzz")
+    assert title_core("Is Breaking Bad") == "Breaking Bad"
+    assert title_core("Rewatching Breaking Bad For The Third Time") == "Breaking Bad"
+    assert title_core("Season 2") == "Season 2"
+    for show in ("How I Met Your Mother", "Will & Grace", "Happily Ever After", "That 70s Show", "When Calls the Heart", "Do No Harm"):
+        assert title_core(show) == show
+
+    path = str(tmp_path / "titles.db")
+    titles = TitleAliasStore(path)
+    variants = ["Breaking Bad", "Breaking Bad Season", "Is Breaking Bad", "Breaking Bad S1", "Breakng Bad"]
+    clusters = titles.cluster(variants + ["Breaking Bad", "Star Wars", "Star Wars Andor"])
+    assert {clusters[v] for v in variants} == {"Breaking Bad"}
+    assert clusters["Star Wars Andor"] == "Star Wars Andor"
+    assert titles.new_canonicals == 3
+    titles.close()
+
+    reloaded = TitleAliasStore(path)
+    assert reloaded.resolve("Breakng Bad") == "Breaking Bad"
+    assert reloaded.resolve("Star Wars Season 2") == "Star Wars"
+    assert reloaded.comparisons == 0
+    # A new cluster keeps the title as observed; the trimmed core only matches later variants.
+    assert reloaded.resolve("Is Severance") == "Is Severance"
+    assert reloaded.resolve("Severance Season 2") == "Is Severance"
+
+    client = FakeSupabaseClient(canonical_discovery_result.on_conflict_columns)
+    writer = SupabaseWriter(
+        client=client,
+        discovery=canonical_discovery_result,
+        dry_run=False,
+        logger=ListLogger(),
+        service_key_role="service_role",
+        titles=reloaded,
+    )
+    writer.upsert_candidates([
+        CandidateMoment(
+            content_title="Is Breaking Bad", season=1, episode=3, minute=None, source_url="u", source_type="reddit",
+            source_subreddit="tv", source_kind="comment", source_id="t1_bb", score=1, confidence=0.5, quote="q",
+            created_utc=0,
+        )
+    ])
+    stored = list(client.storage[canonical_discovery_result.table_name].values())
+    assert [row["content_title"] for row in stored] == ["Breaking Bad"]
+    reloaded.close()
+
+    dry = TitleAliasStore(path, persist=False)
+    assert dry.resolve("Mad Men") == "Mad Men"
+    dry.close()
+    looked_up = TitleAliasStore(path)
+    assert "Mad Men" not in looked_up.aliases
+    # lookup (used by --mode moderate --title) never adds to the map.
+    assert looked_up.lookup("Severance Season 3") == "Is Severance" and looked_up.lookup("Mad Men") == "Mad Men"
+    assert "Severance Season 3" not in looked_up.aliases and "Mad Men" not in looked_up.aliases
+    looked_up.close()
+
+
+def test_top_k_retention_bounds_rows_per_title_episode_on_a_mega_thread(canonical_discovery_result):
+    comments = [Comment("e2", "Honestly it gets good at S1E2")]
+    comments += [Comment(f"c{i}", "It really gets good at S1E5, trust me", score=i) for i in range(150)]
+    client = FakeSupabaseClient(canonical_discovery_result.on_conflict_columns)
+    writer = SupabaseWriter(
+        client=client,
+        discovery=canonical_discovery_result,
+        dry_run=False,
+        logger=ListLogger(),
+        service_key_role="service_role",
+        top_k=3,
+    )
+
+    result = index_submission(Submission("mega", "When does Andor get good?", comments=comments), writer)
+
+    stored = list(client.storage[canonical_discovery_result.table_name].values())
+    assert client.upsert_attempts == 1
+    assert result.candidates == writer.retention.offered == 151
+    by_episode: Dict[int, List[str]] = {}
+    for row in stored:
+        by_episode.setdefault(row["episode"], []).append(row["source_id"])
+    assert sorted(by_episode[5]) == ["c147", "c148", "c149"]
+    assert by_episode[2] == ["e2"]
+    assert (writer.retention.kept, writer.retention.evicted) == (4, 147)
+
+    retainer = TopKRetainer(1)
+    low, high = (
+        CandidateMoment(
+            content_title="Andor", season=1, episode=5, minute=None, source_url="u", source_type="reddit",
+            source_subreddit="tv", source_kind="comment", source_id=sid, score=1, confidence=conf, quote="q", created_utc=0,
+        )
+        for sid, conf in (("low", 0.4), ("high", 0.9))
+    )
+    for candidate in (low, replace(low, confidence=0.95), high):
+        retainer.offer(candidate)
+    assert [(c.source_id, c.confidence) for c in retainer.drain()] == [("low", 0.95)]
+    assert (retainer.stats.evicted, retainer.stats.duplicates) == (1, 1)
+    assert retainer.drain() == []
+
+    # The same comment and minute from two rulesets are two rows when the key includes the ruleset.
+    both = [replace(high, ruleset="default"), replace(high, ruleset="enhanced", confidence=0.7)]
+    retainer = TopKRetainer(2)
+    for candidate in both:
+        retainer.offer(candidate)
+    assert [c.ruleset for c in retainer.drain()] == ["default", "enhanced"]
+    assert canonical_discovery_result.conflict_fields == ("source_id", "content_title", "season", "episode", "minute")
+    retainer = TopKRetainer(2, key_fields=canonical_discovery_result.conflict_fields)
+    for candidate in both:
+        retainer.offer(candidate)
+    assert [c.ruleset for c in retainer.drain()] == ["default"]
+
+
+def test_dump_index_reads_only_selected_partitions_and_parallel_matches_inline(tmp_path, canonical_discovery_result):
+    feb, mar = 1675900800, 1678320000  # 2023-02-09, 2023-03-09 UTC
+    submissions = [
+        {"id": "s1", "subreddit": "anime", "created_utc": feb, "title": "When does Frieren get good?", "selftext": "", "score": 5},
+        {"id": "s2", "subreddit": "television", "created_utc": feb, "title": "When does Severance get good?", "selftext": "S1E3", "score": 3},
+        # Crosspost: the parent's subreddit/created_utc must not decide the partition.
+        {"id": "s3", "subreddit": "anime", "created_utc": str(mar), "title": "Does Dandadan get good?", "selftext": "",
+         "crosspost_parent_list": [{"subreddit": "television", "created_utc": feb}]},
+    ]
+    tv = [{"id": f"c{i}", "subreddit": "television", "created_utc": feb + i, "link_id": "t3_s2", "body": f"It gets good at S1E{i}", "score": i} for i in (2, 4, 6, 8)]
+    anime = [{"id": f"c{i}", "subreddit": "anime", "created_utc": feb + i, "link_id": "t3_s1", "body": f"It gets good at S1E{i}", "score": i} for i in (1, 3, 5, 7)]
+    orphan = {"id": "c9", "subreddit": "anime", "created_utc": feb, "link_id": "t3_gone", "body": "It gets good at S1E9", "score": 1}
+    rs, rc = tmp_path / "RS.ndjson", tmp_path / "RC.ndjson"
+    rs.write_text("".join(json.dumps(r) + "\n" for r in submissions))
+    rc.write_text("".join(json.dumps(r) + "\n" for r in [*tv, *anime]) + "\n" + json.dumps(orphan) + "\n{not json\n")
+
+    index = DumpIndex.open(str(rc), stride=2)
+    assert index.partitions() == [("", "", 1), ("anime", "2023-02", 5), ("television", "2023-02", 4)]
+    assert index.is_current() and index.meta()["records"] == "10"
+    selected = index.slices(subreddits=["r/anime"], months=["2023-02"], shards=2)
+    assert [s.records for s in selected] == [4, 1]
+    assert selected[0].start == len("".join(json.dumps(r) + "\n" for r in tv))
+    index.close()
+    index = DumpIndex.open(str(rs), stride=2)
+    assert ("anime", "2023-03", 1) in index.partitions()
+    assert [p for p in index.partitions() if p[1] == "2023-03"] == [("anime", "2023-03", 1)]
+    index.close()
+
+    stored = []
+    for workers in (1, 2):
+        client = FakeSupabaseClient(canonical_discovery_result.on_conflict_columns)
+        writer = SupabaseWriter(
+            client=client, discovery=canonical_discovery_result, dry_run=False, logger=ListLogger(), service_key_role="service_role"
+        )
+        rules = RulesetEvaluator([DEFAULT_RULESET])
+        stats = reprocess_dumps(
+            [str(rs), str(rc)], writer, subreddits=["r/anime"], months=["2023-02"], workers=workers, stride=2, rules=rules, logger=ListLogger()
+        )
+        assert (stats.matched, stats.untitled, stats.malformed, stats.candidates) == (6, 1, 1, 4)
+        assert stats.bytes_read < stats.bytes_total
+        assert rules.found[DEFAULT_RULESET.name] == 4
+        rows = sorted(client.storage[canonical_discovery_result.table_name].values(), key=lambda r: r["source_id"])
+        stored.append(rows)
+    assert stored[0] == stored[1]
+    assert [(r["source_id"], r["episode"], r["content_title"], r["source_kind"]) for r in stored[0]] == [
+        ("c1", 1, "Frieren", "comment"), ("c3", 3, "Frieren", "comment"), ("c5", 5, "Frieren", "comment"), ("c7", 7, "Frieren", "comment"),
+    ]
+    assert stored[0][0]["source_url"] == "https://www.reddit.com/r/anime/comments/s1/_/c1/"
+
+
+def test_count_histogram_quantiles_match_percentile_cont_and_merge():
+    import statistics
+
+    rng = random.Random(3)
+    values = [rng.randint(0, 180) for _ in range(501)]
+    left, right = CountHistogram(), CountHistogram()
+    for i, value in enumerate(values):
+        (left if i % 2 else right).add(value)
+    left.merge(right)
+    q1, median, q3 = statistics.quantiles(values, n=4, method="inclusive")
+    assert left.total == len(values)
+    assert left.quantile(0.5) == pytest.approx(median)
+    assert left.quantile(0.75) - left.quantile(0.25) == pytest.approx(q3 - q1)
+    assert CountHistogram({1: 1, 2: 1, 3: 1, 4: 1}).quantile_disc(0.5) == 2
+    assert CountHistogram.from_json(left.to_json()).counts == left.counts
+    assert CountHistogram().quantile(0.5) is None
+
+
+def test_title_aggregates_dedupe_merge_and_publish_only_changed_titles(tmp_path):
+    supabase = pytest.importorskip("supabase")
+
+    def moment(title, source_id, season, episode, minute, kind="comment"):
+        return CandidateMoment(
+            content_title=title, season=season, episode=episode, minute=minute, source_url="u",
+            source_type="reddit", source_subreddit="tv", source_kind=kind, source_id=source_id,
+            score=1, confidence=0.5, quote="q", created_utc=0,
+        )
+
+    worker_a = TitleAggregateStore(str(tmp_path / "a.db"))
+    worker_b = TitleAggregateStore(str(tmp_path / "b.db"))
+    shared = moment("Andor", "t1_shared", 1, 4, 20)
+    assert worker_a.observe([shared, moment("Andor", "t1_a", 1, 3, 10), moment("Andor", "t3_p", None, 8, None, "submission")]) == 3
+    assert worker_a.observe([shared]) == 0
+    assert worker_b.observe([shared, moment("Andor", "t1_b", 2, 1, 40), moment("Severance", "t1_s", 1, 2, 30)]) == 3
+    worker_b.close()
+    assert worker_a.merge_from(str(tmp_path / "b.db")) == 2
+    assert worker_a.merge_from(str(tmp_path / "b.db")) == 0
+
+    andor = worker_a.get("Andor")
+    assert (andor.mentions, andor.comment_mentions, andor.post_mentions) == (4, 3, 1)
+    metrics = andor.metrics("Andor")
+    assert metrics["episode_median"] == "S1E3"
+    assert (metrics["episode_p25"], metrics["episode_p75"]) == ("E8", "S1E4")
+    assert metrics["minute_median"] == 20 and metrics["minute_iqr"] == 15
+
+    key = postgrest.standin_service_key()
+    with postgrest.PostgrestStandIn() as standin:
+        client = supabase.create_client(standin.url, key)
+        assert worker_a.publish(client, "reddit_title_metrics") == 2
+        assert worker_a.publish(client, "reddit_title_metrics") == 0
+        worker_a.observe([moment("Severance", "t1_s2", 1, 2, 50)])
+        assert worker_a.dirty_titles() == ["Severance"]
+        upserts = standin.stats.snapshot()["requests_upsert"]
+        assert worker_a.publish(client, "reddit_title_metrics") == 1
+        assert standin.stats.snapshot()["requests_upsert"] == upserts + 1
+        rows = {r["content_title"]: r for r in client.table("reddit_title_metrics").select("*").execute().data}
+    assert rows["Severance"]["mentions"] == 2 and rows["Severance"]["minute_median"] == 40
+    assert rows["Andor"]["episode_histogram"] == {"E8": 1, "S1E3": 1, "S1E4": 1, "S2E1": 1}
+    worker_a.close()
+
+
+def test_ruleset_evaluator_single_pass_tags_and_shares_scans():
+    enhanced = load_ruleset("enhanced")
+    assert '"grow the beard"' in enhanced.search_queries
+    assert enhanced.season_episode_patterns == DEFAULT_RULESET.season_episode_patterns
+    parts = ruleset_from_config(
+        {"name": "parts", "season_episode_patterns": [r"\bpart\s*(\d{1,2})\b"], "weights": {"base": 0.2}}
+    )
+    rules = RulesetEvaluator([DEFAULT_RULESET, enhanced, parts])
+    assert rules.search_queries[: len(DEFAULT_RULESET.search_queries)] == list(DEFAULT_RULESET.search_queries)
+    assert len(rules.search_queries) == len(DEFAULT_RULESET.search_queries) + 2
+
+    text = "It grows the beard at S2E3, part 4"
+    # Every ruleset reports its own rows at its own confidence; only enhanced knows the hook phrase.
+    found = [(s, e, minute, conf, tag) for s, e, minute, conf, _, tag in rules.extract(text)]
+    assert found == [(2, 3, None, 0.3, "default"), (2, 3, None, 0.5, "enhanced"), (None, 4, None, 0.2, "parts")]
+    assert rules.found == {"default": 1, "enhanced": 1, "parts": 1}
+    assert rules.exclusive == {"default": 0, "enhanced": 0, "parts": 1}
+    # A submission surfaced by an enhanced-only query is what enhanced alone would have crawled.
+    assert [tag for *_, tag in rules.extract(text, query='"grow the beard"')] == ["enhanced"]
+    assert rules.exclusive == {"default": 0, "enhanced": 1, "parts": 1}
+    log = ListLogger()
+    rules.log_report(log)
+    assert "enhanced: found=2 exclusive=1 mean_confidence=0.500" in log.messages[-1]
+    assert rules.passes_prefilter("see part 7") and not DEFAULT_RULESET.extract("see part 7")
+
+    calls = []
+    real_finditer = re.Pattern.finditer
+
+    class CountingPattern:
+        def __init__(self, rx):
+            self.rx, self.pattern, self.flags, self.groups = rx, rx.pattern, rx.flags, rx.groups
+
+        def finditer(self, text, *bounds):
+            calls.append(self.pattern)
+            return real_finditer(self.rx, text, *bounds)
+
+    shared = tuple(CountingPattern(rx) for rx in DEFAULT_RULESET.season_episode_patterns)
+    twins = [
+        Ruleset(name, (), DEFAULT_RULESET.hook_phrases, shared, DEFAULT_RULESET.minute_patterns)  # type: ignore[arg-type]
+        for name in ("a", "b")
+    ]
+    RulesetEvaluator(twins).extract("S1E2")
+    assert len(calls) == len(shared)
+    with pytest.raises(ValueError):
+        ruleset_from_config({"minute_patterns": [r"(\d+)h(\d+)m"]})
+
+
+def test_default_ruleset_reads_season_n_episode_m_as_season_and_episode():
+    # Changed from the pre-ruleset extractor, which read any pattern containing "Ep" as episode-only
+    # and stored "Season 2 Episode 5" as [(None, 2), (None, 5)].
+    assert [m[:2] for m in DEFAULT_RULESET.extract("Season 2 Episode 5")] == [(2, 5), (None, 5)]
+    # The other patterns read as before.
+    assert [m[:2] for m in DEFAULT_RULESET.extract("S2E5, 3x04 or Ep 7")] == [(2, 5), (3, 4), (None, 7)]
+
+
+@pytest.mark.parametrize("case", sorted(PATHOLOGICAL))
+def test_regex_paths_stay_bounded_on_pathological_input(case):
+    text = PATHOLOGICAL[case](200_000)
+    rules = RulesetEvaluator([DEFAULT_RULESET, load_ruleset("enhanced")])
+    for fn in (rules.extract, normalize_show_title, snippet):
+        started = time.perf_counter()
+        fn(text)
+        assert time.perf_counter() - started < 0.5, fn
+    assert rules.capped == 1
+
+
+def test_document_builds_each_derived_view_once_across_stages():
+    rules = RulesetEvaluator([DEFAULT_RULESET, load_ruleset("enhanced")])
+    text = "It really   gets good at S2E3,\n\nabout 20 minutes in. " + "filler " * 600
+    patterns = {(rx.pattern, rx.flags) for r in rules.rulesets for rx in (*r.season_episode_patterns, *r.minute_patterns)}
+    before = dict(Document.views)
+
+    doc = rules.document(text)
+    assert rules.passes_prefilter(doc) and rules.passes_prefilter(doc)
+    moments = rules.extract(doc)
+    built = {name: Document.views[name] - before[name] for name in before}
+
+    assert moments and all(quote is doc.quote for (_, _, _, _, quote, _) in moments)
+    assert doc.quote == snippet(text) and doc.quote.startswith("It really gets good at S2E3, about 20 minutes in.")
+    assert built == {"lowered": 1, "collapsed": 1, "quote": 1, "scan": len(patterns), "prefilter": 1}
+    lazy = rules.document("lol same")
+    assert not rules.passes_prefilter(lazy) and rules.extract(lazy) == []
+    assert (lazy._lowered, lazy._quote) == (None, None)
+
+
+def test_chunked_scan_matches_whole_document_scan():
+    rng = random.Random(5)
+    whole = RulesetEvaluator([DEFAULT_RULESET], limits=ScanLimits(chunk_chars=10**9, time_budget=60))
+    chunked = RulesetEvaluator([DEFAULT_RULESET], limits=ScanLimits(chunk_chars=97, overlap=32, time_budget=60))
+    for _ in range(200):
+        doc = fuzz_document(rng, 3000)
+        assert chunked.extract(doc) == whole.extract(doc)
+
+    timed = RulesetEvaluator([DEFAULT_RULESET], limits=ScanLimits(chunk_chars=64, time_budget=0.0))
+    timed.extract("It picks up at S1E4. " * 200)
+    assert timed.timed_out == 1
+    assert snippet("x " * 10_000).endswith("?") and len(snippet("x " * 10_000)) == 240
+    # Whitespace past the first window before the content: the quote is still the text, as before.
+    assert snippet(" " * 5_000 + "It gets good at S2E3.") == "It gets good at S2E3."
+    assert snippet("\n" * 5_000 + "x " * 200) == ("x " * 120)[:239] + "?"
+    assert snippet("It gets good at S2E3." + " " * 5_000) == "It gets good at S2E3."
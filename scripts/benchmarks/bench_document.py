@@ -0,0 +1,163 @@
+#!/usr/bin/env python3
+"""
+bench_document.py
+
+Per-document cost of the extraction stages (prefilter, regex scans and hook
+checks for every ruleset, snippet, candidate payloads) on synthetic comment
+and submission text from synthetic_reddit.py, in two modes:
+
+  shared     one Document per text, as the pipeline runs it: each derived view
+             (lowercased text, collapsed head, snippet, pattern matches) is
+             built once and read by every stage
+  per_stage  every stage derives its own views from the raw string: the
+             prefilter, each ruleset and each moment's snippet
+
+Reports docs/sec, derived-view builds per document (Document.views plus the
+per-moment snippets of per_stage), and the Python heap allocated per
+document (mean and worst transient peak, measured with tracemalloc in a
+second, untimed pass).
+
+Example usage (from the repo root):
+  python -m scripts.benchmarks.bench_document
+  python -m scripts.benchmarks.bench_document --docs 50000 --rulesets default enhanced --json bench_document.json
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import sys
+import time
+import tracemalloc
+from dataclasses import asdict, dataclass
+from typing import Callable, Dict, List, Optional, Sequence
+
+from scripts.benchmarks.bench_pipeline import bench_discovery
+from scripts.benchmarks.synthetic_reddit import CorpusConfig, SyntheticCorpus
+from scripts.wigg_reddit_seed import (
+    Document,
+    RulesetEvaluator,
+    build_candidate,
+    load_ruleset,
+    snippet,
+)
+
+
+@dataclass
+class DocumentResult:
+    mode: str
+    docs: int
+    candidates: int
+    seconds: float
+    docs_per_sec: float
+    views_per_doc: float
+    views: Dict[str, int]
+    mean_alloc_kib: float
+    max_alloc_kib: float
+
+
+def corpus_texts(docs: int, seed: int) -> List[str]:
+    """Submission title+selftext and comment bodies, in crawl order."""
+    texts: List[str] = []
+    for submission in SyntheticCorpus(CorpusConfig(comments=docs, seed=seed)):
+        texts.append(f"{submission.title}\n{submission.selftext}")
+        texts.extend(c.body for c in submission.comments.list())
+    return texts[:docs]
+
+
+def make_shared(rules: RulesetEvaluator, mapping: Dict[str, Optional[str]], extra: Dict[str, int]) -> Callable[[str], int]:
+    def run(text: str) -> int:
+        doc = rules.document(text)
+        if not rules.passes_prefilter(doc):
+            return 0
+        moments = rules.extract(doc)
+        for (s, e, minute, conf, quote, ruleset) in moments:
+            build_candidate("Show", s, e, minute, conf, None, quote, ruleset, "comment").to_payload(mapping)
+        return len(moments)
+
+    return run
+
+
+def make_per_stage(rules: RulesetEvaluator, mapping: Dict[str, Optional[str]], extra: Dict[str, int]) -> Callable[[str], int]:
+    def run(text: str) -> int:
+        if not rules.passes_prefilter(text):
+            return 0
+        found = 0
+        for ruleset in rules.rulesets:
+            for (s, e, minute, conf, _quote) in ruleset.extract(text):
+                extra["quote"] += 1
+                quote = snippet(text)
+                build_candidate("Show", s, e, minute, conf, None, quote, ruleset.name, "comment").to_payload(mapping)
+                found += 1
+        return found
+
+    return run
+
+
+MODES = {"shared": make_shared, "per_stage": make_per_stage}
+
+
+def run_mode(mode: str, texts: Sequence[str], rules: RulesetEvaluator) -> DocumentResult:
+    mapping = bench_discovery().column_mapping
+    extra: Dict[str, int] = {"quote": 0}
+    run = MODES[mode](rules, mapping, extra)
+
+    before = dict(Document.views)
+    candidates = 0
+    started = time.perf_counter()
+    for text in texts:
+        candidates += run(text)
+    seconds = time.perf_counter() - started
+    views = {name: Document.views[name] - before[name] + extra.get(name, 0) for name in Document.views}
+
+    # Second pass, untimed: the heap each document allocates at its peak.
+    allocs: List[int] = []
+    tracemalloc.start()
+    for text in texts:
+        tracemalloc.reset_peak()
+        base = tracemalloc.get_traced_memory()[0]
+        run(text)
+        allocs.append(tracemalloc.get_traced_memory()[1] - base)
+    tracemalloc.stop()
+
+    return DocumentResult(
+        mode=mode,
+        docs=len(texts),
+        candidates=candidates,
+        seconds=seconds,
+        docs_per_sec=len(texts) / seconds if seconds else 0.0,
+        views_per_doc=sum(views.values()) / len(texts) if texts else 0.0,
+        views=views,
+        mean_alloc_kib=sum(allocs) / len(allocs) / 1024 if allocs else 0.0,
+        max_alloc_kib=max(allocs, default=0) / 1024,
+    )
+
+
+def main(argv: Optional[Sequence[str]] = None) -> int:
+    ap = argparse.ArgumentParser(description="Per-document cost of extraction with shared vs per-stage derived views.")
+    ap.add_argument("--docs", type=int, default=20_000, help="Texts to process")
+    ap.add_argument("--rulesets", nargs="*", default=["default", "enhanced"], help="Rulesets evaluated together")
+    ap.add_argument("--modes", nargs="*", choices=list(MODES), default=list(MODES), help="Modes to run")
+    ap.add_argument("--seed", type=int, default=1234, help="Corpus RNG seed")
+    ap.add_argument("--json", type=str, default=None, help="Also write results to this JSON file")
+    args = ap.parse_args(argv)
+
+    texts = corpus_texts(args.docs, args.seed)
+    rules = RulesetEvaluator([load_ruleset(name) for name in args.rulesets])
+    results: List[Dict[str, object]] = []
+    print(f"{'mode':<10} {'docs':>8} {'cands':>8} {'docs/s':>9} {'views/doc':>10} {'alloc_kib':>10} {'max_kib':>9}  views")
+    for mode in args.modes:
+        result = run_mode(mode, texts, rules)
+        print(
+            f"{result.mode:<10} {result.docs:>8} {result.candidates:>8} {result.docs_per_sec:>9.0f} {result.views_per_doc:>10.2f} "
+            f"{result.mean_alloc_kib:>10.2f} {result.max_alloc_kib:>9.1f}  "
+            + " ".join(f"{name}={count}" for name, count in result.views.items())
+        )
+        results.append(asdict(result))
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as fh:
+            json.dump(results, fh, indent=2)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,174 @@
+#!/usr/bin/env python3
+"""
+bench_pipeline.py
+
+End-to-end throughput benchmark for the seed pipeline. Synthetic threads from
+synthetic_reddit.py go through index_submission (title + comment extraction,
+candidate building, payload mapping, upserts) into the FakeSupabaseClient of
+scripts/standins/fake_supabase.py, which keeps only conflict keys here. No
+network is involved.
+
+Reports comments/sec, submissions/sec, candidates, writes issued (upsert calls
+and row-count queries) and peak memory for each scale. Each scale runs in a
+fresh interpreter, so its peak RSS (or tracemalloc peak) is its own and not
+the high-water mark of an earlier, larger scale.
+
+Example usage (from the repo root):
+  python -m scripts.benchmarks.bench_pipeline --scales 10k 100k
+  python -m scripts.benchmarks.bench_pipeline --scales 1m --triage --json bench_pipeline.json
+"""
+from __future__ import annotations
+
+import argparse
+import gc
+import json
+import logging
+import multiprocessing
+import sys
+import time
+import tracemalloc
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import asdict, dataclass
+from typing import Dict, List, Optional, Sequence
+
+from scripts.benchmarks.synthetic_reddit import CorpusConfig, SyntheticCorpus
+from scripts.standins.fake_supabase import FakeSupabaseClient
+from scripts.wigg_reddit_seed import (
+    CANONICAL_FIELD_SYNONYMS,
+    ColumnInfo,
+    DiscoveryResult,
+    SubmissionTriage,
+    SupabaseWriter,
+    index_submission,
+)
+
+SUFFIXES = {"k": 1_000, "m": 1_000_000}
+
+
+@dataclass
+class PipelineResult:
+    comments: int
+    submissions: int
+    candidates: int
+    upserts: int
+    count_queries: int
+    rows_stored: int
+    seconds: float
+    comments_per_sec: float
+    submissions_per_sec: float
+    peak_mb: float
+    triage_skip_rate: Optional[float] = None
+
+
+def parse_scale(value: str) -> int:
+    value = value.strip().lower().replace("_", "")
+    if value and value[-1] in SUFFIXES:
+        return int(float(value[:-1]) * SUFFIXES[value[-1]])
+    return int(value)
+
+
+def bench_discovery() -> DiscoveryResult:
+    columns = ["id", *CANONICAL_FIELD_SYNONYMS.keys()]
+    on_conflict = ["source_id", "content_title", "season", "episode", "minute"]
+    return DiscoveryResult(
+        table_schema="public",
+        table_name="moments_seed",
+        columns={name: ColumnInfo(name=name) for name in columns},
+        column_mapping={name: name for name in CANONICAL_FIELD_SYNONYMS},
+        unique_constraint_name="moments_seed_uniq_idx",
+        on_conflict_columns=on_conflict,
+        rls_enabled=False,
+        raw_constraints={
+            "moments_seed_pkey": {"type": "PRIMARY KEY", "columns": ["id"]},
+            "moments_seed_uniq_idx": {"type": "UNIQUE", "columns": on_conflict},
+        },
+    )
+
+
+def peak_rss_mb() -> Optional[float]:
+    try:
+        import resource
+    except ImportError:  # Windows
+        return None
+    # ru_maxrss is KiB on Linux and bytes on macOS.
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return rss / (1024 * 1024) if sys.platform == "darwin" else rss / 1024
+
+
+def run_pipeline(comments: int, *, triage: bool = False, seed: int = 1234, trace_memory: bool = False) -> PipelineResult:
+    discovery = bench_discovery()
+    client = FakeSupabaseClient(discovery.on_conflict_columns, keep_rows=False)
+    quiet = logging.getLogger("wigg.bench.pipeline")
+    quiet.setLevel(logging.WARNING)
+    writer = SupabaseWriter(
+        client=client,
+        discovery=discovery,
+        dry_run=False,
+        logger=quiet,
+        service_key_role="service_role",
+    )
+    triage_state = SubmissionTriage() if triage else None
+    corpus = SyntheticCorpus(CorpusConfig(comments=comments, seed=seed))
+
+    gc.collect()
+    if trace_memory:
+        tracemalloc.start()
+    candidates = 0
+    started = time.perf_counter()
+    for submission in corpus:
+        decision = triage_state.decide(submission) if triage_state is not None else None
+        candidates += index_submission(submission, writer, decision).candidates
+    seconds = time.perf_counter() - started
+    if trace_memory:
+        peak_mb = tracemalloc.get_traced_memory()[1] / (1024 * 1024)
+        tracemalloc.stop()
+    else:
+        peak_mb = peak_rss_mb() or 0.0
+
+    return PipelineResult(
+        comments=corpus.comments,
+        submissions=corpus.submissions,
+        candidates=candidates,
+        upserts=client.upsert_attempts,
+        count_queries=client.count_calls,
+        rows_stored=client.row_count(discovery.table_name),
+        seconds=seconds,
+        comments_per_sec=corpus.comments / seconds if seconds else 0.0,
+        submissions_per_sec=corpus.submissions / seconds if seconds else 0.0,
+        peak_mb=peak_mb,
+        triage_skip_rate=triage_state.skip_rate if triage_state is not None else None,
+    )
+
+
+def run_isolated(comments: int, **kwargs: object) -> PipelineResult:
+    """run_pipeline in a freshly spawned interpreter; ru_maxrss is per process and never goes down."""
+    with ProcessPoolExecutor(max_workers=1, mp_context=multiprocessing.get_context("spawn")) as pool:
+        return pool.submit(run_pipeline, comments, **kwargs).result()
+
+
+def main(argv: Optional[Sequence[str]] = None) -> int:
+    ap = argparse.ArgumentParser(description="Synthetic end-to-end benchmark of the Reddit seed pipeline.")
+    ap.add_argument("--scales", nargs="*", default=["10k", "100k"], help="Comment counts to run (10k, 1m, 10m, ...)")
+    ap.add_argument("--triage", action="store_true", help="Apply submission triage before comment expansion")
+    ap.add_argument("--seed", type=int, default=1234, help="Corpus RNG seed")
+    ap.add_argument("--tracemalloc", action="store_true", help="Measure peak Python heap with tracemalloc (slower) instead of RSS")
+    ap.add_argument("--json", type=str, default=None, help="Also write results to this JSON file")
+    args = ap.parse_args(argv)
+
+    results: List[Dict[str, object]] = []
+    print(f"{'comments':>10} {'subs':>8} {'cands':>9} {'upserts':>9} {'counts':>9} {'secs':>8} {'comments/s':>11} {'peak_mb':>8}")
+    for scale in args.scales:
+        result = run_isolated(parse_scale(scale), triage=args.triage, seed=args.seed, trace_memory=args.tracemalloc)
+        print(
+            f"{result.comments:>10} {result.submissions:>8} {result.candidates:>9} {result.upserts:>9} "
+            f"{result.count_queries:>9} {result.seconds:>8.2f} {result.comments_per_sec:>11.0f} {result.peak_mb:>8.1f}"
+        )
+        results.append(asdict(result))
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as fh:
+            json.dump(results, fh, indent=2)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
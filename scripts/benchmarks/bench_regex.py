@@ -0,0 +1,135 @@
+#!/usr/bin/env python3
+"""
+bench_regex.py
+
+Adversarial and fuzzed inputs for the text paths that run user-controlled
+Reddit text through regexes: RulesetEvaluator.extract (with every bundled
+ruleset), normalize_show_title, title_core, title_match_strength and snippet.
+
+Each case reports the worst per-document latency. The run fails if any case
+goes over --budget-ms, so a single pathological comment cannot stall a worker.
+
+Example usage (from the repo root):
+  python -m scripts.benchmarks.bench_regex
+  python -m scripts.benchmarks.bench_regex --fuzz 2000 --budget-ms 100 --rulesets default enhanced
+"""
+from __future__ import annotations
+
+import argparse
+import random
+import sys
+import time
+from dataclasses import dataclass
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+from scripts.benchmarks.synthetic_reddit import HOOKS, MENTIONS, NOISE
+from scripts.wigg_reddit_seed import (
+    RulesetEvaluator,
+    load_ruleset,
+    normalize_show_title,
+    snippet,
+    title_match_strength,
+)
+from scripts.wigg_seed_storage import title_core
+
+# Inputs that are slow for backtracking regexes: unbalanced brackets, long
+# whitespace and digit runs, near-misses of every pattern, and huge walls.
+PATHOLOGICAL: Dict[str, Callable[[int], str]] = {
+    "unbalanced_parens": lambda n: "(" * n,
+    "unbalanced_brackets": lambda n: "[" * n,
+    "nested_parens": lambda n: "(a " * (n // 3),
+    "digit_space_runs": lambda n: "1 " * (n // 2),
+    "whitespace_after_digit": lambda n: "1" + " " * n,
+    "season_near_miss": lambda n: "Season " * (n // 7),
+    "episode_near_miss": lambda n: "S1E" * (n // 3),
+    "minute_near_miss": lambda n: "12 mi" * (n // 5),
+    "long_token": lambda n: "a" * n,
+    "digits": lambda n: "9" * n,
+    "mention_wall": lambda n: ("It gets good around S1E5 at 20 minutes. " * (n // 40 + 1))[:n],
+    "unicode_wall": lambda n: ("ｓ１ｅ５ 🎬 épisode ５ " * (n // 16 + 1))[:n],
+}
+
+
+@dataclass
+class CaseResult:
+    case: str
+    target: str
+    chars: int
+    worst_ms: float
+
+
+def fuzz_document(rng: random.Random, max_chars: int) -> str:
+    """Random mix of real mentions, noise, brackets and whitespace runs."""
+    parts: List[str] = []
+    size = 0
+    limit = rng.randint(1, max_chars)
+    while size < limit:
+        roll = rng.random()
+        if roll < 0.3:
+            part = rng.choice(MENTIONS).format(s=rng.randint(0, 99), e=rng.randint(0, 999), m=rng.randint(0, 999))
+        elif roll < 0.5:
+            part = rng.choice(HOOKS)
+        elif roll < 0.7:
+            part = rng.choice(NOISE)
+        elif roll < 0.85:
+            part = rng.choice("([{)]}") * rng.randint(1, 200)
+        else:
+            part = rng.choice([" ", "\n", "\t"]) * rng.randint(1, 500)
+        parts.append(part)
+        size += len(part) + 1
+    return " ".join(parts)
+
+
+def time_worst(fn: Callable[[str], object], docs: Sequence[str]) -> Tuple[float, int]:
+    worst, chars = 0.0, 0
+    for doc in docs:
+        started = time.perf_counter()
+        fn(doc)
+        elapsed = (time.perf_counter() - started) * 1000.0
+        if elapsed > worst:
+            worst, chars = elapsed, len(doc)
+    return worst, chars
+
+
+def run(sizes: Sequence[int], fuzz: int, rulesets: Sequence[str], seed: int) -> List[CaseResult]:
+    evaluator = RulesetEvaluator([load_ruleset(name) for name in rulesets])
+    targets: Dict[str, Callable[[str], object]] = {
+        "extract": evaluator.extract,
+        "normalize_show_title": normalize_show_title,
+        "title_core": title_core,
+        "title_match_strength": title_match_strength,
+        "snippet": snippet,
+    }
+    cases: Dict[str, List[str]] = {name: [make(n) for n in sizes] for name, make in PATHOLOGICAL.items()}
+    rng = random.Random(seed)
+    cases["fuzz"] = [fuzz_document(rng, max(sizes)) for _ in range(fuzz)]
+
+    results: List[CaseResult] = []
+    for case, docs in cases.items():
+        for target, fn in targets.items():
+            worst, chars = time_worst(fn, docs)
+            results.append(CaseResult(case, target, chars, worst))
+    return results
+
+
+def main(argv: Optional[Sequence[str]] = None) -> int:
+    ap = argparse.ArgumentParser(description="Worst-case latency of regex text paths on adversarial input.")
+    ap.add_argument("--sizes", type=int, nargs="*", default=[1_000, 10_000, 100_000, 1_000_000], help="Document sizes in chars")
+    ap.add_argument("--fuzz", type=int, default=500, help="Random documents to try")
+    ap.add_argument("--rulesets", nargs="*", default=["default", "enhanced"], help="Rulesets evaluated together")
+    ap.add_argument("--seed", type=int, default=1234, help="Fuzz RNG seed")
+    ap.add_argument("--budget-ms", type=float, default=250.0, help="Fail if any document takes longer than this")
+    args = ap.parse_args(argv)
+
+    results = run(args.sizes, args.fuzz, args.rulesets, args.seed)
+    print(f"{'case':<24} {'target':<22} {'chars':>9} {'worst_ms':>9}")
+    over = 0
+    for result in results:
+        flag = "" if result.worst_ms <= args.budget_ms else "  OVER BUDGET"
+        over += bool(flag)
+        print(f"{result.case:<24} {result.target:<22} {result.chars:>9} {result.worst_ms:>9.2f}{flag}")
+    return 1 if over else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,102 @@
+#!/usr/bin/env python3
+"""
+bench_serialization.py
+
+Encode/decode throughput of each installed JSON backend on a batch of
+synthetic candidate rows (10k by default, the size of a large upsert):
+
+  httpx_json      what supabase-py sends: to_payload dicts + httpx's json=
+  dicts           to_payload dicts encoded by the backend (hash-index path)
+  candidates      JsonCodec.encode_candidates, which skips the dicts when the
+                  backend encodes dataclasses natively
+  decode          the encoded batch parsed back into dicts
+
+Example usage (from the repo root):
+  python -m scripts.benchmarks.bench_serialization
+  python -m scripts.benchmarks.bench_serialization --rows 50000 --repeat 10 --backends json orjson
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import sys
+import time
+from dataclasses import dataclass
+from typing import Callable, List, Optional, Sequence
+
+from scripts.benchmarks.bench_writer import synthetic_candidates
+from scripts.wigg_reddit_seed import CANDIDATE_FIELDS, JSON_BACKENDS, JsonCodec, make_codec
+
+
+@dataclass
+class SerializationResult:
+    backend: str
+    case: str
+    rows: int
+    bytes: int
+    best_ms: float
+
+    @property
+    def rows_per_sec(self) -> float:
+        return self.rows / (self.best_ms / 1000.0) if self.best_ms else 0.0
+
+    @property
+    def mb_per_sec(self) -> float:
+        return self.bytes / 1e6 / (self.best_ms / 1000.0) if self.best_ms else 0.0
+
+
+def best_of(fn: Callable[[], object], repeat: int) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - started)
+    return best * 1000.0
+
+
+def run(rows: int, repeat: int, backends: Sequence[str]) -> List[SerializationResult]:
+    candidates = list(synthetic_candidates(rows, update_ratio=0.0))
+    mapping = {name: name for name in CANDIDATE_FIELDS}
+    baseline = json.dumps([c.to_payload(mapping) for c in candidates]).encode("utf-8")
+    results = [
+        SerializationResult(
+            "json", "httpx_json", rows, len(baseline),
+            best_of(lambda: json.dumps([c.to_payload(mapping) for c in candidates]).encode("utf-8"), repeat),
+        )
+    ]
+    for name in backends:
+        try:
+            codec: JsonCodec = make_codec(name)
+        except ImportError:
+            print(f"skipping {name}: not installed", file=sys.stderr)
+            continue
+        body = codec.encode_candidates(candidates, mapping)
+        assert codec.loads(body) == json.loads(baseline), f"{name} output differs from stdlib"
+        cases = {
+            "dicts": lambda: codec.dumps([c.to_payload(mapping) for c in candidates]),
+            "candidates": lambda: codec.encode_candidates(candidates, mapping),
+            "decode": lambda: codec.loads(body),
+        }
+        for case, fn in cases.items():
+            results.append(SerializationResult(name, case, rows, len(body), best_of(fn, repeat)))
+    return results
+
+
+def main(argv: Optional[Sequence[str]] = None) -> int:
+    ap = argparse.ArgumentParser(description="JSON encode/decode throughput per backend on candidate batches.")
+    ap.add_argument("--rows", type=int, default=10_000, help="Rows per batch")
+    ap.add_argument("--repeat", type=int, default=5, help="Runs per case; the best is reported")
+    ap.add_argument("--backends", nargs="*", default=list(JSON_BACKENDS), help="Backends to compare")
+    args = ap.parse_args(argv)
+
+    print(f"{'backend':<9} {'case':<12} {'rows':>7} {'kB':>7} {'best_ms':>8} {'rows/s':>10} {'MB/s':>7}")
+    for result in run(args.rows, args.repeat, args.backends):
+        print(
+            f"{result.backend:<9} {result.case:<12} {result.rows:>7} {result.bytes / 1024:>7.0f} "
+            f"{result.best_ms:>8.1f} {result.rows_per_sec:>10.0f} {result.mb_per_sec:>7.0f}"
+        )
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,117 @@
+#!/usr/bin/env python3
+"""
+bench_startup.py
+
+Measure cold import time of the Reddit seed scripts using `python -X importtime`
+and report which heavy third-party modules get pulled in at import.
+
+Each sample runs in a fresh interpreter so caches from earlier samples do not
+leak into the measurement. Bytecode is compiled once up front so the first
+sample does not pay for writing .pyc files.
+
+Example usage (from the repo root):
+  python -m scripts.benchmarks.bench_startup --runs 5
+  python -m scripts.benchmarks.bench_startup --module scripts.wigg_reddit_seed_enhanced --budget-ms 50
+"""
+from __future__ import annotations
+
+import argparse
+import compileall
+import re
+import statistics
+import subprocess
+import sys
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Dict, List, Sequence, Tuple
+
+REPO_ROOT = Path(__file__).resolve().parents[2]
+
+HEAVY_MODULES = ["praw", "prawcore", "supabase", "postgrest", "rapidfuzz", "dateutil", "tenacity", "dotenv", "urllib.request"]
+
+IMPORTTIME_LINE = re.compile(r"^import time:\s*(\d+)\s*\|\s*(\d+)\s*\|(\s*)(\S+)\s*$")
+
+
+@dataclass(frozen=True)
+class ImportSample:
+    module: str
+    cumulative_us: int
+    heavy_loaded: List[str]
+    top_offenders: List[Tuple[str, int]]
+
+
+def parse_importtime(stderr: str) -> Dict[str, int]:
+    """Map module name -> cumulative import time (us) from `-X importtime` output."""
+    timings: Dict[str, int] = {}
+    for line in stderr.splitlines():
+        match = IMPORTTIME_LINE.match(line)
+        if not match:
+            continue
+        timings[match.group(4)] = int(match.group(2))
+    return timings
+
+
+def import_subtree(stderr: str, module: str) -> List[Tuple[str, int]]:
+    """Return (name, cumulative us) for modules imported while importing `module`."""
+    rows: List[Tuple[int, str, int]] = []
+    for line in stderr.splitlines():
+        match = IMPORTTIME_LINE.match(line)
+        if match:
+            rows.append((len(match.group(3)), match.group(4), int(match.group(2))))
+    for index in range(len(rows) - 1, -1, -1):
+        depth, name, _ = rows[index]
+        if name != module:
+            continue
+        subtree: List[Tuple[str, int]] = []
+        cursor = index - 1
+        while cursor >= 0 and rows[cursor][0] > depth:
+            subtree.append((rows[cursor][1], rows[cursor][2]))
+            cursor -= 1
+        return subtree
+    return []
+
+
+def sample_import(module: str) -> ImportSample:
+    probe = (
+        "import sys; import %s; "
+        "print(','.join(m for m in %r if m in sys.modules))"
+    ) % (module, HEAVY_MODULES)
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", probe],
+        cwd=REPO_ROOT,
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    timings = parse_importtime(proc.stderr)
+    heavy = [m for m in proc.stdout.strip().split(",") if m]
+    top = sorted(import_subtree(proc.stderr, module), key=lambda pair: pair[1], reverse=True)[:5]
+    return ImportSample(module=module, cumulative_us=timings.get(module, 0), heavy_loaded=heavy, top_offenders=top)
+
+
+def run(modules: Sequence[str], runs: int, budget_ms: float) -> int:
+    compileall.compile_dir(str(REPO_ROOT / "scripts"), quiet=1)
+    failures = 0
+    for module in modules:
+        samples = [sample_import(module) for _ in range(runs)]
+        times_ms = [s.cumulative_us / 1000.0 for s in samples]
+        median_ms = statistics.median(times_ms)
+        heavy = sorted({m for s in samples for m in s.heavy_loaded})
+        print(
+            f"{module}: median={median_ms:.1f}ms min={min(times_ms):.1f}ms max={max(times_ms):.1f}ms "
+            f"runs={runs} heavy_loaded={','.join(heavy) or '<none>'}"
+        )
+        for name, us in samples[-1].top_offenders:
+            print(f"    {name:<40} {us / 1000.0:8.1f}ms")
+        if heavy or (budget_ms and median_ms > budget_ms):
+            failures += 1
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser(description="Measure import time of the Reddit seed scripts.")
+    ap.add_argument("--module", nargs="*", default=["scripts.wigg_reddit_seed", "scripts.wigg_reddit_seed_enhanced"], help="Modules to import")
+    ap.add_argument("--runs", type=int, default=5, help="Fresh-interpreter samples per module")
+    ap.add_argument("--budget-ms", type=float, default=0.0, help="Fail if the median import time exceeds this (0 = report only)")
+    args = ap.parse_args()
+    sys.exit(run(args.module, args.runs, args.budget_ms))
@@ -0,0 +1,116 @@
+#!/usr/bin/env python3
+"""
+bench_titles.py
+
+Resolves a large stream of normalized title variants with TitleAliasStore,
+in arrival order as the writer does during a crawl, and reports throughput,
+fuzzy comparisons against the n^2/2 of an all-pairs pass, and pairwise
+precision/recall against the known show of every variant.
+
+Variants come from the synthetic Reddit title templates run through
+normalize_show_title, plus single-character typos, over invented show names.
+
+Example usage (from the repo root):
+  python -m scripts.benchmarks.bench_titles
+  python -m scripts.benchmarks.bench_titles --titles 100000 --shows 20000 --threshold 88
+"""
+from __future__ import annotations
+
+import argparse
+import random
+import sys
+import tempfile
+import time
+from collections import Counter
+from typing import Dict, List, Optional, Sequence, Tuple
+
+from scripts.benchmarks.synthetic_reddit import TITLE_TEMPLATES
+from scripts.wigg_reddit_seed import normalize_show_title
+from scripts.wigg_seed_storage import TitleAliasStore
+
+SYLLABLES = "ka lo mi ra ten vor sil an bel dro fen gar hal is jun kel mor nes op pra quin ros tal ur vek wyn zor".split()
+EXTRA_TEMPLATES = ["Is {show} worth it", "{show} season 2", "{show} S1", "{show} series"]
+
+
+def make_shows(count: int, rng: random.Random) -> List[str]:
+    """Distinct pseudo show names of one to three invented words."""
+    def word() -> str:
+        return "".join(rng.choice(SYLLABLES) for _ in range(rng.randint(2, 3))).capitalize()
+
+    shows: Dict[str, None] = {}
+    while len(shows) < count:
+        shows[rng.choice(["", "", "The "]) + " ".join(word() for _ in range(rng.choice([1, 2, 2, 3])))] = None
+    return list(shows)
+
+
+def typo(name: str, rng: random.Random) -> str:
+    i = rng.randrange(1, len(name))
+    return name[:i] + name[i + 1 :] if rng.random() < 0.5 else name[:i] + name[i:][:1] * 2 + name[i + 1 :]
+
+
+def make_titles(count: int, shows: Sequence[str], seed: int) -> List[Tuple[str, str]]:
+    """(normalized title, true show) pairs."""
+    rng = random.Random(seed)
+    templates = [*TITLE_TEMPLATES, *EXTRA_TEMPLATES]
+    out: List[Tuple[str, str]] = []
+    for _ in range(count):
+        show = rng.choice(shows)
+        spelled = typo(show, rng) if rng.random() < 0.05 and len(show) > 8 else show
+        out.append((normalize_show_title(rng.choice(templates).format(show=spelled)), show))
+    return out
+
+
+def pairwise_scores(assigned: Dict[str, str], truth: Dict[str, str]) -> Tuple[float, float]:
+    """Pairwise precision/recall over distinct titles."""
+    def pairs(groups: Counter) -> int:
+        return sum(n * (n - 1) // 2 for n in groups.values())
+
+    predicted = Counter(assigned[t] for t in truth)
+    actual = Counter(truth.values())
+    both = Counter((assigned[t], truth[t]) for t in truth)
+    true_pairs = pairs(both)
+    precision = true_pairs / pairs(predicted) if pairs(predicted) else 1.0
+    recall = true_pairs / pairs(actual) if pairs(actual) else 1.0
+    return precision, recall
+
+
+def main(argv: Optional[Sequence[str]] = None) -> int:
+    ap = argparse.ArgumentParser(description="Blocked fuzzy clustering of title variants.")
+    ap.add_argument("--titles", type=int, default=100_000, help="Title occurrences to cluster")
+    ap.add_argument("--shows", type=int, default=10_000, help="Distinct underlying shows")
+    ap.add_argument("--threshold", type=float, default=90.0, help="rapidfuzz ratio needed to join a cluster")
+    ap.add_argument("--seed", type=int, default=1234)
+    args = ap.parse_args(argv)
+
+    rng = random.Random(args.seed)
+    titles = make_titles(args.titles, make_shows(args.shows, rng), args.seed)
+    truth = {title: show for title, show in titles}
+    with tempfile.TemporaryDirectory() as tmp:
+        store = TitleAliasStore(f"{tmp}/titles.db", threshold=args.threshold)
+        started = time.perf_counter()
+        assigned = {}
+        for title, _ in titles:
+            assigned[title] = store.resolve(title)
+        store.flush()
+        cluster_seconds = time.perf_counter() - started
+
+        reopened = TitleAliasStore(f"{tmp}/titles.db", threshold=args.threshold)
+        started = time.perf_counter()
+        for title, _ in titles:
+            reopened.resolve(title)
+        resolve_seconds = time.perf_counter() - started
+        store.close()
+        reopened.close()
+
+    precision, recall = pairwise_scores(assigned, truth)
+    distinct = len(truth)
+    print(f"titles={len(titles)} distinct={distinct} shows={len(set(truth.values()))} clusters={len(set(assigned.values()))}")
+    print(f"cluster: {cluster_seconds:.2f}s ({distinct / cluster_seconds:,.0f} distinct titles/s)")
+    print(f"fuzzy comparisons: {store.comparisons:,} vs {distinct * (distinct - 1) // 2:,} all-pairs")
+    print(f"resolve from persisted map: {resolve_seconds * 1e6 / len(titles):.2f} us/title, fuzzy comparisons={reopened.comparisons}")
+    print(f"pairwise precision={precision:.3f} recall={recall:.3f}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,225 @@
+#!/usr/bin/env python3
+"""
+bench_writer.py
+
+Load test for SupabaseWriter over real HTTP. By default each batch size runs
+against a fresh in-process PostgREST stand-in (scripts/standins/postgrest.py),
+so batch size, JSON payload size, connection reuse and the 429/5xx retry path
+are measured through supabase-py rather than a mocked client. Discovery runs
+through SupabaseMetaFetcher first, as it does in production.
+
+Rows are paced to --rate rows/sec (0 = as fast as possible). A share of
+them (--update-ratio) repeats an earlier conflict key so upserts also update.
+
+Reports achieved rows/sec, batch latency percentiles, HTTP requests by kind,
+new connections, request bytes and injected errors retried for each batch size.
+
+Example usage (from the repo root):
+  python -m scripts.benchmarks.bench_writer --rows 20000 --batch-sizes 50 200 500 --rate 2000
+  python -m scripts.benchmarks.bench_writer --rows 5000 --latency-ms 30 --error-rate 0.05 --json bench_writer.json
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import logging
+import random
+import statistics
+import sys
+import time
+from dataclasses import asdict, dataclass
+from typing import Dict, Iterator, List, Optional, Sequence
+
+from scripts.benchmarks.synthetic_reddit import SHOWS, SUBREDDITS
+from scripts.standins.postgrest import FaultConfig, PostgrestStandIn, standin_service_key
+from scripts.wigg_reddit_seed import (
+    CandidateMoment,
+    DatabaseDiscovery,
+    SupabaseMetaFetcher,
+    SupabaseWriter,
+    decode_supabase_role,
+)
+
+
+@dataclass
+class WriterResult:
+    batch_size: int
+    rows: int
+    batches: int
+    inserted: int
+    updated: int
+    seconds: float
+    rows_per_sec: float
+    target_rows_per_sec: float
+    batch_p50_ms: float
+    batch_p95_ms: float
+    batch_max_ms: float
+    upsert_requests: int
+    count_requests: int
+    connections: int
+    bytes_in: int
+    injected_errors: int
+
+
+def synthetic_candidates(rows: int, *, update_ratio: float = 0.2, seed: int = 1234) -> Iterator[CandidateMoment]:
+    """Deterministic candidates; about `update_ratio` of them reuse an earlier conflict key."""
+    rng = random.Random(seed)
+    issued: List[CandidateMoment] = []
+    for index in range(rows):
+        if issued and rng.random() < update_ratio:
+            previous = rng.choice(issued)
+            yield CandidateMoment(**{**asdict(previous), "score": previous.score + rng.randint(1, 50)})
+            continue
+        sub = rng.choice(SUBREDDITS)
+        candidate = CandidateMoment(
+            content_title=rng.choice(SHOWS),
+            season=rng.randint(1, 6),
+            episode=rng.randint(1, 24),
+            minute=rng.randint(1, 60),
+            source_url=f"https://www.reddit.com/r/{sub}/comments/w{index:x}/",
+            source_type="reddit",
+            source_subreddit=sub,
+            source_kind="comment",
+            source_id=f"t1_w{index:x}",
+            score=rng.randint(0, 500),
+            confidence=round(rng.uniform(0.3, 0.95), 3),
+            quote="It really picks up around S1E5, hang in there. " * rng.randint(1, 4),
+            created_utc=1_600_000_000 + index,
+        )
+        issued.append(candidate)
+        yield candidate
+
+
+def run_load(
+    url: str,
+    key: str,
+    *,
+    table: str,
+    rows: int,
+    batch_size: int,
+    rate: float,
+    update_ratio: float,
+    backoff: float,
+    standin: Optional[PostgrestStandIn] = None,
+    error_rate: float = 0.0,
+) -> WriterResult:
+    from supabase import create_client
+
+    quiet = logging.getLogger("wigg.bench.writer")
+    quiet.setLevel(logging.WARNING)
+    logging.getLogger("httpx").setLevel(logging.WARNING)
+    discovery = DatabaseDiscovery(SupabaseMetaFetcher(url, key, logger=quiet), logger=quiet).discover(table)
+    writer = SupabaseWriter(
+        client=create_client(url, key),
+        discovery=discovery,
+        dry_run=False,
+        logger=quiet,
+        service_key_role=decode_supabase_role(key),
+        base_backoff=backoff,
+    )
+    before: Dict[str, int] = {}
+    if standin is not None:
+        # Discovery does not retry, so injected errors start only once it is done.
+        standin.faults.error_rate = error_rate
+        before = standin.stats.snapshot()
+
+    latencies: List[float] = []
+    inserted = updated = sent = 0
+    batch: List[CandidateMoment] = []
+    started = time.perf_counter()
+
+    def flush() -> None:
+        nonlocal inserted, updated, sent
+        if rate:
+            # Pace on rows already sent so bursts do not exceed the target rate.
+            wait = started + sent / rate - time.perf_counter()
+            if wait > 0:
+                time.sleep(wait)
+        t0 = time.perf_counter()
+        result = writer.upsert_candidates(batch)
+        latencies.append((time.perf_counter() - t0) * 1000.0)
+        inserted += result.inserted
+        updated += result.updated
+        sent += len(batch)
+        batch.clear()
+
+    for candidate in synthetic_candidates(rows, update_ratio=update_ratio):
+        batch.append(candidate)
+        if len(batch) >= batch_size:
+            flush()
+    if batch:
+        flush()
+    seconds = time.perf_counter() - started
+
+    after: Dict[str, int] = standin.stats.snapshot() if standin is not None else {}
+
+    def delta(key_name: str) -> int:
+        return after.get(key_name, 0) - before.get(key_name, 0)
+
+    ordered = sorted(latencies)
+    return WriterResult(
+        batch_size=batch_size,
+        rows=sent,
+        batches=len(latencies),
+        inserted=inserted,
+        updated=updated,
+        seconds=seconds,
+        rows_per_sec=sent / seconds if seconds else 0.0,
+        target_rows_per_sec=rate,
+        batch_p50_ms=statistics.median(ordered) if ordered else 0.0,
+        batch_p95_ms=ordered[int(0.95 * (len(ordered) - 1))] if ordered else 0.0,
+        batch_max_ms=ordered[-1] if ordered else 0.0,
+        upsert_requests=delta("requests_upsert"),
+        count_requests=delta("requests_count"),
+        connections=delta("connections"),
+        bytes_in=delta("bytes_in"),
+        injected_errors=sum(delta(name) for name in after if name.startswith("injected_")),
+    )
+
+
+def main(argv: Optional[Sequence[str]] = None) -> int:
+    ap = argparse.ArgumentParser(description="Drive SupabaseWriter at a target rows/sec against a PostgREST endpoint.")
+    ap.add_argument("--rows", type=int, default=10000, help="Rows to write per batch size")
+    ap.add_argument("--batch-sizes", type=int, nargs="*", default=[50, 200, 500], help="Batch sizes to compare")
+    ap.add_argument("--rate", type=float, default=0.0, help="Target rows/sec (0 = unthrottled)")
+    ap.add_argument("--update-ratio", type=float, default=0.2, help="Share of rows that repeat an earlier conflict key")
+    ap.add_argument("--table", default="moments_seed")
+    ap.add_argument("--backoff", type=float, default=0.05, help="Writer base backoff between retries (seconds)")
+    ap.add_argument("--latency-ms", type=float, default=0.0, help="Stand-in latency per request")
+    ap.add_argument("--jitter-ms", type=float, default=0.0, help="Stand-in random latency on top of --latency-ms")
+    ap.add_argument("--error-rate", type=float, default=0.0, help="Share of stand-in write/count requests answered 429/503")
+    ap.add_argument("--url", default=None, help="Target an already running endpoint instead of an in-process stand-in")
+    ap.add_argument("--key", default=None, help="Service key for --url")
+    ap.add_argument("--json", type=str, default=None, help="Also write results to this JSON file")
+    args = ap.parse_args(argv)
+
+    results: List[Dict[str, object]] = []
+    print(f"{'batch':>6} {'rows':>7} {'rows/s':>8} {'p50_ms':>7} {'p95_ms':>7} {'upserts':>8} {'counts':>7} {'conns':>6} {'kB_in':>8} {'errors':>7}")
+    for batch_size in args.batch_sizes:
+        if args.url:
+            result = run_load(
+                args.url, args.key or "", table=args.table, rows=args.rows, batch_size=batch_size,
+                rate=args.rate, update_ratio=args.update_ratio, backoff=args.backoff,
+            )
+        else:
+            faults = FaultConfig(latency_ms=args.latency_ms, jitter_ms=args.jitter_ms)
+            with PostgrestStandIn(faults=faults) as standin:
+                result = run_load(
+                    standin.url, standin_service_key(), table=args.table, rows=args.rows, batch_size=batch_size,
+                    rate=args.rate, update_ratio=args.update_ratio, backoff=args.backoff,
+                    standin=standin, error_rate=args.error_rate,
+                )
+        print(
+            f"{result.batch_size:>6} {result.rows:>7} {result.rows_per_sec:>8.0f} {result.batch_p50_ms:>7.1f} "
+            f"{result.batch_p95_ms:>7.1f} {result.upsert_requests:>8} {result.count_requests:>7} "
+            f"{result.connections:>6} {result.bytes_in / 1024:>8.0f} {result.injected_errors:>7}"
+        )
+        results.append(asdict(result))
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as fh:
+            json.dump(results, fh, indent=2)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,210 @@
+"""
+synthetic_reddit.py
+
+Deterministic generator of Reddit-shaped submissions and comment trees for
+benchmarks and load tests. Objects expose the attributes the seed pipeline
+reads from PRAW models (title, selftext, num_comments, score, created_utc,
+permalink, subreddit, body, comments.replace_more()/list()).
+
+Comments are generated lazily per submission, so a 10M-comment corpus never
+holds more than one thread in memory.
+"""
+from __future__ import annotations
+
+import random
+from dataclasses import dataclass
+from typing import Iterator, List, Optional
+
+SHOWS = [
+    "Breaking Bad", "The Wire", "Parks and Recreation", "Severance", "Andor", "The Expanse",
+    "Fringe", "Babylon 5", "Star Trek TNG", "Attack on Titan", "Steins Gate", "The Leftovers",
+    "Better Call Saul", "Halt and Catch Fire", "Mr Robot", "Succession", "Fargo", "Dark",
+    "Foundation", "The Good Place", "Community", "Lost", "Westworld", "Bojack Horseman",
+]
+
+SUBREDDITS = ["television", "anime", "netflix", "Hulu", "PeacockTV", "DisneyPlus", "MaxStreaming", "cordcutters"]
+
+TITLE_TEMPLATES = [
+    "When does {show} get good?",
+    "Does {show} get good after season 1?",
+    "[Discussion] {show} - when does it pick up?",
+    "Is {show} worth watching? (no spoilers please)",
+    "What episode does {show} get good",
+    "Just started {show}, does it get good",
+    "{show} appreciation thread",
+    "Rewatching {show} for the third time",
+]
+
+HOOKS = [
+    "gets good", "picks up", "really starts", "clicks", "turns around", "hooked me",
+    "grows the beard", "is worth it after",
+]
+
+MENTIONS = [
+    "S{s}E{e}", "S{s:02d}E{e:02d}", "season {s} episode {e}", "episode {e}", "{s}x{e}",
+    "ep {e}", "{m} minutes in", "about {m} min into the pilot",
+]
+
+NOISE = [
+    "lol same", "I dropped it after the pilot honestly.", "This is the way.",
+    "Counterpoint: it was always good.", "The soundtrack alone carries it.",
+    "My partner made me watch it and now I'm hooked on everything else but this.",
+    "Can't believe nobody mentioned the cinematography.", "Deleted", "[removed]",
+]
+
+
+@dataclass
+class CorpusConfig:
+    comments: int = 10_000
+    mean_comments_per_thread: float = 60.0
+    mention_rate: float = 0.35
+    hook_rate: float = 0.4
+    max_depth: int = 8
+    long_comment_rate: float = 0.02
+    start_utc: int = 1_600_000_000
+    seed: int = 1234
+
+
+class SyntheticComments:
+    def __init__(self, factory, count: int) -> None:
+        self._factory = factory
+        self._count = count
+        self._items: Optional[List["Comment"]] = None
+
+    def replace_more(self, limit=None):
+        return []
+
+    def list(self) -> List["Comment"]:
+        if self._items is None:
+            self._items = self._factory(self._count)
+        return self._items
+
+
+class Comment:
+    """Named like praw.models.Comment so source_kind comes out as "comment"."""
+
+    __slots__ = ("id", "body", "score", "created_utc", "subreddit", "permalink", "depth", "parent_id", "link_id")
+
+    def __init__(self, id, body, score, created_utc, subreddit, permalink, depth, parent_id, link_id):
+        self.id = id
+        self.body = body
+        self.score = score
+        self.created_utc = created_utc
+        self.subreddit = subreddit
+        self.permalink = permalink
+        self.depth = depth
+        self.parent_id = parent_id
+        self.link_id = link_id
+
+
+class Submission:
+    """Named like praw.models.Submission so source_kind comes out as "submission"."""
+
+    def __init__(self, id, title, selftext, score, created_utc, subreddit, num_comments, comments):
+        self.id = id
+        self.title = title
+        self.selftext = selftext
+        self.score = score
+        self.created_utc = created_utc
+        self.subreddit = subreddit
+        self.num_comments = num_comments
+        self.permalink = f"/r/{subreddit}/comments/{id}/"
+        self.comments = comments
+
+    @property
+    def fullname(self) -> str:
+        return f"t3_{self.id}"
+
+
+class SyntheticCorpus:
+    """Yields submissions until `config.comments` comments have been generated."""
+
+    def __init__(self, config: CorpusConfig = CorpusConfig()) -> None:
+        self.config = config
+        self.rng = random.Random(config.seed)
+        self.submissions = 0
+        self.comments = 0
+
+    def __iter__(self) -> Iterator[Submission]:
+        cfg = self.config
+        remaining = cfg.comments
+        clock = cfg.start_utc
+        while remaining > 0:
+            # Thread sizes are heavy-tailed: most threads are small, a few are mega-threads.
+            size = min(remaining, max(1, int(self.rng.expovariate(1.0 / cfg.mean_comments_per_thread))))
+            if self.rng.random() < 0.01:
+                size = min(remaining, size * 20)
+            remaining -= size
+            clock += self.rng.randint(60, 7200)
+            self.submissions += 1
+            self.comments += size
+            yield self._submission(self.submissions, size, clock)
+
+    def _submission(self, index: int, size: int, created: int) -> Submission:
+        rng = self.rng
+        show = rng.choice(SHOWS)
+        sub = rng.choice(SUBREDDITS)
+        sid = f"s{index:x}"
+        title = rng.choice(TITLE_TEMPLATES).format(show=show)
+        selftext = self.text() if rng.random() < 0.5 else ""
+        thread_seed = rng.getrandbits(32)
+
+        def factory(count: int) -> List[Comment]:
+            return self._comments(thread_seed, sid, sub, created, count)
+
+        return Submission(
+            id=sid,
+            title=title,
+            selftext=selftext,
+            score=self.score(),
+            created_utc=created,
+            subreddit=sub,
+            num_comments=size,
+            comments=SyntheticComments(factory, size),
+        )
+
+    def _comments(self, thread_seed: int, sid: str, sub: str, created: int, count: int) -> List[Comment]:
+        rng = random.Random(thread_seed)
+        items: List[Comment] = []
+        depths: List[int] = []
+        for i in range(count):
+            if not items or rng.random() < 0.35:
+                parent, depth = f"t3_{sid}", 0
+            else:
+                parent_index = rng.randrange(len(items))
+                depth = min(depths[parent_index] + 1, self.config.max_depth)
+                parent = f"t1_{items[parent_index].id}"
+            cid = f"{sid}c{i:x}"
+            items.append(
+                Comment(
+                    id=cid,
+                    body=self.text(rng),
+                    score=self.score(rng),
+                    created_utc=created + rng.randint(1, 86400 * 30),
+                    subreddit=sub,
+                    permalink=f"/r/{sub}/comments/{sid}/x/{cid}/",
+                    depth=depth,
+                    parent_id=parent,
+                    link_id=f"t3_{sid}",
+                )
+            )
+            depths.append(depth)
+        return items
+
+    def text(self, rng: Optional[random.Random] = None) -> str:
+        rng = rng or self.rng
+        cfg = self.config
+        parts: List[str] = []
+        if rng.random() < cfg.hook_rate:
+            parts.append(f"It {rng.choice(HOOKS)}")
+        if rng.random() < cfg.mention_rate:
+            mention = rng.choice(MENTIONS).format(s=rng.randint(1, 6), e=rng.randint(1, 24), m=rng.randint(5, 60))
+            parts.append(f"around {mention}" if parts else f"Hang in until {mention}")
+        parts.append(rng.choice(NOISE))
+        if rng.random() < cfg.long_comment_rate:
+            parts.append(" ".join(rng.choice(NOISE) for _ in range(rng.randint(50, 400))))
+        return ". ".join(parts)
+
+    def score(self, rng: Optional[random.Random] = None) -> int:
+        rng = rng or self.rng
+        return min(int(rng.paretovariate(1.1)) - 1, 20000) - (1 if rng.random() < 0.1 else 0)
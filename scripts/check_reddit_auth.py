@@ -1,12 +1,291 @@
-import os, praw
-cid  = os.getenv("REDDIT_CLIENT_ID")
-csec = os.getenv("REDDIT_CLIENT_SECRET")
-ua   = os.getenv("REDDIT_USER_AGENT", "wigg-reddit-seeder/1.0")
-assert cid and csec, "Missing Reddit creds"
-
-r = praw.Reddit(client_id=cid, client_secret=csec, user_agent=ua)
-print("read_only:", r.read_only)
-for s in r.subreddit("television").search('"when does" AND "get good"', limit=1, sort="new"):
-    print("Sample fetch OK:", s.title)
-    break
-print("Reddit API looks good.")
+#!/usr/bin/env python3
+"""
+check_reddit_auth.py
+
+Preflight for a crawl. Verifies the Reddit credentials, then crawls a few
+sample (subreddit, query) units with a small limit through the real crawl
+path (search, triage, comment fetches, extraction) without writing anything.
+Reddit latency, the rate-limit budget left in the current window (from the
+X-Ratelimit-* headers), and candidates per submission all come from those
+samples. Supabase round-trip latency is measured too when SUPABASE_URL and
+SUPABASE_SERVICE_KEY are set.
+
+From the samples it estimates API calls, wall-clock and write volume for the
+full --subs x ruleset queries x --limit configuration, and recommends a
+worker count and writer batch size.
+
+Example usage (from the repo root):
+  python scripts/check_reddit_auth.py
+  python scripts/check_reddit_auth.py --subs r/television r/anime --limit 500 --ruleset default enhanced --json preflight.json
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import math
+import os
+import statistics
+import sys
+import time
+from dataclasses import asdict, dataclass
+from typing import Dict, List, Optional, Sequence
+
+try:
+    from scripts.wigg_reddit_seed import (
+        CANDIDATE_FIELDS,
+        DEFAULT_SUBS,
+        SEARCH_PAGE_SIZE,
+        CandidateMoment,
+        CrawlStats,
+        RulesetEvaluator,
+        SubmissionTriage,
+        SupabaseMetaFetcher,
+        TriagePolicy,
+        UpsertResult,
+        crawl_unit,
+        json_codec,
+        load_env_files,
+        load_ruleset,
+        make_reddit,
+        plan_work_units,
+    )
+    from scripts.wigg_seed_storage import WorkUnit
+except ModuleNotFoundError:  # run as `python check_reddit_auth.py` from scripts/
+    from wigg_reddit_seed import (  # type: ignore[no-redef]
+        CANDIDATE_FIELDS,
+        DEFAULT_SUBS,
+        SEARCH_PAGE_SIZE,
+        CandidateMoment,
+        CrawlStats,
+        RulesetEvaluator,
+        SubmissionTriage,
+        SupabaseMetaFetcher,
+        TriagePolicy,
+        UpsertResult,
+        crawl_unit,
+        json_codec,
+        load_env_files,
+        load_ruleset,
+        make_reddit,
+        plan_work_units,
+    )
+    from wigg_seed_storage import WorkUnit  # type: ignore[no-redef]
+
+REDDIT_RATE_WINDOW = 600  # seconds; Reddit's OAuth budget resets every 10 minutes
+MIN_BATCH, MAX_BATCH = 50, 500
+# A flush's round trip should cost at most this share of the time it takes to fill the batch.
+FLUSH_OVERHEAD = 0.05
+
+
+class CountingSink:
+    """Stands in for SupabaseWriter during sampling: counts candidates and their JSON size, writes nothing."""
+
+    dry_run = True
+
+    def __init__(self) -> None:
+        self.candidates = 0
+        self.payload_bytes = 0
+        self._mapping = {name: name for name in CANDIDATE_FIELDS}
+
+    def upsert_candidates(self, candidates: Sequence[CandidateMoment]) -> UpsertResult:
+        self.candidates += len(candidates)
+        self.payload_bytes += len(json_codec().encode_candidates(candidates, self._mapping))
+        return UpsertResult(inserted=0, updated=0, candidates=len(candidates))
+
+
+@dataclass
+class RedditSample:
+    units: int = 0
+    submissions: int = 0
+    saturated_units: int = 0
+    search_requests: int = 0
+    comment_requests: int = 0
+    candidates: int = 0
+    payload_bytes: int = 0
+    seconds: float = 0.0
+    requests_used: Optional[int] = None
+    rate_remaining: Optional[float] = None
+    rate_quota: Optional[float] = None
+
+    @property
+    def requests(self) -> int:
+        return self.search_requests + self.comment_requests
+
+    @property
+    def seconds_per_request(self) -> float:
+        return self.seconds / self.requests if self.requests else 0.0
+
+
+@dataclass
+class CapacityPlan:
+    units: int
+    submissions_per_unit: float
+    search_requests: int
+    comment_requests: int
+    total_requests: int
+    rate_per_second: Optional[float]
+    rate_windows: Optional[float]
+    seconds_single_worker: float
+    recommended_workers: int
+    seconds_with_workers: float
+    candidates: int
+    write_mb: float
+    supabase_rtt_ms: Optional[float]
+    recommended_batch_size: Optional[int]
+
+
+def rate_limits(reddit) -> Dict[str, Optional[float]]:
+    limits = getattr(getattr(reddit, "auth", None), "limits", None) or {}
+    return {key: (float(value) if value is not None else None) for key, value in limits.items()}
+
+
+def sample_units(units: Sequence[WorkUnit], samples: int) -> List[WorkUnit]:
+    """Spread samples over distinct subreddits and queries rather than taking the first few units."""
+    if samples >= len(units):
+        return list(units)
+    step = len(units) / samples
+    return [units[int(i * step)] for i in range(samples)]
+
+
+def sample_reddit(reddit, units: Sequence[WorkUnit], rules: RulesetEvaluator, *, sample_limit: int) -> RedditSample:
+    sample = RedditSample()
+    sink = CountingSink()
+    triage = SubmissionTriage(TriagePolicy())
+    used_before = rate_limits(reddit).get("used")
+    for unit in units:
+        started = time.perf_counter()
+        stats: CrawlStats = crawl_unit(reddit, sink, unit, sample_limit, triage=triage, rules=rules)  # type: ignore[arg-type]
+        sample.seconds += time.perf_counter() - started
+        searches = max(1, math.ceil(stats.processed / SEARCH_PAGE_SIZE))
+        sample.units += 1
+        sample.submissions += stats.processed
+        sample.saturated_units += stats.processed >= sample_limit
+        sample.search_requests += searches
+        sample.comment_requests += stats.requests - searches
+    sample.candidates = sink.candidates
+    sample.payload_bytes = sink.payload_bytes
+    limits = rate_limits(reddit)
+    if limits.get("used") is not None:
+        sample.requests_used = int(limits["used"] - (used_before or 0)) if (used_before or 0) <= limits["used"] else None
+    if limits.get("remaining") is not None:
+        sample.rate_remaining = limits["remaining"]
+        sample.rate_quota = limits["remaining"] + (limits.get("used") or 0)
+    return sample
+
+
+def sample_supabase(fetcher: SupabaseMetaFetcher, table: str, *, repeats: int = 5) -> float:
+    """Median seconds for a one-row read of the moments table."""
+    timings: List[float] = []
+    for _ in range(repeats):
+        started = time.perf_counter()
+        fetcher.sample_row(table, ["*"])
+        timings.append(time.perf_counter() - started)
+    return statistics.median(timings)
+
+
+def plan_capacity(units: int, limit: int, sample: RedditSample, *, sample_limit: int, supabase_rtt: Optional[float]) -> CapacityPlan:
+    """Scale the sample up to the full configuration; full sampled units are assumed to fill --limit too."""
+    per_unit = 0.0
+    if sample.units:
+        unsaturated = sample.submissions - sample.saturated_units * sample_limit
+        per_unit = (sample.saturated_units * limit + unsaturated) / sample.units
+    comment_ratio = sample.comment_requests / sample.submissions if sample.submissions else 0.0
+    candidates_per_submission = sample.candidates / sample.submissions if sample.submissions else 0.0
+    bytes_per_candidate = sample.payload_bytes / sample.candidates if sample.candidates else 0.0
+
+    search_requests = units * max(1, math.ceil(per_unit / SEARCH_PAGE_SIZE))
+    comment_requests = math.ceil(units * per_unit * comment_ratio)
+    total = search_requests + comment_requests
+    latency = sample.seconds_per_request
+    rate = sample.rate_quota / REDDIT_RATE_WINDOW if sample.rate_quota else None
+    # Workers sharing one set of credentials share its budget, so past this many
+    # they only wait on the rate limit.
+    workers = max(1, math.ceil(latency * rate)) if rate else 1
+    per_request = max(latency / workers, 1 / rate if rate else 0.0)
+    candidates = round(units * per_unit * candidates_per_submission)
+    seconds = total * per_request
+
+    batch: Optional[int] = None
+    if supabase_rtt is not None:
+        rows_per_second = candidates / seconds if seconds else 0.0
+        wanted = rows_per_second * supabase_rtt / FLUSH_OVERHEAD
+        batch = int(min(MAX_BATCH, max(MIN_BATCH, math.ceil(wanted / MIN_BATCH) * MIN_BATCH)))
+    return CapacityPlan(
+        units=units,
+        submissions_per_unit=round(per_unit, 1),
+        search_requests=search_requests,
+        comment_requests=comment_requests,
+        total_requests=total,
+        rate_per_second=round(rate, 3) if rate else None,
+        rate_windows=round(total / sample.rate_quota, 2) if sample.rate_quota else None,
+        seconds_single_worker=round(total * max(latency, 1 / rate if rate else 0.0), 1),
+        recommended_workers=workers,
+        seconds_with_workers=round(seconds, 1),
+        candidates=candidates,
+        write_mb=round(candidates * bytes_per_candidate / 1e6, 2),
+        supabase_rtt_ms=round(supabase_rtt * 1000, 1) if supabase_rtt is not None else None,
+        recommended_batch_size=batch,
+    )
+
+
+def main(argv: Optional[Sequence[str]] = None) -> int:
+    ap = argparse.ArgumentParser(description="Check Reddit/Supabase access and estimate the cost of a crawl.")
+    ap.add_argument("--subs", nargs="*", default=DEFAULT_SUBS, help="Subreddits the crawl will search")
+    ap.add_argument("--limit", type=int, default=200, help="The crawl's max results per query per sub")
+    ap.add_argument("--ruleset", nargs="+", default=["default"], help="Rulesets whose search queries the crawl uses")
+    ap.add_argument("--samples", type=int, default=3, help="Units to sample-crawl")
+    ap.add_argument("--sample-limit", type=int, default=25, help="Results per sampled unit")
+    ap.add_argument("--moment-table", type=str, default=os.environ.get("MOMENT_TABLE", "moments_seed"))
+    ap.add_argument("--json", type=str, default=None, help="Also write the sample and plan to this JSON file")
+    args = ap.parse_args(argv)
+
+    load_env_files()
+    reddit = make_reddit()
+    print("read_only:", reddit.read_only)
+
+    rules = RulesetEvaluator([load_ruleset(spec) for spec in args.ruleset])
+    units = plan_work_units(args.subs, rules.search_queries)
+    sample = sample_reddit(reddit, sample_units(units, args.samples), rules, sample_limit=args.sample_limit)
+    if not sample.submissions:
+        print("Reddit API reachable, but the sampled searches returned nothing.")
+    else:
+        print("Reddit API looks good.")
+    print(
+        f"reddit: sampled {sample.units} units, {sample.submissions} submissions, {sample.requests} requests "
+        f"({sample.requests_used if sample.requests_used is not None else '?'} counted by Reddit), "
+        f"{sample.seconds_per_request * 1000:.0f} ms/request, {sample.candidates} candidates"
+    )
+    if sample.rate_quota is not None:
+        print(f"rate limit: {sample.rate_remaining:.0f} of {sample.rate_quota:.0f} requests left in this {REDDIT_RATE_WINDOW}s window")
+
+    supabase_rtt: Optional[float] = None
+    url, key = os.environ.get("SUPABASE_URL"), os.environ.get("SUPABASE_SERVICE_KEY")
+    if url and key:
+        supabase_rtt = sample_supabase(SupabaseMetaFetcher(url, key), args.moment_table)
+        print(f"supabase: {supabase_rtt * 1000:.1f} ms round trip")
+    else:
+        print("supabase: skipped (SUPABASE_URL / SUPABASE_SERVICE_KEY not set)")
+
+    plan = plan_capacity(len(units), args.limit, sample, sample_limit=args.sample_limit, supabase_rtt=supabase_rtt)
+    print(
+        f"plan: {plan.units} units x ~{plan.submissions_per_unit} submissions -> {plan.total_requests} requests "
+        f"({plan.search_requests} search, {plan.comment_requests} comments)"
+    )
+    if plan.rate_windows is not None:
+        print(f"      {plan.rate_windows} rate-limit windows at {plan.rate_per_second} requests/s")
+    print(
+        f"      ~{plan.seconds_single_worker / 60:.1f} min with 1 worker, ~{plan.seconds_with_workers / 60:.1f} min with "
+        f"{plan.recommended_workers} (recommended; more workers on the same credentials only wait on the rate limit)"
+    )
+    print(
+        f"      ~{plan.candidates} candidate rows, {plan.write_mb} MB of JSON; "
+        f"recommended --batch-size {plan.recommended_batch_size if plan.recommended_batch_size else 'n/a (no Supabase sample)'}"
+    )
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as fh:
+            json.dump({"sample": asdict(sample), "plan": asdict(plan)}, fh, indent=2)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,140 @@
+#!/usr/bin/env python3
+"""
+query_mirror.py
+
+Canned analytics and ad-hoc SQL over the local copy of the moments table that
+`wigg_reddit_seed.py --mode mirror` keeps in sync. Nothing here touches
+Supabase, so these queries can run as often and as heavily as needed.
+
+Column names come from the mapping discovered at sync time, so the canned
+queries work whatever the moments table calls its columns.
+
+Example usage (from the repo root):
+  python scripts/query_mirror.py wigg_mirror.db titles --limit 20
+  python scripts/query_mirror.py wigg_mirror.db subreddits
+  python scripts/query_mirror.py wigg_mirror.db changed --days 7
+  python scripts/query_mirror.py wigg_mirror.db sql "SELECT status, COUNT(*) FROM moments_seed GROUP BY 1" --json
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import sqlite3
+import sys
+import time
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+try:
+    from scripts.wigg_seed_storage import MIRROR_UPDATE_COLUMNS, quote_ident
+except ModuleNotFoundError:  # run as `python query_mirror.py` from scripts/
+    from wigg_seed_storage import MIRROR_UPDATE_COLUMNS, quote_ident  # type: ignore[no-redef]
+
+# Logical column names in {braces} resolve through the mirror's column mapping.
+QUERIES: Dict[str, str] = {
+    "titles": (
+        "SELECT {content_title} AS title, COUNT(*) AS seeds, COUNT(DISTINCT {source_id}) AS sources, "
+        "ROUND(AVG({confidence}), 3) AS avg_confidence "
+        "FROM {table} GROUP BY 1 ORDER BY seeds DESC, title LIMIT :limit"
+    ),
+    "subreddits": (
+        "SELECT {source_subreddit} AS subreddit, COUNT(*) AS seeds, ROUND(AVG({confidence}), 3) AS avg_confidence, "
+        "SUM({confidence} < 0.5) AS low, SUM({confidence} >= 0.5 AND {confidence} < 0.8) AS mid, SUM({confidence} >= 0.8) AS high "
+        "FROM {table} GROUP BY 1 ORDER BY seeds DESC, subreddit LIMIT :limit"
+    ),
+    "status": "SELECT {status} AS status, COUNT(*) AS seeds FROM {table} GROUP BY 1 ORDER BY seeds DESC, status",
+    "changed": (
+        "SELECT {content_title} AS title, {status} AS status, COUNT(*) AS seeds, "
+        "datetime(MAX(_mirrored_at), 'unixepoch') AS last_change "
+        "FROM {table} WHERE _mirrored_at >= :since GROUP BY 1, 2 ORDER BY seeds DESC, title LIMIT :limit"
+    ),
+}
+
+# Canned queries that report edits made in place (moderation status changes).
+EDIT_QUERIES = ("status", "changed")
+
+
+def open_mirror(path: str) -> sqlite3.Connection:
+    """Read-only connection, so a query can never modify the mirror."""
+    conn = sqlite3.connect(f"file:{path}?mode=ro", uri=True)
+    conn.row_factory = sqlite3.Row
+    return conn
+
+
+def render_query(conn: sqlite3.Connection, name: str) -> str:
+    meta = conn.execute("SELECT table_name, column_mapping FROM mirror_meta ORDER BY synced_at DESC LIMIT 1").fetchone()
+    if meta is None:
+        raise SystemExit("The mirror is empty; run wigg_reddit_seed.py --mode mirror first")
+    mapping = json.loads(meta["column_mapping"])
+    names = {field: quote_ident(column or field) for field, column in mapping.items()}
+    return QUERIES[name].format(table=quote_ident(meta["table_name"]), **names)
+
+
+def stale_edits_note(path: str) -> Optional[str]:
+    """A warning when the mirror's sync cursor cannot see in-place edits, else None."""
+    conn = open_mirror(path)
+    try:
+        meta = conn.execute("SELECT * FROM mirror_meta ORDER BY synced_at DESC LIMIT 1").fetchone()
+    finally:
+        conn.close()
+    if meta is None or meta["cursor_column"] in MIRROR_UPDATE_COLUMNS:
+        return None
+    full = meta["full_synced_at"]
+    since = time.strftime("%Y-%m-%d %H:%M:%S UTC", time.gmtime(full)) if full else "never"
+    return (
+        f"note: {meta['table_name']} has no updated_at column, so edits made since the last full sync ({since}) "
+        "are missing; run wigg_reddit_seed.py --mode mirror --mirror-full for current statuses"
+    )
+
+
+def run_query(
+    path: str, name: str, *, sql: Optional[str] = None, limit: int = 25, days: float = 7.0, now: Optional[float] = None
+) -> Tuple[List[str], List[Tuple[Any, ...]]]:
+    """Run a canned query (or `sql` when name is "sql"); returns column names and rows."""
+    conn = open_mirror(path)
+    try:
+        if name == "sql":
+            if not sql:
+                raise SystemExit("sql needs a query string")
+            cursor = conn.execute(sql)
+        else:
+            since = (time.time() if now is None else now) - days * 86400
+            cursor = conn.execute(render_query(conn, name), {"limit": limit, "since": since})
+        columns = [d[0] for d in cursor.description or []]
+        return columns, [tuple(row) for row in cursor.fetchall()]
+    finally:
+        conn.close()
+
+
+def format_table(columns: Sequence[str], rows: Sequence[Sequence[Any]]) -> str:
+    cells = [[str(c) for c in columns], *[["" if v is None else str(v) for v in row] for row in rows]]
+    widths = [max(len(r[i]) for r in cells) for i in range(len(columns))]
+    return "\n".join("  ".join(v.ljust(w) for v, w in zip(r, widths)).rstrip() for r in cells)
+
+
+def main(argv: Optional[Sequence[str]] = None) -> int:
+    ap = argparse.ArgumentParser(description="Query the local mirror of the moments table.")
+    ap.add_argument("mirror", help="SQLite file written by wigg_reddit_seed.py --mode mirror")
+    ap.add_argument("query", choices=[*QUERIES, "sql"], help="Canned query, or sql for an ad-hoc statement")
+    ap.add_argument("sql", nargs="?", default=None, help="The statement for the sql query")
+    ap.add_argument("--limit", type=int, default=25, help="Rows per canned query")
+    ap.add_argument("--days", type=float, default=7.0, help="changed: look this many days back")
+    ap.add_argument("--json", action="store_true", help="Print rows as JSON objects instead of a table")
+    args = ap.parse_args(argv)
+
+    try:
+        columns, rows = run_query(args.mirror, args.query, sql=args.sql, limit=args.limit, days=args.days)
+    except sqlite3.Error as exc:
+        print(f"query failed: {exc}", file=sys.stderr)
+        return 1
+    note = stale_edits_note(args.mirror) if args.query in EDIT_QUERIES else None
+    if note:
+        print(note, file=sys.stderr)
+    if args.json:
+        print(json.dumps([dict(zip(columns, row)) for row in rows], indent=2, default=str))
+    else:
+        print(format_table(columns, rows))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,121 @@
+"""
+fake_supabase.py
+
+In-memory stand-in for the slice of the supabase-py client that
+SupabaseWriter and the keyset pagers use (table().select/upsert, order, gt,
+limit, count), shared by the test suite and the benchmarks. Upserts can be
+made to fail with 429s a set number of times to drive the retry path.
+"""
+from __future__ import annotations
+
+from typing import Dict, List
+
+
+class FakeSupabaseError(Exception):
+    def __init__(self, status_code: int, message: str = ""):
+        super().__init__(message or f"status {status_code}")
+        self.status_code = status_code
+
+
+class FakeSupabaseClient:
+    """Stores upserted rows in dicts keyed by conflict key; keep_rows=False keeps only the keys."""
+
+    def __init__(self, on_conflict: List[str], *, keep_rows: bool = True):
+        self.storage: Dict[str, Dict] = {}
+        self.on_conflict = on_conflict
+        self.keep_rows = keep_rows
+        self.failures_before_success = 0
+        self.upsert_attempts = 0
+        self.count_calls = 0
+
+    def table(self, name: str):
+        return FakeTable(self, name)
+
+    def row_count(self, table: str) -> int:
+        table_bucket = self.storage.get(table, {})
+        return len(table_bucket)
+
+
+class FakeTable:
+    def __init__(self, client: FakeSupabaseClient, table: str):
+        self.client = client
+        self.table = table
+
+    def select(self, columns="*", **_kwargs):
+        self.client.count_calls += 1
+        return FakeSelectOp(self.client, self.table, columns)
+
+    def upsert(self, payloads, on_conflict: str):
+        return FakeUpsertOp(self.client, self.table, payloads, on_conflict)
+
+
+class FakeSelectOp:
+    def __init__(self, client: FakeSupabaseClient, table: str, columns: str = "*"):
+        self.client = client
+        self.table = table
+        self.columns = columns
+        self.order_key = None
+        self.filters = []
+        self.limit_value = None
+
+    def limit(self, value):
+        self.limit_value = value
+        return self
+
+    def order(self, key):
+        self.order_key = key
+        return self
+
+    def gt(self, key, value):
+        self.filters.append(lambda row: row.get(key) is not None and row.get(key) > value)
+        return self
+
+    def execute(self):
+        count = self.client.row_count(self.table)
+        if self.order_key is None:
+            return FakeResponse([], count)
+        stored = self.client.storage.get(self.table, {}).values()
+        rows = [row for row in stored if row is not None and all(f(row) for f in self.filters)]
+        rows.sort(key=lambda row: row[self.order_key])
+        if self.limit_value is not None:
+            rows = rows[: self.limit_value]
+        if self.columns != "*":
+            wanted = self.columns.split(",")
+            rows = [{c: row.get(c) for c in wanted} for row in rows]
+        return FakeResponse(rows, count)
+
+
+class FakeUpsertOp:
+    def __init__(self, client: FakeSupabaseClient, table: str, payloads, on_conflict: str):
+        self.client = client
+        self.table = table
+        self.payloads = payloads
+        self.on_conflict = [c.strip() for c in on_conflict.split(',')]
+
+    def execute(self):
+        self.client.upsert_attempts += 1
+        if self.client.failures_before_success > 0:
+            self.client.failures_before_success -= 1
+            raise FakeSupabaseError(429)
+
+        table_bucket = self.client.storage.setdefault(self.table, {})
+        inserted = 0
+        updated = 0
+        for payload in self.payloads:
+            key = tuple(payload.get(col) for col in self.on_conflict)
+            if key in table_bucket:
+                if self.client.keep_rows:
+                    table_bucket[key].update(payload)
+                updated += 1
+            else:
+                table_bucket[key] = dict(payload) if self.client.keep_rows else None
+                inserted += 1
+        return FakeResponse(self.payloads, len(table_bucket), inserted=inserted, updated=updated)
+
+
+class FakeResponse:
+    def __init__(self, data, count, inserted=0, updated=0):
+        self.data = data
+        self.count = count
+        self.inserted = inserted
+        self.updated = updated
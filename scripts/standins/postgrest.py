@@ -0,0 +1,720 @@
+#!/usr/bin/env python3
+"""
+postgrest.py
+
+Local stand-in for the subset of PostgREST that SupabaseMetaFetcher and
+SupabaseWriter use, backed by SQLite, for writer load tests over real HTTP:
+
+  GET/HEAD /rest/v1/{table}    filters (eq, neq, gt, gte, lt, lte, in, not.in, is),
+                               select, order, limit, offset, Prefer: count=exact
+  POST     /rest/v1/{table}    bulk insert / upsert (on_conflict, columns, resolution=merge|ignore-duplicates)
+  PATCH    /rest/v1/{table}    update the rows matching the filters (Prefer: count=exact)
+  Accept-Profile: information_schema   tables, columns, table_constraints, key_column_usage
+  Accept-Profile: pg_catalog           pg_namespace, pg_class (relrowsecurity)
+  POST     /rest/v1/rpc/{fn}   wigg_index_health, wigg_explain_lookup (SQLite EXPLAIN QUERY PLAN
+                               reported in the shape of Postgres EXPLAIN (FORMAT JSON))
+  GET      /__stats            request, connection, byte and row counters
+
+The catalog views are derived from the SQLite schema, so a custom --schema
+DDL file is discovered the same way a real Supabase table would be. Every
+response can be delayed, and a fraction answered with 429/5xx, to exercise
+the writer's retry path.
+
+Point the seeder at it with:
+  SUPABASE_URL=http://127.0.0.1:54321 SUPABASE_SERVICE_KEY=$(python -m scripts.standins.postgrest --print-key)
+
+Example usage (from the repo root):
+  python -m scripts.standins.postgrest --port 54321 --db standin.db --latency-ms 20 --error-rate 0.01
+"""
+from __future__ import annotations
+
+import argparse
+import base64
+import csv
+import json
+import random
+import re
+import sqlite3
+import threading
+import time
+import urllib.parse
+from dataclasses import dataclass
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List, Optional, Sequence, Tuple
+
+PUBLIC_OID = 2200
+
+DEFAULT_SCHEMA = """
+CREATE TABLE IF NOT EXISTS moments_seed (
+    id integer PRIMARY KEY,
+    content_title text NOT NULL,
+    season integer,
+    episode integer,
+    minute integer,
+    source_url text,
+    source_type text,
+    source_subreddit text,
+    source_kind text,
+    source_id text NOT NULL,
+    score integer,
+    confidence double precision,
+    quote text,
+    created_utc bigint,
+    status text DEFAULT 'needs_review'
+);
+CREATE UNIQUE INDEX IF NOT EXISTS moments_seed_uniq_idx
+    ON moments_seed (source_id, content_title, season, episode, minute);
+CREATE TABLE IF NOT EXISTS reddit_title_metrics (
+    content_title text PRIMARY KEY,
+    mentions integer,
+    comment_mentions integer,
+    post_mentions integer,
+    episode_p25 text,
+    episode_median text,
+    episode_p75 text,
+    peak_episode text,
+    minute_median double precision,
+    minute_iqr double precision,
+    episode_histogram jsonb,
+    minute_histogram jsonb,
+    updated_at text
+);
+"""
+
+FILTER_OPS = {"eq": "=", "neq": "!=", "gt": ">", "gte": ">=", "lt": "<", "lte": "<="}
+RESERVED_PARAMS = {"select", "order", "limit", "offset", "on_conflict", "columns"}
+IDENTIFIER = re.compile(r"^[A-Za-z_][A-Za-z0-9_]*$")
+
+
+def standin_service_key(role: str = "service_role") -> str:
+    """Unsigned JWT-shaped key; the stand-in reads the role claim but never checks the signature."""
+
+    def part(obj: dict) -> str:
+        return base64.urlsafe_b64encode(json.dumps(obj).encode("utf-8")).decode("ascii").rstrip("=")
+
+    return f"{part({'alg': 'HS256', 'typ': 'JWT'})}.{part({'role': role, 'iss': 'standin'})}.standin"
+
+
+@dataclass
+class FaultConfig:
+    latency_ms: float = 0.0
+    jitter_ms: float = 0.0
+    error_rate: float = 0.0
+    error_statuses: Tuple[int, ...] = (429, 503)
+    seed: int = 99
+
+
+class PostgrestError(Exception):
+    def __init__(self, status: int, code: str, message: str) -> None:
+        super().__init__(message)
+        self.status = status
+        self.code = code
+        self.message = message
+
+
+class Filter:
+    __slots__ = ("column", "op", "value", "negate")
+
+    def __init__(self, column: str, raw: str) -> None:
+        if not IDENTIFIER.match(column):
+            raise PostgrestError(400, "PGRST100", f"invalid column name {column!r}")
+        self.column = column
+        self.negate = raw.startswith("not.")
+        if self.negate:
+            raw = raw[4:]
+        self.op, _, value = raw.partition(".")
+        if self.op == "in":
+            if not (value.startswith("(") and value.endswith(")")):
+                raise PostgrestError(400, "PGRST100", f"malformed in filter {raw!r}")
+            # Items may be double-quoted (with backslash escapes) to carry commas or parentheses.
+            self.value = next(csv.reader([value[1:-1]], skipinitialspace=True, escapechar="\\")) if value[1:-1] else []
+        elif self.op == "is":
+            self.value = {"null": None, "true": True, "false": False}.get(value.lower(), value)
+        elif self.op in FILTER_OPS:
+            self.value = value
+        else:
+            raise PostgrestError(400, "PGRST100", f"unsupported operator {self.op!r}")
+
+    def sql(self) -> Tuple[str, List[object]]:
+        col = f'"{self.column}"'
+        if self.op == "in":
+            clause = f"{col} IN ({','.join('?' * len(self.value))})" if self.value else "0"
+            params: List[object] = list(self.value)
+        elif self.op == "is":
+            clause, params = f"{col} IS ?", [self.value]
+        else:
+            clause, params = f"{col} {FILTER_OPS[self.op]} ?", [self.value]
+        return (f"NOT ({clause})" if self.negate else clause), params
+
+    def matches(self, row: Dict[str, object]) -> bool:
+        actual = row.get(self.column)
+        if self.op == "in":
+            result = str(actual) in self.value
+        elif self.op == "is":
+            result = actual is self.value or actual == self.value
+        else:
+            left, right = _comparable(actual, self.value)
+            result = {
+                "eq": left == right,
+                "neq": left != right,
+                "gt": left > right,
+                "gte": left >= right,
+                "lt": left < right,
+                "lte": left <= right,
+            }[self.op]
+        return not result if self.negate else result
+
+
+def _comparable(actual: object, raw: str):
+    if isinstance(actual, (int, float)) and not isinstance(actual, bool):
+        try:
+            return float(actual), float(raw)
+        except ValueError:
+            pass
+    return str(actual), raw
+
+
+@dataclass
+class Query:
+    select: List[str]
+    filters: List[Filter]
+    order: List[Tuple[str, bool]]
+    limit: Optional[int]
+    offset: int
+
+    @classmethod
+    def parse(cls, pairs: Sequence[Tuple[str, str]]) -> "Query":
+        params = dict(pairs)
+        select = [c.strip().strip('"') for c in params.get("select", "*").split(",") if c.strip()]
+        order: List[Tuple[str, bool]] = []
+        for term in filter(None, params.get("order", "").split(",")):
+            column, _, direction = term.partition(".")
+            if not IDENTIFIER.match(column):
+                raise PostgrestError(400, "PGRST100", f"invalid order column {column!r}")
+            order.append((column, direction.startswith("desc")))
+        filters = [Filter(key, value) for key, value in pairs if key not in RESERVED_PARAMS]
+        limit = int(params["limit"]) if params.get("limit") else None
+        return cls(select, filters, order, limit, int(params.get("offset") or 0))
+
+
+class SQLiteCatalog:
+    """Owns the SQLite store and answers catalog and table requests."""
+
+    def __init__(self, path: str = ":memory:", schema_sql: str = DEFAULT_SCHEMA, *, rls: bool = False) -> None:
+        self.conn = sqlite3.connect(path, timeout=30, isolation_level=None, check_same_thread=False)
+        self.conn.row_factory = sqlite3.Row
+        if path != ":memory:":
+            self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.executescript(schema_sql)
+        self.rls = rls
+        self.lock = threading.Lock()
+
+    # -- catalog --
+    def tables(self) -> List[str]:
+        rows = self.conn.execute("SELECT name FROM sqlite_master WHERE type = 'table' AND name NOT LIKE 'sqlite_%' ORDER BY name")
+        return [row["name"] for row in rows]
+
+    def columns(self, table: str) -> List[sqlite3.Row]:
+        return list(self.conn.execute(f'PRAGMA table_info("{table}")'))
+
+    def constraints(self, table: str) -> List[Tuple[str, str, List[str]]]:
+        """(name, PRIMARY KEY|UNIQUE, columns) named the way Postgres would name them."""
+        result: List[Tuple[str, str, List[str]]] = []
+        pk = [row["name"] for row in sorted(self.columns(table), key=lambda r: r["pk"]) if row["pk"]]
+        if pk:
+            result.append((f"{table}_pkey", "PRIMARY KEY", pk))
+        for index in self.conn.execute(f'PRAGMA index_list("{table}")'):
+            if not index["unique"] or index["origin"] == "pk" or index["partial"]:
+                continue
+            cols = [row["name"] for row in self.conn.execute(f'PRAGMA index_info("{index["name"]}")')]
+            name = index["name"] if index["origin"] == "c" else f"{table}_{'_'.join(cols)}_key"
+            result.append((name, "UNIQUE", cols))
+        return result
+
+    def catalog_rows(self, profile: str, view: str) -> List[Dict[str, object]]:
+        tables = self.tables()
+        if profile == "pg_catalog":
+            if view == "pg_namespace":
+                return [{"oid": PUBLIC_OID, "nspname": "public"}]
+            if view == "pg_class":
+                return [
+                    {"relname": t, "relkind": "r", "relnamespace": PUBLIC_OID, "relrowsecurity": self.rls}
+                    for t in tables
+                ]
+        elif profile == "information_schema":
+            if view == "tables":
+                return [{"table_schema": "public", "table_name": t, "table_type": "BASE TABLE"} for t in tables]
+            if view == "columns":
+                return [
+                    {
+                        "table_schema": "public",
+                        "table_name": t,
+                        "column_name": col["name"],
+                        "data_type": (col["type"] or "text").lower(),
+                        "is_nullable": "NO" if col["notnull"] or col["pk"] else "YES",
+                        "column_default": col["dflt_value"],
+                        "ordinal_position": col["cid"] + 1,
+                    }
+                    for t in tables
+                    for col in self.columns(t)
+                ]
+            if view in ("table_constraints", "key_column_usage"):
+                rows: List[Dict[str, object]] = []
+                for t in tables:
+                    for name, kind, cols in self.constraints(t):
+                        base = {"table_schema": "public", "table_name": t, "constraint_name": name}
+                        if view == "table_constraints":
+                            rows.append({**base, "constraint_type": kind})
+                        else:
+                            rows.extend({**base, "column_name": c, "ordinal_position": i + 1} for i, c in enumerate(cols))
+                return rows
+        raise PostgrestError(404, "42P01", f'relation "{profile}.{view}" does not exist')
+
+    # -- reads --
+    def select(self, profile: str, table: str, query: Query, want_count: bool) -> Tuple[List[Dict[str, object]], Optional[int]]:
+        with self.lock:
+            if profile != "public":
+                rows = [r for r in self.catalog_rows(profile, table) if all(f.matches(r) for f in query.filters)]
+                total = len(rows)
+                for column, desc in reversed(query.order):
+                    rows.sort(key=lambda r: (r.get(column) is None, r.get(column)), reverse=desc)
+                end = query.offset + query.limit if query.limit is not None else None
+                rows = rows[query.offset : end]
+                if query.select != ["*"]:
+                    rows = [{c: r.get(c) for c in query.select} for r in rows]
+                return rows, total if want_count else None
+
+            self._require_table(table)
+            clauses, params = [], []
+            for f in query.filters:
+                clause, args = f.sql()
+                clauses.append(clause)
+                params.extend(args)
+            where = f" WHERE {' AND '.join(clauses)}" if clauses else ""
+            cols = "*" if query.select == ["*"] else ",".join(f'"{c}"' for c in query.select if IDENTIFIER.match(c))
+            sql = f'SELECT {cols} FROM "{table}"{where}'
+            if query.order:
+                sql += " ORDER BY " + ",".join(f'"{c}" {"DESC" if d else "ASC"}' for c, d in query.order)
+            if query.limit is not None or query.offset:
+                sql += f" LIMIT {query.limit if query.limit is not None else -1} OFFSET {query.offset}"
+            try:
+                rows = [dict(r) for r in self.conn.execute(sql, params)]
+                jsonb = [c["name"] for c in self.columns(table) if (c["type"] or "").lower() == "jsonb"]
+                for row in rows:
+                    for column in jsonb:
+                        if isinstance(row.get(column), str):
+                            row[column] = json.loads(row[column])
+                total = self.conn.execute(f'SELECT COUNT(*) FROM "{table}"{where}', params).fetchone()[0] if want_count else None
+            except sqlite3.OperationalError as exc:
+                raise PostgrestError(400, "42703", str(exc))
+            return rows, total
+
+    # -- writes --
+    def upsert(
+        self,
+        table: str,
+        rows: List[Dict[str, object]],
+        on_conflict: Optional[str],
+        resolution: str,
+        returning: bool,
+        only_columns: Optional[str] = None,
+    ) -> List[Dict[str, object]]:
+        with self.lock:
+            self._require_table(table)
+            known = [c["name"] for c in self.columns(table)]
+            if only_columns:
+                # ?columns= names the keys to insert; any other key in the body is ignored.
+                columns = [c.strip().strip('"') for c in only_columns.split(",") if c.strip()]
+            else:
+                columns = [c for c in dict.fromkeys(k for row in rows for k in row)]
+            unknown = [c for c in columns if c not in known]
+            if unknown:
+                raise PostgrestError(400, "PGRST204", f"Could not find the '{unknown[0]}' column of '{table}' in the schema cache")
+            conflict = [c.strip() for c in on_conflict.split(",")] if on_conflict else []
+            if resolution and not conflict:
+                conflict = next((cols for _, kind, cols in self.constraints(table) if kind == "PRIMARY KEY"), [])
+            if conflict and not any(set(cols) == set(conflict) for _, _, cols in self.constraints(table)):
+                raise PostgrestError(400, "42P10", "there is no unique or exclusion constraint matching the ON CONFLICT specification")
+
+            col_sql = ",".join(f'"{c}"' for c in columns)
+            sql = f'INSERT INTO "{table}" ({col_sql}) VALUES ({",".join("?" * len(columns))})'
+            if conflict:
+                target = ",".join(f'"{c}"' for c in conflict)
+                updates = [c for c in columns if c not in conflict]
+                if resolution == "merge" and updates:
+                    sql += f" ON CONFLICT ({target}) DO UPDATE SET " + ",".join(f'"{c}"=excluded."{c}"' for c in updates)
+                else:
+                    sql += f" ON CONFLICT ({target}) DO NOTHING"
+            if returning:
+                sql += " RETURNING *"
+            out: List[Dict[str, object]] = []
+            try:
+                self.conn.execute("BEGIN")
+                for row in rows:
+                    values = [row.get(c) for c in columns]
+                    # jsonb columns are stored as JSON text and decoded again on read.
+                    values = [json.dumps(v) if isinstance(v, (dict, list)) else v for v in values]
+                    cursor = self.conn.execute(sql, values)
+                    if returning:
+                        out.extend(dict(r) for r in cursor.fetchall())
+                self.conn.execute("COMMIT")
+            except sqlite3.IntegrityError as exc:
+                self.conn.execute("ROLLBACK")
+                raise PostgrestError(409, "23505", str(exc))
+            except Exception:
+                self.conn.execute("ROLLBACK")
+                raise
+            return out
+
+    def update(self, table: str, values: Dict[str, object], query: Query) -> int:
+        with self.lock:
+            self._require_table(table)
+            known = {c["name"] for c in self.columns(table)}
+            unknown = [c for c in values if c not in known]
+            if unknown or not values:
+                raise PostgrestError(400, "PGRST204", f"Could not find the '{(unknown or ['<none>'])[0]}' column of '{table}' in the schema cache")
+            clauses, params = [], []
+            for f in query.filters:
+                clause, args = f.sql()
+                clauses.append(clause)
+                params.extend(args)
+            where = f" WHERE {' AND '.join(clauses)}" if clauses else ""
+            assignments = ",".join(f'"{c}"=?' for c in values)
+            try:
+                cursor = self.conn.execute(f'UPDATE "{table}" SET {assignments}{where}', [*values.values(), *params])
+            except sqlite3.IntegrityError as exc:
+                raise PostgrestError(409, "23505", str(exc))
+            return cursor.rowcount
+
+    # -- rpc --
+    def rpc(self, function: str, args: Dict[str, object]) -> object:
+        with self.lock:
+            if function == "wigg_index_health":
+                return self.index_health(str(args.get("p_table")))
+            if function == "wigg_explain_lookup":
+                return self.explain_lookup(str(args.get("p_table")), dict(args.get("p_filters") or {}))
+        raise PostgrestError(404, "PGRST202", f"Could not find the function public.{function} in the schema cache")
+
+    def _index_bytes(self, name: str) -> int:
+        try:
+            return int(self.conn.execute("SELECT COALESCE(SUM(pgsize), 0) FROM dbstat WHERE name = ?", (name,)).fetchone()[0])
+        except sqlite3.OperationalError:  # SQLite built without dbstat
+            return 0
+
+    def index_health(self, table: str) -> List[Dict[str, object]]:
+        """Rows shaped like the wigg_index_health migration's function; every SQLite index is valid."""
+        self._require_table(table)
+        rows: List[Dict[str, object]] = []
+
+        def row(name: str, cols: List[str], *, unique: bool, primary: bool = False, partial: bool = False, size_of: str = "") -> None:
+            sql = self.conn.execute("SELECT sql FROM sqlite_master WHERE type = 'index' AND name = ?", (name,)).fetchone()
+            rows.append(
+                {
+                    "index_name": name,
+                    "columns": cols,
+                    "is_unique": unique,
+                    "is_primary": primary,
+                    "is_valid": True,
+                    "is_ready": True,
+                    "is_partial": partial,
+                    "size_bytes": self._index_bytes(size_of or name),
+                    "scans": 0,
+                    "definition": (sql["sql"] if sql and sql["sql"] else ""),
+                }
+            )
+
+        pk = [r["name"] for r in sorted(self.columns(table), key=lambda r: r["pk"]) if r["pk"]]
+        if pk:
+            # An INTEGER PRIMARY KEY is the rowid itself; report the table b-tree as its index.
+            auto = [i["name"] for i in self.conn.execute(f'PRAGMA index_list("{table}")') if i["origin"] == "pk"]
+            row(f"{table}_pkey", pk, unique=True, primary=True, size_of=auto[0] if auto else table)
+        for index in self.conn.execute(f'PRAGMA index_list("{table}")'):
+            if index["origin"] == "pk":
+                continue
+            cols = [r["name"] for r in self.conn.execute(f'PRAGMA index_info("{index["name"]}")')]
+            row(index["name"], cols, unique=bool(index["unique"]), partial=bool(index["partial"]))
+        return sorted(rows, key=lambda r: str(r["index_name"]))
+
+    def explain_lookup(self, table: str, filters: Dict[str, object]) -> List[Dict[str, object]]:
+        self._require_table(table)
+        clauses, params = [], []
+        for column, value in filters.items():
+            if not IDENTIFIER.match(column):
+                raise PostgrestError(400, "42703", f"invalid column {column!r}")
+            if value is None:
+                clauses.append(f'"{column}" IS NULL')
+            else:
+                clauses.append(f'"{column}" = ?')
+                params.append(value)
+        sql = f'SELECT 1 FROM "{table}" WHERE {" AND ".join(clauses) or "1"}'
+        try:
+            detail = " ".join(r["detail"] for r in self.conn.execute(f"EXPLAIN QUERY PLAN {sql}", params))
+            started = time.perf_counter()
+            self.conn.execute(sql, params).fetchall()
+            elapsed = (time.perf_counter() - started) * 1000.0
+        except sqlite3.OperationalError as exc:
+            raise PostgrestError(400, "42703", str(exc))
+        index = re.search(r"USING (?:COVERING )?INDEX (\w+)", detail)
+        if "COVERING INDEX" in detail:
+            node = "Index Only Scan"
+        elif index or "PRIMARY KEY" in detail:
+            node = "Index Scan"
+        else:
+            node = "Seq Scan"
+        plan: Dict[str, object] = {"Node Type": node, "Relation Name": table}
+        if index:
+            plan["Index Name"] = index.group(1)
+        return [{"Plan": plan, "Planning Time": 0.0, "Execution Time": round(elapsed, 3)}]
+
+    def _require_table(self, table: str) -> None:
+        if table not in self.tables():
+            raise PostgrestError(404, "42P01", f'relation "public.{table}" does not exist')
+
+
+class StandInStats:
+    def __init__(self) -> None:
+        self.lock = threading.Lock()
+        self.counters: Dict[str, int] = {}
+
+    def add(self, key: str, amount: int = 1) -> None:
+        with self.lock:
+            self.counters[key] = self.counters.get(key, 0) + amount
+
+    def snapshot(self) -> Dict[str, int]:
+        with self.lock:
+            return dict(self.counters)
+
+
+class PostgrestHandler(BaseHTTPRequestHandler):
+    # HTTP/1.1 keep-alive, so the connection counter reflects client-side reuse.
+    protocol_version = "HTTP/1.1"
+    disable_nagle_algorithm = True
+    server_version = "PostgrestStandIn/1.0"
+    catalog: SQLiteCatalog
+    faults: FaultConfig
+    stats: StandInStats
+    rng: random.Random
+
+    def setup(self) -> None:
+        super().setup()
+        self.stats.add("connections")
+
+    def log_message(self, format, *args):  # noqa: A002 - signature fixed by BaseHTTPRequestHandler
+        return
+
+    def do_GET(self):
+        self._handle("GET")
+
+    def do_HEAD(self):
+        self._handle("HEAD")
+
+    def do_POST(self):
+        self._handle("POST")
+
+    def do_PATCH(self):
+        self._handle("PATCH")
+
+    def _handle(self, method: str) -> None:
+        length = int(self.headers.get("Content-Length") or 0)
+        body = self.rfile.read(length) if length else b""
+        self.stats.add("bytes_in", len(body))
+        parsed = urllib.parse.urlparse(self.path)
+        if parsed.path == "/__stats":
+            return self._send(200, self.stats.snapshot(), method=method)
+        match = re.match(r"^/rest/v1/(rpc/)?([A-Za-z_][A-Za-z0-9_]*)/?$", parsed.path)
+        if not match:
+            return self._send(404, self._error_body("PGRST125", "Invalid path specified in request URL"), method=method)
+        rpc, table = bool(match.group(1)), match.group(2)
+        if rpc:
+            kind = "rpc"
+        else:
+            kind = {"POST": "upsert", "PATCH": "update"}.get(method) or ("count" if "count=" in (self.headers.get("Prefer") or "") else "select")
+        self.stats.add(f"requests_{kind}")
+
+        with self.stats.lock:
+            delay = (self.faults.latency_ms + self.rng.uniform(0, self.faults.jitter_ms)) / 1000.0
+            injected = self.faults.error_rate and self.rng.random() < self.faults.error_rate
+            status = self.rng.choice(self.faults.error_statuses) if injected else 200
+        if delay:
+            time.sleep(delay)
+        if injected:
+            self.stats.add(f"injected_{status}")
+            return self._send(status, self._error_body(str(status), f"stand-in injected {status}"), method=method)
+
+        try:
+            if not self.headers.get("apikey"):
+                raise PostgrestError(401, "PGRST301", "No API key found in request")
+            pairs = urllib.parse.parse_qsl(parsed.query, keep_blank_values=True)
+            prefer = self._prefer()
+            if rpc:
+                self._rpc(table, body)
+            elif method == "POST":
+                self._post(table, pairs, body, prefer)
+            elif method == "PATCH":
+                self._patch(table, pairs, body, prefer)
+            else:
+                self._get(table, pairs, prefer, method)
+        except PostgrestError as exc:
+            self.stats.add(f"errors_{exc.status}")
+            self._send(exc.status, self._error_body(exc.code, exc.message), method=method)
+
+    def _prefer(self) -> Dict[str, str]:
+        prefer: Dict[str, str] = {}
+        for part in (self.headers.get("Prefer") or "").split(","):
+            key, _, value = part.strip().partition("=")
+            if key:
+                prefer[key] = value
+        return prefer
+
+    def _get(self, table: str, pairs, prefer: Dict[str, str], method: str) -> None:
+        profile = self.headers.get("Accept-Profile") or "public"
+        query = Query.parse(pairs)
+        rows, total = self.catalog.select(profile, table, query, want_count=prefer.get("count") == "exact")
+        start = query.offset
+        end = f"{start + len(rows) - 1}" if rows else ""
+        content_range = f"{start}-{end}/{total if total is not None else '*'}" if rows else f"*/{total if total is not None else '*'}"
+        self._send(200, rows, {"Content-Range": content_range}, method=method)
+
+    def _post(self, table: str, pairs, body: bytes, prefer: Dict[str, str]) -> None:
+        if (self.headers.get("Content-Profile") or "public") != "public":
+            raise PostgrestError(405, "PGRST106", "catalog schemas are read-only")
+        if self.catalog.rls and self._role() != "service_role":
+            raise PostgrestError(401, "42501", f'new row violates row-level security policy for table "{table}"')
+        try:
+            payload = json.loads(body.decode("utf-8") or "[]")
+        except ValueError as exc:
+            raise PostgrestError(400, "PGRST102", f"Empty or invalid json: {exc}")
+        rows = payload if isinstance(payload, list) else [payload]
+        params = dict(pairs)
+        resolution = prefer.get("resolution", "").replace("-duplicates", "")
+        returning = prefer.get("return") == "representation"
+        out = self.catalog.upsert(table, rows, params.get("on_conflict"), resolution, returning, params.get("columns"))
+        self.stats.add("rows_written", len(rows))
+        self._send(201, out if returning else None)
+
+    def _patch(self, table: str, pairs, body: bytes, prefer: Dict[str, str]) -> None:
+        if self.catalog.rls and self._role() != "service_role":
+            raise PostgrestError(401, "42501", f'new row violates row-level security policy for table "{table}"')
+        try:
+            values = json.loads(body.decode("utf-8") or "{}")
+        except ValueError as exc:
+            raise PostgrestError(400, "PGRST102", f"Empty or invalid json: {exc}")
+        updated = self.catalog.update(table, values, Query.parse(pairs))
+        self.stats.add("rows_updated", updated)
+        headers = {"Content-Range": f"*/{updated}"} if prefer.get("count") == "exact" else {}
+        self._send(204, None, headers)
+
+    def _rpc(self, function: str, body: bytes) -> None:
+        try:
+            args = json.loads(body.decode("utf-8") or "{}")
+        except ValueError as exc:
+            raise PostgrestError(400, "PGRST102", f"Empty or invalid json: {exc}")
+        self._send(200, self.catalog.rpc(function, args))
+
+    def _role(self) -> str:
+        token = (self.headers.get("Authorization") or "").replace("Bearer ", "") or self.headers.get("apikey", "")
+        try:
+            payload = token.split(".")[1]
+            return str(json.loads(base64.urlsafe_b64decode(payload + "=" * (-len(payload) % 4))).get("role"))
+        except Exception:
+            return "anon"
+
+    @staticmethod
+    def _error_body(code: str, message: str) -> Dict[str, object]:
+        return {"code": code, "message": message, "details": None, "hint": None}
+
+    def _send(self, status: int, payload, headers: Optional[Dict[str, str]] = None, *, method: str = "GET") -> None:
+        body = b"" if payload is None else json.dumps(payload).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        for key, value in (headers or {}).items():
+            self.send_header(key, value)
+        self.end_headers()
+        if method != "HEAD":
+            self.wfile.write(body)
+        self.stats.add("bytes_out", len(body))
+
+
+class PostgrestStandIn:
+    """Runs the stand-in on a background thread; usable as a context manager."""
+
+    def __init__(
+        self,
+        catalog: Optional[SQLiteCatalog] = None,
+        faults: FaultConfig = FaultConfig(),
+        *,
+        host: str = "127.0.0.1",
+        port: int = 0,
+    ) -> None:
+        self.catalog = catalog or SQLiteCatalog()
+        self.faults = faults
+        self.stats = StandInStats()
+        attrs = {"catalog": self.catalog, "faults": faults, "stats": self.stats, "rng": random.Random(faults.seed)}
+        handler = type("BoundPostgrestHandler", (PostgrestHandler,), attrs)
+        self.server = ThreadingHTTPServer((host, port), handler)
+        self.server.daemon_threads = True
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def url(self) -> str:
+        host, port = self.server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def row_count(self, table: str) -> int:
+        with self.catalog.lock:
+            return self.catalog.conn.execute(f'SELECT COUNT(*) FROM "{table}"').fetchone()[0]
+
+    def start(self) -> "PostgrestStandIn":
+        self._thread = threading.Thread(target=self.server.serve_forever, name="postgrest-standin", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self.server.shutdown()
+        self.server.server_close()
+        if self._thread is not None:
+            self._thread.join()
+
+    def __enter__(self) -> "PostgrestStandIn":
+        return self.start()
+
+    def __exit__(self, *exc) -> None:
+        self.stop()
+
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser(description="Serve a SQLite-backed PostgREST subset for Supabase writer load tests.")
+    ap.add_argument("--host", default="127.0.0.1")
+    ap.add_argument("--port", type=int, default=54321)
+    ap.add_argument("--db", default=":memory:", help="SQLite file backing the tables")
+    ap.add_argument("--schema", default=None, help="SQLite DDL file to create instead of the default moments_seed table")
+    ap.add_argument("--rls", action="store_true", help="Report RLS enabled and reject writes from non service_role keys")
+    ap.add_argument("--latency-ms", type=float, default=0.0, help="Fixed latency added to every response")
+    ap.add_argument("--jitter-ms", type=float, default=0.0, help="Uniform random latency on top of --latency-ms")
+    ap.add_argument("--error-rate", type=float, default=0.0, help="Fraction of requests answered with an injected error")
+    ap.add_argument("--error-statuses", type=int, nargs="*", default=[429, 503], help="Statuses to inject")
+    ap.add_argument("--print-key", action="store_true", help="Print a service_role key the stand-in accepts and exit")
+    args = ap.parse_args()
+
+    if args.print_key:
+        print(standin_service_key())
+        raise SystemExit(0)
+    schema_sql = DEFAULT_SCHEMA
+    if args.schema:
+        with open(args.schema, "r", encoding="utf-8") as fh:
+            schema_sql = fh.read()
+    faults = FaultConfig(
+        latency_ms=args.latency_ms,
+        jitter_ms=args.jitter_ms,
+        error_rate=args.error_rate,
+        error_statuses=tuple(args.error_statuses),
+    )
+    standin = PostgrestStandIn(SQLiteCatalog(args.db, schema_sql, rls=args.rls), faults, host=args.host, port=args.port)
+    print(f"PostgREST stand-in serving {', '.join(standin.catalog.tables())} on {standin.url}")
+    try:
+        standin.server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        standin.server.server_close()
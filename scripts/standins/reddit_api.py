@@ -0,0 +1,377 @@
+#!/usr/bin/env python3
+"""
+reddit_api.py
+
+Local stand-in for the slice of the Reddit API the seed scripts use, for
+throughput, rate-limit and retry testing without network access:
+
+  POST /api/v1/access_token        client-credentials OAuth
+  GET  /r/{subs}/search            listing search (sort=new, limit/after paging)
+  GET  /comments/{id}              submission + comment tree (sort=new), capped by `limit` with a "more" stub
+  GET  /api/morechildren           expands "more" stubs
+  GET  /api/info                   batch lookup by fullname (used by --mode refresh)
+  GET  /__stats                    request counters for assertions
+
+Responses carry X-Ratelimit-Remaining/Used/Reset headers from a fixed window.
+Latency, jitter and 429 injection are configurable, and an exhausted window
+answers 429 like Reddit does.
+
+Point the seeder at it with:
+  REDDIT_URL=http://127.0.0.1:8765 REDDIT_OAUTH_URL=http://127.0.0.1:8765 python scripts/wigg_reddit_seed.py ...
+
+Example usage (from the repo root):
+  python -m scripts.standins.reddit_api --port 8765 --comments 100000 --latency-ms 80 --error-rate 0.02
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import random
+import re
+import threading
+import time
+import urllib.parse
+from dataclasses import dataclass
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List, Optional, Sequence, Tuple
+
+from scripts.benchmarks.synthetic_reddit import CorpusConfig, SyntheticCorpus
+
+AUTHOR = "standin_user"
+
+
+@dataclass
+class FaultConfig:
+    latency_ms: float = 0.0
+    jitter_ms: float = 0.0
+    error_rate: float = 0.0
+    ratelimit_budget: int = 1000
+    ratelimit_window: int = 600
+    seed: int = 99
+
+
+class RedditCorpus:
+    """Submissions and comments indexed the way the endpoints need them."""
+
+    def __init__(self) -> None:
+        self.submissions: Dict[str, dict] = {}
+        self.by_subreddit: Dict[str, List[str]] = {}
+        self.comments: Dict[str, dict] = {}
+        self.thread_comments: Dict[str, List[str]] = {}
+
+    @classmethod
+    def synthetic(cls, comments: int, *, seed: int = 1234) -> "RedditCorpus":
+        return cls.from_objects(SyntheticCorpus(CorpusConfig(comments=comments, seed=seed)))
+
+    @classmethod
+    def from_objects(cls, submissions) -> "RedditCorpus":
+        """Build from PRAW-shaped objects (e.g. synthetic_reddit or test fakes)."""
+        corpus = cls()
+        for subm in submissions:
+            sub = str(getattr(subm, "subreddit", "") or "")
+            sid = str(subm.id)
+            corpus.submissions[sid] = {
+                "id": sid,
+                "name": f"t3_{sid}",
+                "title": subm.title,
+                "selftext": getattr(subm, "selftext", "") or "",
+                "score": int(getattr(subm, "score", 0) or 0),
+                "created_utc": float(getattr(subm, "created_utc", 0) or 0),
+                "num_comments": int(getattr(subm, "num_comments", 0) or 0),
+                "permalink": getattr(subm, "permalink", f"/r/{sub}/comments/{sid}/"),
+                "subreddit": sub,
+                "subreddit_name_prefixed": f"r/{sub}",
+                "author": AUTHOR,
+                "url": f"https://www.reddit.com/r/{sub}/comments/{sid}/",
+                "over_18": False,
+            }
+            corpus.by_subreddit.setdefault(sub.lower(), []).append(sid)
+            ids: List[str] = []
+            for c in subm.comments.list():
+                cid = str(c.id)
+                corpus.comments[cid] = {
+                    "id": cid,
+                    "name": f"t1_{cid}",
+                    "body": getattr(c, "body", "") or "",
+                    "score": int(getattr(c, "score", 0) or 0),
+                    "created_utc": float(getattr(c, "created_utc", 0) or 0),
+                    "permalink": getattr(c, "permalink", f"/r/{sub}/comments/{sid}/x/{cid}/"),
+                    "link_id": f"t3_{sid}",
+                    "parent_id": getattr(c, "parent_id", None) or f"t3_{sid}",
+                    "subreddit": sub,
+                    "author": AUTHOR,
+                    "depth": int(getattr(c, "depth", 0) or 0),
+                }
+                ids.append(cid)
+            corpus.thread_comments[sid] = ids
+        for ids in corpus.by_subreddit.values():
+            ids.sort(key=lambda sid: corpus.submissions[sid]["created_utc"], reverse=True)
+        return corpus
+
+    def add_comment(self, sid: str, cid: str, body: str, created_utc: float, *, parent_id: Optional[str] = None) -> None:
+        """Post a reply to an existing thread, e.g. to exercise incremental refreshes."""
+        subm = self.submissions[sid]
+        self.comments[cid] = {
+            "id": cid,
+            "name": f"t1_{cid}",
+            "body": body,
+            "score": 1,
+            "created_utc": float(created_utc),
+            "permalink": f"/r/{subm['subreddit']}/comments/{sid}/x/{cid}/",
+            "link_id": f"t3_{sid}",
+            "parent_id": parent_id or f"t3_{sid}",
+            "subreddit": subm["subreddit"],
+            "author": AUTHOR,
+            "depth": self.comments[parent_id[3:]]["depth"] + 1 if parent_id and parent_id.startswith("t1_") else 0,
+        }
+        self.thread_comments.setdefault(sid, []).append(cid)
+        subm["num_comments"] += 1
+
+
+def query_matcher(query: str):
+    """Loose Reddit search semantics: quoted phrases (or bare words), AND = all, otherwise any."""
+    phrases = [p.lower() for p in re.findall(r'"([^"]+)"', query)]
+    if not phrases:
+        phrases = [w.lower() for w in re.findall(r"[\w']+", query) if w not in ("AND", "OR", "NOT", "title", "selftext")]
+    require_all = " AND " in query
+
+    def match(subm: dict) -> bool:
+        text = f"{subm['title']}\n{subm['selftext']}".lower()
+        hits = [p in text for p in phrases]
+        return all(hits) if require_all else any(hits)
+
+    return match
+
+
+def listing(children: List[dict], after: Optional[str] = None) -> dict:
+    return {"kind": "Listing", "data": {"after": after, "before": None, "dist": len(children), "children": children}}
+
+
+class StandInState:
+    def __init__(self, corpus: RedditCorpus, faults: FaultConfig) -> None:
+        self.corpus = corpus
+        self.faults = faults
+        self.rng = random.Random(faults.seed)
+        self.lock = threading.Lock()
+        self.window_started = time.monotonic()
+        self.window_used = 0
+        self.counts: Dict[str, int] = {}
+
+    def admit(self, endpoint: str) -> Tuple[int, Dict[str, str]]:
+        """Charge one request against the window; returns (status, rate-limit headers)."""
+        with self.lock:
+            now = time.monotonic()
+            if now - self.window_started >= self.faults.ratelimit_window:
+                self.window_started = now
+                self.window_used = 0
+            self.window_used += 1
+            self.counts[endpoint] = self.counts.get(endpoint, 0) + 1
+            remaining = max(self.faults.ratelimit_budget - self.window_used, 0)
+            reset = max(int(self.faults.ratelimit_window - (now - self.window_started)), 0)
+            headers = {
+                "x-ratelimit-remaining": f"{remaining:.1f}",
+                "x-ratelimit-used": str(self.window_used),
+                "x-ratelimit-reset": str(reset),
+            }
+            injected = self.faults.error_rate and self.rng.random() < self.faults.error_rate
+            delay = (self.faults.latency_ms + self.rng.uniform(0, self.faults.jitter_ms)) / 1000.0
+        if delay:
+            time.sleep(delay)
+        if self.window_used > self.faults.ratelimit_budget or injected:
+            with self.lock:
+                self.counts["429"] = self.counts.get("429", 0) + 1
+            return 429, headers
+        return 200, headers
+
+
+class RedditStandInHandler(BaseHTTPRequestHandler):
+    server_version = "RedditStandIn/1.0"
+    state: StandInState  # set on the subclass built by RedditStandIn
+
+    def log_message(self, format, *args):  # noqa: A002 - signature fixed by BaseHTTPRequestHandler
+        return
+
+    def do_POST(self):
+        length = int(self.headers.get("Content-Length") or 0)
+        body = self.rfile.read(length).decode("utf-8") if length else ""
+        self._dispatch(dict(urllib.parse.parse_qsl(body)))
+
+    def do_GET(self):
+        self._dispatch({})
+
+    def _dispatch(self, form: Dict[str, str]) -> None:
+        parsed = urllib.parse.urlparse(self.path)
+        params = dict(urllib.parse.parse_qsl(parsed.query))
+        params.update(form)
+        path = parsed.path.rstrip("/")
+        if path.endswith(".json"):
+            path = path[: -len(".json")]
+
+        if path == "/__stats":
+            with self.state.lock:
+                return self._send(200, dict(self.state.counts), {})
+        if path == "/api/v1/access_token":
+            return self._send(200, {"access_token": "standin-token", "token_type": "bearer", "expires_in": 86400, "scope": "*"}, {})
+
+        routes = [
+            (re.compile(r"^/r/([^/]+)/search$"), "search", self._search),
+            (re.compile(r"^/comments/([^/]+)(?:/[^/]*)?$"), "comments", self._comments),
+            (re.compile(r"^/api/morechildren$"), "morechildren", self._morechildren),
+            (re.compile(r"^/api/info$"), "info", self._info),
+        ]
+        for pattern, endpoint, handler in routes:
+            match = pattern.match(path)
+            if not match:
+                continue
+            status, headers = self.state.admit(endpoint)
+            if status == 429:
+                return self._send(429, {"message": "Too Many Requests", "error": 429}, headers)
+            return self._send(200, handler(match, params), headers)
+        self._send(404, {"message": "Not Found", "error": 404}, {})
+
+    def _send(self, status: int, payload, headers: Dict[str, str]) -> None:
+        body = json.dumps(payload).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json; charset=UTF-8")
+        self.send_header("Content-Length", str(len(body)))
+        for key, value in headers.items():
+            self.send_header(key, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    # -- endpoints --
+    def _search(self, match, params: Dict[str, str]) -> dict:
+        corpus = self.state.corpus
+        subs = [s.lower() for s in match.group(1).split("+")]
+        ids = [sid for sub in subs for sid in corpus.by_subreddit.get(sub, [])]
+        if len(subs) > 1:
+            ids.sort(key=lambda sid: corpus.submissions[sid]["created_utc"], reverse=True)
+        matcher = query_matcher(params.get("q", ""))
+        hits = [sid for sid in ids if matcher(corpus.submissions[sid])]
+        start = 0
+        if params.get("after"):
+            names = [f"t3_{sid}" for sid in hits]
+            start = names.index(params["after"]) + 1 if params["after"] in names else len(hits)
+        limit = min(int(params.get("limit") or 25), 100)
+        page = hits[start : start + limit]
+        after = f"t3_{page[-1]}" if page and start + limit < len(hits) else None
+        return listing([{"kind": "t3", "data": corpus.submissions[sid]} for sid in page], after)
+
+    def _comments(self, match, params: Dict[str, str]) -> list:
+        corpus = self.state.corpus
+        sid = match.group(1)
+        subm = corpus.submissions.get(sid)
+        if subm is None:
+            return [listing([]), listing([])]
+        ids = corpus.thread_comments.get(sid, [])
+        if params.get("sort") == "new":
+            ids = sorted(ids, key=lambda cid: corpus.comments[cid]["created_utc"], reverse=True)
+        limit = min(int(params.get("limit") or 200), 500)  # Reddit's own caps
+        shown, rest = ids[:limit], ids[limit:]
+        tree = self._tree(shown)
+        children = tree.get(f"t3_{sid}", [])
+        if rest:
+            children.append(
+                {
+                    "kind": "more",
+                    "data": {"count": len(rest), "name": "t1__", "id": "_", "parent_id": f"t3_{sid}", "depth": 0, "children": rest},
+                }
+            )
+        return [listing([{"kind": "t3", "data": subm}]), listing(children)]
+
+    def _tree(self, ids: Sequence[str]) -> Dict[str, List[dict]]:
+        corpus = self.state.corpus
+        shown = set(ids)
+        nodes = {cid: {"kind": "t1", "data": dict(corpus.comments[cid], replies="")} for cid in ids}
+        children: Dict[str, List[dict]] = {}
+        for cid in ids:
+            parent = corpus.comments[cid]["parent_id"]
+            if parent.startswith("t1_") and parent[3:] not in shown:
+                parent = corpus.comments[cid]["link_id"]
+            children.setdefault(parent, []).append(nodes[cid])
+        for cid, node in nodes.items():
+            replies = children.get(f"t1_{cid}")
+            if replies:
+                node["data"]["replies"] = listing(replies)
+        return children
+
+    def _morechildren(self, match, params: Dict[str, str]) -> dict:
+        corpus = self.state.corpus
+        ids = [cid for cid in params.get("children", "").split(",") if cid in corpus.comments]
+        things = [{"kind": "t1", "data": dict(corpus.comments[cid], replies="")} for cid in ids]
+        return {"json": {"errors": [], "data": {"things": things}}}
+
+    def _info(self, match, params: Dict[str, str]) -> dict:
+        corpus = self.state.corpus
+        children = []
+        for fullname in params.get("id", "").split(","):
+            kind, _, thing_id = fullname.partition("_")
+            if kind == "t3" and thing_id in corpus.submissions:
+                children.append({"kind": "t3", "data": corpus.submissions[thing_id]})
+            elif kind == "t1" and thing_id in corpus.comments:
+                children.append({"kind": "t1", "data": dict(corpus.comments[thing_id], replies="")})
+        return listing(children)
+
+
+class RedditStandIn:
+    """Runs the stand-in on a background thread; usable as a context manager."""
+
+    def __init__(self, corpus: RedditCorpus, faults: FaultConfig = FaultConfig(), *, host: str = "127.0.0.1", port: int = 0) -> None:
+        self.state = StandInState(corpus, faults)
+        handler = type("BoundRedditStandInHandler", (RedditStandInHandler,), {"state": self.state})
+        self.server = ThreadingHTTPServer((host, port), handler)
+        self.server.daemon_threads = True
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def url(self) -> str:
+        host, port = self.server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self) -> "RedditStandIn":
+        self._thread = threading.Thread(target=self.server.serve_forever, name="reddit-standin", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self.server.shutdown()
+        self.server.server_close()
+        if self._thread is not None:
+            self._thread.join()
+
+    def __enter__(self) -> "RedditStandIn":
+        return self.start()
+
+    def __exit__(self, *exc) -> None:
+        self.stop()
+
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser(description="Serve a synthetic corpus through a local Reddit API stand-in.")
+    ap.add_argument("--host", default="127.0.0.1")
+    ap.add_argument("--port", type=int, default=8765)
+    ap.add_argument("--comments", type=int, default=20000, help="Synthetic corpus size in comments")
+    ap.add_argument("--seed", type=int, default=1234, help="Corpus RNG seed")
+    ap.add_argument("--latency-ms", type=float, default=0.0, help="Fixed latency added to every API response")
+    ap.add_argument("--jitter-ms", type=float, default=0.0, help="Uniform random latency on top of --latency-ms")
+    ap.add_argument("--error-rate", type=float, default=0.0, help="Fraction of API requests answered with an injected 429")
+    ap.add_argument("--ratelimit-budget", type=int, default=1000, help="Requests allowed per rate-limit window")
+    ap.add_argument("--ratelimit-window", type=int, default=600, help="Rate-limit window length in seconds")
+    args = ap.parse_args()
+
+    corpus = RedditCorpus.synthetic(args.comments, seed=args.seed)
+    faults = FaultConfig(
+        latency_ms=args.latency_ms,
+        jitter_ms=args.jitter_ms,
+        error_rate=args.error_rate,
+        ratelimit_budget=args.ratelimit_budget,
+        ratelimit_window=args.ratelimit_window,
+    )
+    standin = RedditStandIn(corpus, faults, host=args.host, port=args.port)
+    print(f"Reddit stand-in serving {len(corpus.submissions)} submissions / {len(corpus.comments)} comments on {standin.url}")
+    try:
+        standin.server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        standin.server.server_close()
@@ -9,44 +9,105 @@ as source=reddit and status=needs_review.
 Guardrails implemented:
 - Discovers Supabase schema/constraints before writes (no hard-coded names).
 - Uses idempotent upserts with the discovered UNIQUE constraint.
-- Supports --dry-run to preview payloads without mutating the database.
+- Optionally checks the indexes behind upserts and lookups (--index-check)
+  and writes a fix-up migration when one is missing or invalid.
+- Supports --dry-run to preview payloads without mutating the database
+  (optionally exported in full with --dry-run-out and diffed with --diff).
 - Enforces RLS requirements (service role key required when enabled).
 - Retries on 429/5xx with exponential backoff.
 
 Requirements:
   pip install praw supabase==2.* python-dateutil tenacity rapidfuzz python-dotenv
+  (optional) pip install msgspec or orjson for faster JSON encoding (--json-backend)
+  (optional) pip install pyarrow for --dry-run-out *.parquet
 
 Environment variables required:
   REDDIT_CLIENT_ID, REDDIT_CLIENT_SECRET, REDDIT_USER_AGENT
+  (optional) REDDIT_URL, REDDIT_OAUTH_URL to target a local API stand-in
   SUPABASE_URL, SUPABASE_SERVICE_KEY  (use service key for server-side inserts)
 
 Example usage:
   python wigg_reddit_seed.py --subs r/television r/anime --limit 200 --since 2023-01-01 --dry-run
+  python wigg_reddit_seed.py --queue crawl.db --enqueue --since 2023-01-01   # run one per worker
+  python wigg_reddit_seed.py --mode refresh   # re-score seeded rows via batched /api/info
+  python wigg_reddit_seed.py --mode daemon --flush-interval 60   # follow new posts/comments live
+  python wigg_reddit_seed.py --mode threads --thread-watermarks threads.db   # new replies in already-indexed threads
+  python wigg_reddit_seed.py --dry-run --profile cpu --profile-dir profiles/   # pstats + collapsed stacks per stage
+  python wigg_reddit_seed.py --dry-run --ruleset default enhanced   # A/B rulesets in one crawl; rows tagged by ruleset
+  python wigg_reddit_seed.py --hash-index hashes.db --rebuild-hash-index   # recrawl sends only changed rows
+  python wigg_reddit_seed.py --dry-run --dry-run-out backfill.parquet --diff   # export a backfill and diff it against the table
+  python wigg_reddit_seed.py --aggregates agg.db --merge-aggregates worker2.db   # publish per-title metrics for changed titles
+  python wigg_reddit_seed.py --title-aliases titles.db   # "Is Breaking Bad" / "Breaking Bad S1" -> "Breaking Bad"
+  python wigg_reddit_seed.py --dry-run --index-probe   # check upsert/lookup indexes; writes a fix-up migration if needed
+  python wigg_reddit_seed.py --mode moderate --set-status rejected --max-confidence 0.4 --older-than-days 30   # bulk triage
+  python wigg_reddit_seed.py --mode mirror --mirror wigg_mirror.db   # incremental local copy; query it with scripts/query_mirror.py
+  python wigg_reddit_seed.py --mode dump --dump RS_2023.ndjson RC_2023.ndjson --dump-subs r/anime --dump-months 2023-02   # re-run one partition of local dumps
 """
 from __future__ import annotations
 
 import argparse
 import base64
+import functools
+import hashlib
+import heapq
 import json
 import logging
 import os
 import re
+import socket
 import sys
 import time
 import urllib.parse
-import urllib.request
-from dataclasses import dataclass
+from dataclasses import asdict, dataclass, field, fields, replace
 from datetime import datetime, timezone
 from pathlib import Path
-from typing import Dict, Iterable, List, Optional, Sequence, Tuple
-
-from dateutil import parser as dtparser
-from dotenv import load_dotenv
-from rapidfuzz import fuzz, process as rf_process
-from tenacity import retry, stop_after_attempt, wait_exponential_jitter
-
-import praw
-from supabase import Client, create_client
+from typing import TYPE_CHECKING, Any, Callable, Dict, List, Optional, Sequence, Tuple
+
+# Heavy clients (praw, supabase, rapidfuzz, dateutil, tenacity, dotenv,
+# urllib.request) are imported on first use so pure helpers such as
+# extract_moments import in milliseconds for tests and sidecar tools.
+if TYPE_CHECKING:
+    import praw
+    from supabase import Client
+
+try:
+    from scripts.wigg_seed_profiling import StageProfiler, install_profiler, profile_iter, profile_stage
+    from scripts.wigg_seed_storage import (
+        DUMP_STRIDE,
+        TITLE_MAX_CHARS,
+        CheckpointStore,
+        PayloadHashIndex,
+        SQLiteWorkQueue,
+        StreamCheckpoint,
+        TableMirror,
+        TitleAggregateStore,
+        TitleAliasStore,
+        WorkQueue,
+        WorkUnit,
+        YieldStore,
+        iter_keyset_pages,
+        normalize_row,
+        quote_ident,
+    )
+except ModuleNotFoundError:  # run as `python wigg_reddit_seed.py` from scripts/
+    from wigg_seed_profiling import StageProfiler, install_profiler, profile_iter, profile_stage  # type: ignore[no-redef]
+    from wigg_seed_storage import (  # type: ignore[no-redef]
+        DUMP_STRIDE,
+        TITLE_MAX_CHARS,
+        CheckpointStore,
+        PayloadHashIndex,
+        SQLiteWorkQueue,
+        StreamCheckpoint,
+        TableMirror,
+        TitleAggregateStore,
+        TitleAliasStore,
+        WorkQueue,
+        WorkUnit,
+        YieldStore,
+        iter_keyset_pages,
+        normalize_row,
+        quote_ident,
+    )
 
 # ----------------------------- Logging ---------------------------------
 logger = logging.getLogger("wigg.reddit_seed")
@@ -54,16 +115,20 @@ if not logger.handlers:
     logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(message)s")
 
 # ----------------------------- Config ---------------------------------
-# Load environment variables from a local .env file if present.
-# We search in: script directory, current working directory, and project root (one level up).
-for candidate in [
-    Path(__file__).with_name('.env'),
-    Path.cwd() / '.env',
-    Path(__file__).resolve().parent.parent / '.env',
-]:
-    if candidate.exists():
-        load_dotenv(candidate, override=False)
-        break
+@functools.lru_cache(maxsize=None)
+def load_env_files() -> Optional[Path]:
+    """Load environment variables from a .env file in the script dir, cwd or project root."""
+    for candidate in [
+        Path(__file__).with_name('.env'),
+        Path.cwd() / '.env',
+        Path(__file__).resolve().parent.parent / '.env',
+    ]:
+        if candidate.exists():
+            from dotenv import load_dotenv
+
+            load_dotenv(candidate, override=False)
+            return candidate
+    return None
 
 DEFAULT_SUBS = [
     "r/television", "r/anime", "r/movies", "r/netflix",
@@ -111,6 +176,7 @@ CANONICAL_FIELD_SYNONYMS: Dict[str, List[str]] = {
     "quote": ["quote", "excerpt", "snippet"],
     "created_utc": ["created_utc", "created_at", "timestamp_utc"],
     "status": ["status", "state"],
+    "ruleset": ["ruleset", "rule_set", "extraction_ruleset"],
 }
 
 PREFERRED_UNIQUES: List[List[str]] = [
@@ -119,8 +185,18 @@ PREFERRED_UNIQUES: List[List[str]] = [
     ["source_id", "content_title"],
 ]
 
+# A candidate's identity when the table has no usable unique key.
+CANDIDATE_KEY_FIELDS: Tuple[str, ...] = ("source_id", "content_title", "season", "episode", "minute", "ruleset")
+
 RETRYABLE_STATUS = {429, 500, 502, 503, 504}
 
+# Columns the refresh, diff and moderation paths filter on; each should lead some index.
+INDEXED_LOOKUPS: Tuple[str, ...] = ("source_id", "status")
+PROBE_SLOW_MS = 50.0  # probed lookups slower than this are reported
+INDEX_HEALTH_FUNCTIONS = "supabase/migrations/20261019010000_add_index_health_functions.sql"
+
+SEARCH_PAGE_SIZE = 100  # Reddit listings return at most 100 items per request.
+
 # --------------------------- Data classes ------------------------------
 @dataclass(frozen=True)
 class ColumnInfo:
@@ -149,11 +225,58 @@ class DiscoveryResult:
     def supports_upsert(self) -> bool:
         return bool(self.on_conflict_columns)
 
+    @property
+    def conflict_fields(self) -> Tuple[str, ...]:
+        """Candidate fields mapped to on_conflict_columns, or CANDIDATE_KEY_FIELDS when none are."""
+        by_column = {column: name for name, column in self.column_mapping.items() if column}
+        return tuple(by_column[c] for c in self.on_conflict_columns if c in by_column) or CANDIDATE_KEY_FIELDS
+
+    @property
+    def primary_key_columns(self) -> List[str]:
+        for meta in self.raw_constraints.values():
+            if str(meta["type"]).upper() == "PRIMARY KEY":
+                return list(meta["columns"])
+        return []
+
+
+@dataclass(frozen=True)
+class IndexInfo:
+    name: str
+    columns: List[str]
+    unique: bool
+    primary: bool
+    valid: bool
+    ready: bool
+    partial: bool
+    size_bytes: int
+    scans: int = 0
+    definition: str = ""
+
+    @property
+    def usable(self) -> bool:
+        return self.valid and self.ready and not self.partial
+
+
+@dataclass
+class IndexReport:
+    table: str
+    available: bool
+    indexes: List[IndexInfo] = field(default_factory=list)
+    conflict_index: Optional[str] = None
+    problems: List[str] = field(default_factory=list)
+    statements: List[str] = field(default_factory=list)
+    probes: Dict[str, Tuple[str, float]] = field(default_factory=dict)
+
+    @property
+    def healthy(self) -> bool:
+        return self.available and not self.problems
+
 
 @dataclass(frozen=True)
 class UpsertResult:
     inserted: int
     updated: int
+    candidates: int = 0
 
 
 @dataclass
@@ -172,6 +295,7 @@ class CandidateMoment:
     quote: str
     created_utc: int
     status: str = "needs_review"
+    ruleset: Optional[str] = None
 
     def to_payload(self, column_mapping: Dict[str, Optional[str]]) -> Dict[str, object]:
         payload: Dict[str, object] = {}
@@ -185,6 +309,104 @@ class CandidateMoment:
         return payload
 
 
+# ----------------------------- Serialization ---------------------------
+CANDIDATE_FIELDS: Tuple[str, ...] = tuple(f.name for f in fields(CandidateMoment))
+
+
+class JsonCodec:
+    """Stdlib json. Subclasses swap in a compiled encoder; digests use canonical_json instead."""
+
+    name = "json"
+    native_dataclasses = False
+
+    def dumps(self, obj: Any, *, sort_keys: bool = False) -> bytes:
+        return json.dumps(obj, sort_keys=sort_keys, separators=(",", ":"), ensure_ascii=False, default=str).encode("utf-8")
+
+    def loads(self, data: "bytes | str | memoryview") -> Any:
+        # json.loads takes no buffers; the compiled backends decode memoryviews in place.
+        return json.loads(bytes(data) if isinstance(data, memoryview) else data)
+
+    def encode_candidates(self, candidates: Sequence[CandidateMoment], column_mapping: Dict[str, Optional[str]]) -> bytes:
+        """JSON array of mapped rows for a PostgREST body, encoding the dataclasses directly when the mapping allows it."""
+        if self.native_dataclasses and encodes_as_is(candidates, column_mapping):
+            return self.dumps(list(candidates))
+        return self.dumps([c.to_payload(column_mapping) for c in candidates])
+
+
+class OrjsonCodec(JsonCodec):
+    name = "orjson"
+    native_dataclasses = True
+
+    def __init__(self) -> None:
+        import orjson
+
+        self._orjson = orjson
+
+    def dumps(self, obj: Any, *, sort_keys: bool = False) -> bytes:
+        return self._orjson.dumps(obj, default=str, option=self._orjson.OPT_SORT_KEYS if sort_keys else 0)
+
+    def loads(self, data: "bytes | str | memoryview") -> Any:
+        return self._orjson.loads(data)
+
+
+class MsgspecCodec(JsonCodec):
+    name = "msgspec"
+    native_dataclasses = True
+
+    def __init__(self) -> None:
+        import msgspec
+
+        self._encoder = msgspec.json.Encoder(enc_hook=str)
+        self._sorted_encoder = msgspec.json.Encoder(enc_hook=str, order="sorted")
+        self._decoder = msgspec.json.Decoder()
+
+    def dumps(self, obj: Any, *, sort_keys: bool = False) -> bytes:
+        return (self._sorted_encoder if sort_keys else self._encoder).encode(obj)
+
+    def loads(self, data: "bytes | str | memoryview") -> Any:
+        return self._decoder.decode(data)
+
+
+JSON_BACKENDS: Dict[str, Callable[[], JsonCodec]] = {"msgspec": MsgspecCodec, "orjson": OrjsonCodec, "json": JsonCodec}
+
+
+def encodes_as_is(candidates: Sequence[CandidateMoment], column_mapping: Dict[str, Optional[str]]) -> bool:
+    """True when every mapped field keeps its own name as the column and no minute needs clamping."""
+    if any(column not in (None, name) for name, column in column_mapping.items()):
+        return False
+    return all(c.minute is None or clamp_minute(c.minute) == c.minute for c in candidates)
+
+
+def make_codec(name: str = "auto") -> JsonCodec:
+    """Build the named backend; `auto` takes the first of msgspec, orjson installed, else stdlib."""
+    if name != "auto":
+        if name not in JSON_BACKENDS:
+            raise SystemExit(f"Unknown JSON backend {name!r}; choose from auto, {', '.join(JSON_BACKENDS)}")
+        return JSON_BACKENDS[name]()
+    for factory in JSON_BACKENDS.values():
+        try:
+            return factory()
+        except ImportError:
+            continue
+    return JsonCodec()
+
+
+_CODEC: Optional[JsonCodec] = None
+
+
+def install_codec(codec: Optional[JsonCodec]) -> None:
+    global _CODEC
+    _CODEC = codec
+
+
+def json_codec() -> JsonCodec:
+    """The installed codec, picking one on first use so importing stays cheap."""
+    global _CODEC
+    if _CODEC is None:
+        _CODEC = make_codec()
+    return _CODEC
+
+
 # ------------------------ Supabase discovery ---------------------------
 class SupabaseMetaFetcher:
     def __init__(self, url: str, service_key: str, *, timeout: int = 15, logger: Optional[logging.Logger] = None):
@@ -214,6 +436,8 @@ class SupabaseMetaFetcher:
         return "&".join(encoded_parts)
 
     def _get(self, path: str, params: Dict[str, str], profile: Optional[str]) -> List[Dict[str, object]]:
+        import urllib.request
+
         query = self._encode_params(params)
         url = f"{self.base_url}/rest/v1/{path}"
         if query:
@@ -223,7 +447,7 @@ class SupabaseMetaFetcher:
             data = resp.read()
             if not data:
                 return []
-            return json.loads(data.decode("utf-8"))
+            return json_codec().loads(data)
 
     def list_tables(self) -> List[Dict[str, object]]:
         return self._get(
@@ -287,6 +511,23 @@ class SupabaseMetaFetcher:
                 )
         return result
 
+    def rpc(self, function: str, params: Dict[str, object]) -> Any:
+        import urllib.request
+
+        req = urllib.request.Request(
+            f"{self.base_url}/rest/v1/rpc/{function}",
+            data=json_codec().dumps(params),
+            headers={**self._headers(None), "Content-Type": "application/json"},
+            method="POST",
+        )
+        with urllib.request.urlopen(req, timeout=self.timeout) as resp:  # type: ignore[arg-type]
+            data = resp.read()
+            return json_codec().loads(data) if data else None
+
+    def sample_row(self, table: str, columns: Sequence[str]) -> Optional[Dict[str, object]]:
+        rows = self._get(table, {"select": ",".join(columns), "limit": "1"}, profile=None)
+        return rows[0] if rows else None
+
     def list_rls(self) -> Dict[str, bool]:
         public_oid_rows = self._get(
             "pg_namespace",
@@ -389,6 +630,8 @@ class DatabaseDiscovery:
         for record in tables:
             if str(record["table_name"]).lower() == desired_lower:
                 return record
+        from rapidfuzz import fuzz, process as rf_process
+
         candidates = [t for t in tables if str(t.get("table_schema", "public")) == "public"]
         names = [str(t["table_name"]) for t in candidates]
         matches = rf_process.extract(desired_table, names, scorer=fuzz.WRatio, limit=3)
@@ -416,6 +659,8 @@ class DatabaseDiscovery:
                     match = existing
                     break
             if not match and columns:
+                from rapidfuzz import fuzz, process as rf_process
+
                 best = rf_process.extractOne(canonical.replace("_", " "), [c for c in columns if c not in used], scorer=fuzz.WRatio)
                 if best and best[1] >= 78:
                     match = best[0]
@@ -444,6 +689,164 @@ class DatabaseDiscovery:
                 return name, cols
         return None, []
 
+    # -- index health --
+    def check_indexes(
+        self,
+        result: DiscoveryResult,
+        *,
+        lookups: Sequence[str] = INDEXED_LOOKUPS,
+        probe: bool = False,
+    ) -> IndexReport:
+        """Check the indexes behind the upsert conflict target and the lookup columns."""
+        import urllib.error
+
+        table = result.table_name
+        report = IndexReport(table=table, available=True)
+        try:
+            rows = self.fetcher.rpc("wigg_index_health", {"p_table": table}) or []
+        except urllib.error.HTTPError as exc:
+            if exc.code != 404:
+                raise
+            self.logger.warning("[Indexes] wigg_index_health RPC not found; apply %s to enable index checks", INDEX_HEALTH_FUNCTIONS)
+            report.available = False
+            return report
+        report.indexes = [
+            IndexInfo(
+                name=str(row["index_name"]),
+                columns=[str(c) for c in row.get("columns") or []],
+                unique=bool(row.get("is_unique")),
+                primary=bool(row.get("is_primary")),
+                valid=bool(row.get("is_valid", True)),
+                ready=bool(row.get("is_ready", True)),
+                partial=bool(row.get("is_partial")),
+                size_bytes=int(row.get("size_bytes") or 0),
+                scans=int(row.get("scans") or 0),
+                definition=str(row.get("definition") or ""),
+            )
+            for row in rows
+        ]
+        for index in report.indexes:
+            self.logger.info(
+                "[Indexes] %s (%s)%s%s size=%s scans=%d",
+                index.name,
+                ",".join(index.columns),
+                " unique" if index.unique else "",
+                "" if index.valid and index.ready else " INVALID",
+                format_bytes(index.size_bytes),
+                index.scans,
+            )
+            if not (index.valid and index.ready):
+                report.problems.append(f"index {index.name} is invalid (a failed concurrent build or reindex)")
+                report.statements.append(f"reindex index {quote_ident(result.table_schema)}.{quote_ident(index.name)};")
+
+        if result.on_conflict_columns:
+            wanted = set(result.on_conflict_columns)
+            arbiters = [i for i in report.indexes if i.unique and not i.partial and set(i.columns) == wanted]
+            usable = [i for i in arbiters if i.usable]
+            if usable:
+                report.conflict_index = usable[0].name
+            elif not arbiters:
+                report.problems.append(f"no unique index on the conflict target ({', '.join(result.on_conflict_columns)})")
+                report.statements.append(create_index_sql(result, result.on_conflict_columns, unique=True))
+
+        for canonical in lookups:
+            column = result.column_mapping.get(canonical)
+            if not column:
+                continue
+            if not any(i.usable and i.columns[:1] == [column] for i in report.indexes):
+                report.problems.append(f"no index leads with {column}; lookups on it scan the whole table")
+                report.statements.append(create_index_sql(result, [column]))
+
+        if probe:
+            self._probe(result, report, lookups)
+        for problem in report.problems:
+            self.logger.warning("[Indexes] %s: %s", result.full_table_name, problem)
+        self.logger.info(
+            "[Indexes] table=%s indexes=%d conflict_index=%s problems=%d",
+            result.full_table_name,
+            len(report.indexes),
+            report.conflict_index or "<none>",
+            len(report.problems),
+        )
+        return report
+
+    def _probe(self, result: DiscoveryResult, report: IndexReport, lookups: Sequence[str]) -> None:
+        """EXPLAIN ANALYZE the conflict-key lookup an upsert does and each lookup column, using a stored row's values."""
+        targets: Dict[str, List[str]] = {}
+        if result.on_conflict_columns:
+            targets["upsert"] = list(result.on_conflict_columns)
+        for canonical in lookups:
+            column = result.column_mapping.get(canonical)
+            if column:
+                targets[column] = [column]
+        wanted = list(dict.fromkeys(c for cols in targets.values() for c in cols))
+        sample = self.fetcher.sample_row(result.table_name, wanted) if wanted else None
+        if sample is None:
+            self.logger.info("[Indexes] %s is empty; skipping lookup probes", result.full_table_name)
+            return
+        for label, columns in targets.items():
+            plan = self.fetcher.rpc(
+                "wigg_explain_lookup",
+                {"p_table": result.table_name, "p_filters": {c: sample.get(c) for c in columns}},
+            )
+            root = (plan or [{}])[0]
+            node = scan_node(root.get("Plan") or {}, result.table_name)
+            elapsed = float(root.get("Execution Time") or 0.0)
+            report.probes[label] = (node, elapsed)
+            self.logger.info("[Indexes] probe %s: %s in %.2f ms", label, node, elapsed)
+            if elapsed > PROBE_SLOW_MS:
+                report.problems.append(f"{label} lookup took {elapsed:.1f} ms ({node})")
+
+
+def create_index_sql(result: DiscoveryResult, columns: Sequence[str], *, unique: bool = False) -> str:
+    name = f"{result.table_name}_{'_'.join(columns)}_{'key' if unique else 'idx'}"[:63]
+    cols = ", ".join(quote_ident(c) for c in columns)
+    kind = "unique index" if unique else "index"
+    return f"create {kind} if not exists {quote_ident(name)} on {quote_ident(result.table_schema)}.{quote_ident(result.table_name)} ({cols});"
+
+
+def scan_node(plan: Dict[str, Any], table: str) -> str:
+    """Node type of the scan on `table` in an EXPLAIN (FORMAT JSON) plan tree, e.g. "Index Scan"."""
+    if plan.get("Relation Name") == table:
+        return str(plan.get("Node Type"))
+    for child in plan.get("Plans") or []:
+        found = scan_node(child, table)
+        if found:
+            return found
+    return ""
+
+
+def format_bytes(size: int) -> str:
+    value = float(size)
+    for unit in ("B", "kB", "MB"):
+        if value < 1024:
+            return f"{value:.0f} {unit}" if unit == "B" else f"{value:.1f} {unit}"
+        value /= 1024
+    return f"{value:.1f} GB"
+
+
+def write_index_migration(report: IndexReport, directory: str, *, now: Optional[datetime] = None) -> Optional[Path]:
+    """Write the report's fix-up statements as a timestamped migration, unless nothing changed."""
+    if not report.statements:
+        return None
+    body = "\n".join(report.statements) + "\n"
+    out_dir = Path(directory)
+    suffix = f"_wigg_index_health_{report.table}.sql"
+    for existing in sorted(out_dir.glob(f"*{suffix}")):
+        if existing.read_text(encoding="utf-8").endswith(body):
+            return None
+    header = [
+        f"-- Index health fixes for public.{report.table}, generated by wigg_reddit_seed.py --index-check.",
+        "-- On a large, busy table run these by hand with create index concurrently instead.",
+        *(f"--   {problem}" for problem in report.problems),
+        "",
+    ]
+    stamp = (now or datetime.now(timezone.utc)).strftime("%Y%m%d%H%M%S")
+    out_dir.mkdir(parents=True, exist_ok=True)
+    path = out_dir / f"{stamp}{suffix}"
+    path.write_text("\n".join(header) + body, encoding="utf-8")
+    return path
+
 
 def decode_supabase_role(key: Optional[str]) -> str:
     if not key:
@@ -461,17 +864,31 @@ def decode_supabase_role(key: Optional[str]) -> str:
         return "unknown"
 
 
+class UpsertHTTPError(RuntimeError):
+    def __init__(self, status_code: int, body: str) -> None:
+        super().__init__(f"PostgREST upsert returned HTTP {status_code}: {body[:500]}")
+        self.status_code = status_code
+
+
 class SupabaseWriter:
+    UPDATE_CHUNK = 200  # keys per PATCH `in.(...)` filter, keeping request URLs short
+
     def __init__(
         self,
         *,
-        client: Client,
+        client: "Client",
         discovery: DiscoveryResult,
         dry_run: bool,
         logger: Optional[logging.Logger] = None,
         service_key_role: str,
         max_attempts: int = 5,
         base_backoff: float = 1.0,
+        hash_index: Optional[PayloadHashIndex] = None,
+        export: Optional[PayloadExport] = None,
+        diff: Optional[TableDiff] = None,
+        aggregates: Optional[TitleAggregateStore] = None,
+        titles: Optional[TitleAliasStore] = None,
+        top_k: int = 0,
     ) -> None:
         self.client = client
         self.discovery = discovery
@@ -480,6 +897,14 @@ class SupabaseWriter:
         self.service_key_role = service_key_role
         self.max_attempts = max_attempts
         self.base_backoff = base_backoff
+        self.hash_index = hash_index
+        self.export = export
+        self.diff = diff
+        self.aggregates = aggregates
+        self.titles = titles
+        self.top_k = top_k
+        self.retention = RetentionStats()
+        self.columns = list(dict.fromkeys(c for c in discovery.column_mapping.values() if c))
 
     def _ensure_service_role_when_needed(self) -> None:
         if self.discovery.rls_enabled and self.service_key_role != "service_role":
@@ -488,16 +913,52 @@ class SupabaseWriter:
             )
 
     def upsert_candidates(self, candidates: Sequence[CandidateMoment]) -> UpsertResult:
+        if self.titles is not None:
+            with profile_stage("resolve_titles"):
+                resolved: List[CandidateMoment] = []
+                for candidate in candidates:
+                    title = self.titles.resolve(candidate.content_title)
+                    resolved.append(candidate if title == candidate.content_title else replace(candidate, content_title=title))
+                candidates = resolved
+        result = self._upsert_candidates(candidates)
+        if self.aggregates is not None and not self.dry_run:
+            with profile_stage("aggregate"):
+                self.aggregates.observe(candidates)
+        return result
+
+    def _upsert_candidates(self, candidates: Sequence[CandidateMoment]) -> UpsertResult:
+        if candidates and self.hash_index is None and not self.dry_run and self.columns and self._session() is not None:
+            # Nothing downstream needs the row dicts, so the batch is encoded straight to the request body.
+            with profile_stage("to_payload"):
+                body = json_codec().encode_candidates(candidates, self.discovery.column_mapping)
+            return self._write(body, rows=len(candidates), candidates=len(candidates))
         payloads: List[Dict[str, object]] = []
-        for candidate in candidates:
-            payload = candidate.to_payload(self.discovery.column_mapping)
-            if not payload:
-                self.logger.warning("Skipping candidate %s due to empty payload after column mapping", candidate.source_id)
-                continue
-            payloads.append(payload)
+        with profile_stage("to_payload"):
+            for candidate in candidates:
+                payload = candidate.to_payload(self.discovery.column_mapping)
+                if not payload:
+                    self.logger.warning("Skipping candidate %s due to empty payload after column mapping", candidate.source_id)
+                    continue
+                payloads.append(payload)
+        return self.upsert_payloads(payloads)
 
+    def upsert_payloads(self, payloads: List[Dict[str, object]]) -> UpsertResult:
+        """Upsert already-mapped row dicts on the discovered conflict key."""
         if not payloads:
             return UpsertResult(inserted=0, updated=0)
+        candidates = len(payloads)
+        if self.dry_run:
+            # Before the hash index: the export and diff cover every payload, unchanged ones included.
+            if self.export is not None:
+                self.export.write(payloads)
+            if self.diff is not None:
+                with profile_stage("diff"):
+                    self.diff.add(payloads)
+        pending: List[Tuple[str, str]] = []
+        if self.hash_index is not None:
+            payloads, pending = self.hash_index.filter_changed(self.discovery, payloads)
+            if not payloads:
+                return UpsertResult(inserted=0, updated=0, candidates=candidates)
 
         if self.dry_run:
             self.logger.info(
@@ -507,24 +968,37 @@ class SupabaseWriter:
                 ",".join(self.discovery.on_conflict_columns) or "<none>",
             )
             sample = payloads[:3]
-            self.logger.info("Dry-run sample payloads: %s", json.dumps(sample, default=str))
-            return UpsertResult(inserted=0, updated=0)
+            self.logger.info("Dry-run sample payloads: %s", json_codec().dumps(sample).decode("utf-8"))
+            return UpsertResult(inserted=0, updated=0, candidates=candidates)
+
+        return self._write(payloads, rows=len(payloads), candidates=candidates, pending=pending)
 
+    def _write(
+        self,
+        batch: "List[Dict[str, object]] | bytes",
+        *,
+        rows: int,
+        candidates: int,
+        pending: Sequence[Tuple[str, str]] = (),
+    ) -> UpsertResult:
         self._ensure_service_role_when_needed()
 
         if not self.discovery.supports_upsert:
             raise RuntimeError("No suitable UNIQUE constraint discovered; aborting to avoid duplicate inserts.")
 
-        count_before = self._count_rows()
-        response = self._execute_with_retry(payloads)
-        count_after = self._count_rows()
+        with profile_stage("upsert"):
+            count_before = self._count_rows()
+            response = self._execute_with_retry(batch)
+            count_after = self._count_rows()
+        if self.hash_index is not None and pending:
+            self.hash_index.record(self.discovery.table_name, pending)
 
         inserted = getattr(response, "inserted", None)
         updated = getattr(response, "updated", None)
         if inserted is None:
             inserted = max(count_after - count_before, 0)
         if updated is None:
-            updated = max(len(payloads) - inserted, 0)
+            updated = max(rows - inserted, 0)
 
         self.logger.info(
             "Upsert complete: inserted=%d updated=%d table=%s on_conflict=%s",
@@ -533,7 +1007,7 @@ class SupabaseWriter:
             self.discovery.full_table_name,
             ",".join(self.discovery.on_conflict_columns),
         )
-        return UpsertResult(inserted=inserted, updated=updated)
+        return UpsertResult(inserted=inserted, updated=updated, candidates=candidates)
 
     def _count_rows(self) -> int:
         try:
@@ -545,21 +1019,67 @@ class SupabaseWriter:
             self.logger.warning("Unable to fetch row count: %s", exc)
             return 0
 
-    def _execute_with_retry(self, payloads: List[Dict[str, object]]):
+    def _session(self):
+        """The supabase client's PostgREST httpx session, or None for clients without one."""
+        return getattr(getattr(self.client, "postgrest", None), "session", None)
+
+    def _send_upsert(self, batch: "List[Dict[str, object]] | bytes"):
+        on_conflict = ",".join(self.discovery.on_conflict_columns)
+        session = self._session()
+        if session is None:
+            return self.client.table(self.discovery.table_name).upsert(batch, on_conflict=on_conflict).execute()
+        # Same request supabase-py builds for a bulk upsert, but with the body encoded
+        # by the installed codec and no representation sent back.
+        if isinstance(batch, bytes):
+            body, columns = batch, self.columns
+        else:
+            body, columns = json_codec().dumps(batch), list(dict.fromkeys(k for row in batch for k in row))
+        params = {"columns": ",".join(f'"{c}"' for c in columns)}
+        if on_conflict:
+            params["on_conflict"] = on_conflict
+        response = session.post(
+            self.discovery.table_name,
+            params=params,
+            headers={"Prefer": "return=minimal,resolution=merge-duplicates", "Content-Type": "application/json"},
+            content=body,
+        )
+        if response.status_code >= 400:
+            raise UpsertHTTPError(response.status_code, response.text)
+        return response
+
+    def update_rows(self, key_column: str, keys: Sequence[object], values: Dict[str, object]) -> int:
+        """PATCH `values` onto the rows whose key_column is in keys, UPDATE_CHUNK keys per request; returns rows updated."""
+        if not keys:
+            return 0
+        if self.dry_run:
+            self.logger.info("DRY-RUN: would update %d rows of %s with %s", len(keys), self.discovery.full_table_name, values)
+            return 0
+        self._ensure_service_role_when_needed()
+        updated = 0
+        for start in range(0, len(keys), self.UPDATE_CHUNK):
+            chunk = list(keys[start : start + self.UPDATE_CHUNK])
+            with profile_stage("update"):
+                response = self._with_retry(
+                    lambda: self.client.table(self.discovery.table_name)
+                    .update(values, count="exact", returning="minimal")
+                    .in_(key_column, chunk)
+                    .execute(),
+                    "update",
+                )
+            count = getattr(response, "count", None)
+            updated += int(count) if count is not None else len(chunk)
+        return updated
+
+    def _execute_with_retry(self, batch: "List[Dict[str, object]] | bytes"):
+        return self._with_retry(lambda: self._send_upsert(batch), "upsert")
+
+    def _with_retry(self, send: Callable[[], Any], what: str):
         attempt = 0
         delay = self.base_backoff
         while True:
             attempt += 1
             try:
-                return (
-                    self.client
-                    .table(self.discovery.table_name)
-                    .upsert(
-                        payloads,
-                        on_conflict=",".join(self.discovery.on_conflict_columns),
-                    )
-                    .execute()
-                )
+                return send()
             except Exception as exc:
                 status = getattr(exc, 'status_code', None)
                 if status is None:
@@ -575,7 +1095,7 @@ class SupabaseWriter:
                     time.sleep(delay)
                     delay = min(delay * 2, 30.0)
                     continue
-                self.logger.error("Supabase upsert failed after %d attempts: %s", attempt, exc)
+                self.logger.error("Supabase %s failed after %d attempts: %s", what, attempt, exc)
                 raise
 
     @staticmethod
@@ -588,10 +1108,10 @@ class SupabaseWriter:
 
 
 # ----------------------------- Helpers --------------------------------
-
 def normalize_show_title(title: str) -> str:
     """Attempt to isolate the show name from a typical query title."""
-    t = title
+    # The lazy bracket patterns below are quadratic on unbalanced input, so cap to Reddit's title limit.
+    t = title[:TITLE_MAX_CHARS]
     t = re.sub(r"\[.*?\]", "", t)
     t = re.sub(r"\(.*?\)", "", t)
     t = t.replace("?", " ")
@@ -601,72 +1121,383 @@ def normalize_show_title(title: str) -> str:
 
 
 def extract_moments(text: str) -> List[Tuple[Optional[int], Optional[int], Optional[int], float, str]]:
-    results: List[Tuple[Optional[int], Optional[int], Optional[int], float, str]] = []
-    lowered = text.lower()
-    has_hook_phrase = any(p in lowered for p in HOOK_PHRASES)
-
-    ses: List[Tuple[Optional[int], Optional[int]]] = []
-    for rx in RE_S_E:
-        for m in rx.finditer(text):
-            if 'Ep' in rx.pattern or 'ep' in rx.pattern:
-                ep = int(m.group(1))
-                ses.append((None, ep))
-            elif 'Season' in rx.pattern or 'season' in rx.pattern:
-                ses.append((int(m.group(1)), int(m.group(2))))
-            elif 'x' in rx.pattern:
-                ses.append((int(m.group(1)), int(m.group(2))))
-            else:
-                ses.append((int(m.group(1)), int(m.group(2))))
-
-    mins: List[int] = []
-    for rx in RE_MIN:
-        for m in rx.finditer(text):
-            try:
-                mins.append(int(m.group(1)))
-            except Exception:
-                continue
-
-    if not ses and not mins:
-        return []
+    return DEFAULT_RULESET.extract(text)
 
-    base_conf = 0.5 if has_hook_phrase else 0.3
-
-    def pick_minute() -> Optional[int]:
-        if not mins:
-            return None
-        return clamp_minute(int(sum(mins) / len(mins)))
 
-    for (s, e) in ses or [(None, None)]:
-        minute = pick_minute()
-        quote = snippet(text)
-        conf = min(0.95, base_conf + (0.1 if minute is not None else 0))
-        results.append((s, e, minute, conf, quote))
-    return results
+def comment_score_bonus(score: int) -> float:
+    """Confidence boost a comment earns from its upvotes (capped at 50 votes)."""
+    return min(max(int(score or 0), 0), 50) / 400.0
 
 
 def clamp_minute(m: int) -> int:
     return max(0, min(m, 180))
 
 
-def snippet(text: str, length: int = 240) -> str:
-    t = re.sub(r"\s+", " ", text).strip()
+WHITESPACE_RX = re.compile(r"\s+")
+SNIPPET_CHARS = 240
+
+
+def collapse_head(text: str, length: int = SNIPPET_CHARS) -> str:
+    """Whitespace-collapsed text, cut once it is longer than a snippet of `length` can show."""
+    # Collapsed a window at a time, so a run of whitespace before the content costs no more than reading it.
+    head, start, window = "", 0, length * 16
+    while start < len(text) and len(head.strip()) <= length:
+        head = WHITESPACE_RX.sub(" ", head + text[start : start + window])
+        start += window
+    return head.strip()
+
+
+def snippet(text: str, length: int = SNIPPET_CHARS, *, collapsed: Optional[str] = None) -> str:
+    t = collapse_head(text, length) if collapsed is None else collapsed
     return (t[: length - 1] + "?") if len(t) > length else t
 
 
+# ----------------------------- Rulesets --------------------------------
+RULESET_DIR = Path(__file__).with_name("rulesets")
+
+
+@dataclass(frozen=True)
+class ScanLimits:
+    """Bounds on regex work per document: text past max_chars is ignored, scanning stops at time_budget."""
+    max_chars: int = 40_000  # Reddit's selftext limit; comments stop at 10k
+    chunk_chars: int = 8_192
+    overlap: int = 256
+    time_budget: float = 0.05
+
+
+DEFAULT_SCAN_LIMITS = ScanLimits()
+
+Moment = Tuple[Optional[int], Optional[int], Optional[int], float, str]
+
+
+@dataclass(frozen=True)
+class ConfidenceWeights:
+    base: float = 0.3
+    hook: float = 0.5  # replaces base when a hook phrase is present
+    minute: float = 0.1
+    cap: float = 0.95
+
+
+@dataclass(frozen=True)
+class Ruleset:
+    """Search queries plus extraction rules; two-group season/episode patterns capture (season, episode)."""
+    name: str
+    search_queries: Tuple[str, ...]
+    hook_phrases: Tuple[str, ...]
+    season_episode_patterns: Tuple[re.Pattern, ...]
+    minute_patterns: Tuple[re.Pattern, ...]
+    weights: ConfidenceWeights = ConfidenceWeights()
+
+    def extract(self, text: "str | Document") -> List[Moment]:
+        scan = text if isinstance(text, Document) else Document(text)
+        ses: List[Tuple[Optional[int], Optional[int]]] = []
+        for rx in self.season_episode_patterns:
+            for groups in scan.findall(rx):
+                if len(groups) == 1:
+                    ses.append((None, int(groups[0])))
+                else:
+                    ses.append((int(groups[0]), int(groups[1])))
+        mins = [int(groups[0]) for rx in self.minute_patterns for groups in scan.findall(rx)]
+        if not ses and not mins:
+            return []
+
+        w = self.weights
+        base_conf = w.hook if scan.contains_any(self.hook_phrases) else w.base
+        minute = clamp_minute(int(sum(mins) / len(mins))) if mins else None
+        conf = min(w.cap, base_conf + (w.minute if minute is not None else 0))
+        return [(s, e, minute, conf, scan.quote) for (s, e) in ses or [(None, None)]]
+
+
+class Document:
+    """One text plus its lazily built views (lowered text, head, snippet, matches), shared by every stage."""
+
+    __slots__ = ("text", "end", "limits", "deadline", "capped", "timed_out", "_found", "_lowered", "_collapsed", "_quote", "_passes")
+
+    views: Dict[str, int] = {"lowered": 0, "collapsed": 0, "quote": 0, "scan": 0, "prefilter": 0}
+
+    def __init__(self, text: str, limits: ScanLimits = DEFAULT_SCAN_LIMITS) -> None:
+        self.text = text
+        self.limits = limits
+        self.end = min(len(text), limits.max_chars)
+        self.capped = len(text) > limits.max_chars
+        self.deadline: Optional[float] = None
+        self.timed_out = False
+        self._found: Dict[Tuple[str, int], List[Tuple[str, ...]]] = {}
+        self._lowered: Optional[str] = None
+        self._collapsed: Optional[str] = None
+        self._quote: Optional[str] = None
+        self._passes: Optional[Dict[Tuple[str, int], bool]] = None
+
+    @property
+    def lowered(self) -> str:
+        if self._lowered is None:
+            Document.views["lowered"] += 1
+            self._lowered = self.text[: self.end].lower()
+        return self._lowered
+
+    @property
+    def collapsed(self) -> str:
+        if self._collapsed is None:
+            Document.views["collapsed"] += 1
+            self._collapsed = collapse_head(self.text)
+        return self._collapsed
+
+    @property
+    def quote(self) -> str:
+        """The snippet stored with every moment found in this text."""
+        if self._quote is None:
+            Document.views["quote"] += 1
+            self._quote = snippet(self.text, collapsed=self.collapsed)
+        return self._quote
+
+    def passes(self, rx: re.Pattern) -> bool:
+        """Whether rx matches anywhere within the scan limit (a prefilter check), cached per pattern."""
+        key = (rx.pattern, rx.flags)
+        if self._passes is None:
+            self._passes = {}
+        passed = self._passes.get(key)
+        if passed is None:
+            Document.views["prefilter"] += 1
+            passed = self._passes[key] = bool(self.text) and rx.search(self.text, 0, self.end) is not None
+        return passed
+
+    def findall(self, rx: re.Pattern) -> List[Tuple[str, ...]]:
+        key = (rx.pattern, rx.flags)
+        found = self._found.get(key)
+        if found is None:
+            found = self._scan(rx)
+            self._found[key] = found
+        return found
+
+    def _scan(self, rx: re.Pattern) -> List[Tuple[str, ...]]:
+        Document.views["scan"] += 1
+        if self.deadline is None:
+            self.deadline = time.perf_counter() + self.limits.time_budget
+        if time.perf_counter() > self.deadline:
+            self.timed_out = True
+            return []
+        step = self.limits.chunk_chars
+        if self.end <= step:
+            return [m.groups() for m in rx.finditer(self.text, 0, self.end) if None not in m.groups()]
+        # finditer(text, pos, endpos) keeps \b and lookbehinds seeing the real
+        # preceding text; windows overlap so boundary-straddling matches finish.
+        found: List[Tuple[str, ...]] = []
+        last_end = 0
+        for start in range(0, self.end, step):
+            if start and time.perf_counter() > self.deadline:
+                self.timed_out = True
+                break
+            stop = min(start + step, self.end)
+            for m in rx.finditer(self.text, start, min(stop + self.limits.overlap, self.end)):
+                if m.start() >= stop:
+                    break
+                if m.start() < last_end:
+                    continue
+                last_end = m.end()
+                if None not in m.groups():
+                    found.append(m.groups())
+        return found
+
+    def contains_any(self, phrases: Sequence[str]) -> bool:
+        return any(p in self.lowered for p in phrases)
+
+
+DEFAULT_RULESET = Ruleset(
+    name="default",
+    search_queries=tuple(SEARCH_QUERIES),
+    hook_phrases=tuple(HOOK_PHRASES),
+    season_episode_patterns=tuple(RE_S_E),
+    minute_patterns=tuple(RE_MIN),
+)
+
+
+def _compile_patterns(entries: Sequence[Any], groups: Tuple[int, ...], field: str) -> Tuple[re.Pattern, ...]:
+    """Entries are pattern strings (case-insensitive) or {"pattern": ..., "ignore_case": false}."""
+    compiled: List[re.Pattern] = []
+    for entry in entries:
+        if isinstance(entry, str):
+            rx = re.compile(entry, re.I)
+        else:
+            rx = re.compile(str(entry["pattern"]), re.I if entry.get("ignore_case", True) else 0)
+        if rx.groups not in groups:
+            raise ValueError(f"{field} pattern {rx.pattern!r} must have {' or '.join(map(str, groups))} capture group(s)")
+        compiled.append(rx)
+    return tuple(compiled)
+
+
+def ruleset_from_config(config: Dict[str, Any], *, name: Optional[str] = None) -> Ruleset:
+    """Build a Ruleset from a config mapping; omitted keys fall back to the default ruleset."""
+    base = DEFAULT_RULESET
+    weights = dict(config.get("weights") or {})
+    unknown = set(weights) - set(ConfidenceWeights.__dataclass_fields__)
+    if unknown:
+        raise ValueError(f"Unknown confidence weights: {', '.join(sorted(unknown))}")
+    return Ruleset(
+        name=str(config.get("name") or name or base.name),
+        search_queries=tuple(config.get("search_queries") or base.search_queries),
+        hook_phrases=tuple(p.lower() for p in config.get("hook_phrases") or base.hook_phrases),
+        season_episode_patterns=(
+            _compile_patterns(config["season_episode_patterns"], (1, 2), "season_episode")
+            if config.get("season_episode_patterns")
+            else base.season_episode_patterns
+        ),
+        minute_patterns=(
+            _compile_patterns(config["minute_patterns"], (1,), "minute")
+            if config.get("minute_patterns")
+            else base.minute_patterns
+        ),
+        weights=ConfidenceWeights(**{**vars(base.weights), **{k: float(v) for k, v in weights.items()}}),
+    )
+
+
+def load_ruleset(spec: str) -> Ruleset:
+    """Resolve "default", a bundled ruleset name under scripts/rulesets/, or a path to a JSON ruleset file."""
+    if spec == DEFAULT_RULESET.name:
+        return DEFAULT_RULESET
+    path = Path(spec)
+    if not path.suffix:
+        path = RULESET_DIR / f"{spec}.json"
+    if not path.exists():
+        raise SystemExit(f"Ruleset not found: {spec} (looked for {path})")
+    with path.open("r", encoding="utf-8") as fh:
+        return ruleset_from_config(json.load(fh), name=path.stem)
+
+
+RuleCounts = Tuple[Dict[str, int], Dict[str, int], Dict[str, float], int, int]
+
+
+class RulesetEvaluator:
+    """Evaluates several rulesets over each text in a single pass, running each pattern at most once."""
+
+    def __init__(self, rulesets: Sequence[Ruleset], *, limits: ScanLimits = DEFAULT_SCAN_LIMITS) -> None:
+        names = [r.name for r in rulesets]
+        if not names:
+            raise ValueError("At least one ruleset is required")
+        if len(set(names)) != len(names):
+            raise ValueError(f"Duplicate ruleset names: {', '.join(names)}")
+        self.rulesets = list(rulesets)
+        patterns = {
+            (rx.pattern, rx.flags): rx
+            for r in self.rulesets
+            for rx in (*r.season_episode_patterns, *r.minute_patterns)
+        }
+        self._prefilter = re.compile("|".join(f"(?:{rx.pattern})" for rx in patterns.values()), re.I)
+        self.limits = limits
+        self.found: Dict[str, int] = {name: 0 for name in names}
+        self.exclusive: Dict[str, int] = {name: 0 for name in names}
+        self.confidence: Dict[str, float] = {name: 0.0 for name in names}
+        self.capped = 0
+        self.timed_out = 0
+
+    @property
+    def search_queries(self) -> List[str]:
+        return list(dict.fromkeys(q for r in self.rulesets for q in r.search_queries))
+
+    def for_query(self, query: Optional[str]) -> List[Ruleset]:
+        """The rulesets that would have surfaced text found by `query`; all of them when no query did."""
+        if query is None:
+            return self.rulesets
+        return [r for r in self.rulesets if query in r.search_queries] or self.rulesets
+
+    def document(self, text: str) -> Document:
+        """Wrap text once so the prefilter, extraction and snippet share its derived views."""
+        return Document(text, self.limits)
+
+    def passes_prefilter(self, text: "str | Document") -> bool:
+        """Cheap inline check: could any ruleset find something in this text?"""
+        return (text if isinstance(text, Document) else self.document(text)).passes(self._prefilter)
+
+    def extract(
+        self, text: "str | Document", *, query: Optional[str] = None
+    ) -> List[Tuple[Optional[int], Optional[int], Optional[int], float, str, str]]:
+        """Moments per applicable ruleset: (season, episode, minute, confidence, quote, ruleset name)."""
+        scan = text if isinstance(text, Document) else self.document(text)
+        results = []
+        finders: Dict[Tuple[Optional[int], Optional[int], Optional[int]], List[str]] = {}
+        for ruleset in self.for_query(query):
+            for (s, e, minute, conf, quote) in ruleset.extract(scan):
+                names = finders.setdefault((s, e, minute), [])
+                if ruleset.name in names:
+                    continue
+                names.append(ruleset.name)
+                self.found[ruleset.name] += 1
+                self.confidence[ruleset.name] += conf
+                results.append((s, e, minute, conf, quote, ruleset.name))
+        self.capped += scan.capped
+        self.timed_out += scan.timed_out
+        for names in finders.values():
+            if len(names) == 1:
+                self.exclusive[names[0]] += 1
+        return results
+
+    def counts(self) -> RuleCounts:
+        """The counters behind log_report, for shipping between processes."""
+        return dict(self.found), dict(self.exclusive), dict(self.confidence), self.capped, self.timed_out
+
+    def counts_since(self, before: RuleCounts) -> RuleCounts:
+        found, exclusive, confidence, capped, timed_out = before
+        return (
+            {name: n - found.get(name, 0) for name, n in self.found.items()},
+            {name: n - exclusive.get(name, 0) for name, n in self.exclusive.items()},
+            {name: c - confidence.get(name, 0.0) for name, c in self.confidence.items()},
+            self.capped - capped,
+            self.timed_out - timed_out,
+        )
+
+    def add_counts(self, counts: RuleCounts) -> None:
+        found, exclusive, confidence, capped, timed_out = counts
+        for name, n in found.items():
+            self.found[name] = self.found.get(name, 0) + n
+        for name, n in exclusive.items():
+            self.exclusive[name] = self.exclusive.get(name, 0) + n
+        for name, c in confidence.items():
+            self.confidence[name] = self.confidence.get(name, 0.0) + c
+        self.capped += capped
+        self.timed_out += timed_out
+
+    def log_report(self, log: logging.Logger) -> None:
+        log.info(
+            "[Rulesets] %s capped_docs=%d timed_out_docs=%d",
+            " ".join(
+                f"{name}: found={self.found[name]} exclusive={self.exclusive[name]} "
+                f"mean_confidence={self.confidence[name] / self.found[name] if self.found[name] else 0.0:.3f}"
+                for name in self.found
+            ),
+            self.capped,
+            self.timed_out,
+        )
+
+
+@functools.lru_cache(maxsize=None)
+def default_evaluator() -> RulesetEvaluator:
+    return RulesetEvaluator([DEFAULT_RULESET])
+
+
 # ----------------------------- Reddit client ---------------------------
 
-def make_reddit() -> praw.Reddit:
+def make_reddit() -> "praw.Reddit":
+    import praw
+
     cid = os.environ.get("REDDIT_CLIENT_ID")
     csec = os.environ.get("REDDIT_CLIENT_SECRET")
     ua = os.environ.get("REDDIT_USER_AGENT", "wigg-reddit-seeder/1.0 by u/_wigg_bot")
     if not (cid and csec):
         raise SystemExit("Missing Reddit API credentials.")
-    return praw.Reddit(client_id=cid, client_secret=csec, user_agent=ua)
+    # Overrides let load tests point PRAW at scripts/standins/reddit_api.py.
+    endpoints = {}
+    if os.environ.get("REDDIT_URL"):
+        endpoints["reddit_url"] = os.environ["REDDIT_URL"]
+    if os.environ.get("REDDIT_OAUTH_URL"):
+        endpoints["oauth_url"] = os.environ["REDDIT_OAUTH_URL"]
+    return praw.Reddit(client_id=cid, client_secret=csec, user_agent=ua, **endpoints)
 
 
 # ----------------------------- Supabase client -------------------------
 
-def make_supabase() -> Tuple[Client, SupabaseMetaFetcher, DiscoveryResult, SupabaseWriter]:
+def make_supabase() -> Tuple["Client", SupabaseMetaFetcher, DiscoveryResult, SupabaseWriter]:
+    from supabase import create_client
+
+    load_env_files()
     url = os.environ.get("SUPABASE_URL")
     key = os.environ.get("SUPABASE_SERVICE_KEY")
     if not url or not key:
@@ -694,30 +1525,806 @@ def make_supabase() -> Tuple[Client, SupabaseMetaFetcher, DiscoveryResult, Supab
     return supabase_client, meta_fetcher, discovery, writer
 
 
+# ----------------------------- Work planning ---------------------------
+@dataclass
+class CrawlStats:
+    processed: int = 0
+    inserted: int = 0
+    updated: int = 0
+    candidates: int = 0
+    requests: int = 0
+
+    def add(self, result: UpsertResult) -> None:
+        self.inserted += result.inserted
+        self.updated += result.updated
+        self.candidates += result.candidates
+
+    def merge(self, other: "CrawlStats") -> None:
+        self.processed += other.processed
+        self.inserted += other.inserted
+        self.updated += other.updated
+        self.candidates += other.candidates
+        self.requests += other.requests
+
+
+def plan_work_units(
+    subs: Sequence[str],
+    queries: Sequence[str],
+    *,
+    since_ts: int = 0,
+    until_ts: int = 0,
+) -> List[WorkUnit]:
+    """One unit per sub x query, covering [since_ts, until_ts); Reddit search cannot be windowed."""
+    return [WorkUnit(subreddit=sub, query=q, window_start=since_ts, window_end=until_ts) for sub in subs for q in queries]
+
+
+# Reddit's search time filters, narrowest first, with the span each is guaranteed to cover.
+SEARCH_TIME_FILTERS: Tuple[Tuple[str, int], ...] = (
+    ("hour", 3600),
+    ("day", 86400),
+    ("week", 7 * 86400),
+    ("month", 28 * 86400),
+    ("year", 365 * 86400),
+)
+
+
+def search_time_filter(window_start: int, now: Optional[float] = None) -> str:
+    """The narrowest search time_filter that still reaches back to window_start ("all" when unbounded)."""
+    if not window_start:
+        return "all"
+    age = (time.time() if now is None else now) - window_start
+    return next((name for name, span in SEARCH_TIME_FILTERS if age <= span), "all")
+
+
+# ----------------------------- Yield scheduling ------------------------
+class RequestBudget:
+    """Caps a run by estimated Reddit API requests and/or wall-clock seconds (0 = unlimited)."""
+
+    def __init__(self, max_requests: int = 0, max_runtime: float = 0.0, *, clock=time.monotonic) -> None:
+        self.max_requests = max_requests
+        self.max_runtime = max_runtime
+        self.clock = clock
+        self.started = clock()
+        self.used = 0
+
+    def charge(self, requests: int = 1) -> None:
+        self.used += requests
+
+    @property
+    def remaining_requests(self) -> Optional[int]:
+        if not self.max_requests:
+            return None
+        return max(self.max_requests - self.used, 0)
+
+    @property
+    def exhausted(self) -> bool:
+        if self.max_requests and self.used >= self.max_requests:
+            return True
+        return bool(self.max_runtime) and self.clock() - self.started >= self.max_runtime
+
+
+class YieldScheduler:
+    """Orders work units so the request budget goes to the highest-yield pairs first."""
+
+    def __init__(self, store: YieldStore, *, explore: float = 0.1, rng=None) -> None:
+        import random
+
+        self.store = store
+        self.explore = explore
+        self.rng = rng or random.Random()
+
+    def order(self, units: Sequence[WorkUnit]) -> List[WorkUnit]:
+        history = self.store.get_all()
+
+        def score(unit: WorkUnit) -> float:
+            pair = history.get((unit.subreddit, unit.query))
+            if pair is None or not pair.requests:
+                return float("inf")
+            return pair.score
+
+        remaining = sorted(units, key=score, reverse=True)
+        ordered: List[WorkUnit] = []
+        while remaining:
+            index = 0
+            if len(remaining) > 1 and score(remaining[0]) != float("inf") and self.rng.random() < self.explore:
+                index = self.rng.randrange(1, len(remaining))
+            ordered.append(remaining.pop(index))
+        return ordered
+
+
+# ----------------------------- Triage ---------------------------------
+TITLE_SIGNALS: List[Tuple[re.Pattern, float]] = [
+    (re.compile(r"\bget(?:s|ting)?\s+good\b", re.I), 1.0),
+    (re.compile(r"\bpicks?\s+up\b", re.I), 0.6),
+    (re.compile(r"\bworth\s+(?:it|watching|continuing|sticking)\b", re.I), 0.5),
+    (re.compile(r"\bwhen\s+(?:does|did|will)\b", re.I), 0.4),
+    (re.compile(r"\bhook(?:ed|s)?\b", re.I), 0.4),
+    (re.compile(r"\b(?:episode|season|ep)\b", re.I), 0.3),
+]
+
+
+@dataclass(frozen=True)
+class TriagePolicy:
+    min_comments: int = 3
+    min_score: int = 0
+    min_title_strength: float = 0.3
+    min_age_hours: float = 0.0
+    max_comment_budget: int = 200
+    weak_title_budget: int = 50
+
+
+@dataclass(frozen=True)
+class TriageDecision:
+    fetch_comments: bool
+    comment_budget: int
+    reason: str
+    title_strength: float = 0.0
+
+
+def title_match_strength(title: str) -> float:
+    """0..1 estimate of how squarely a title asks "when does it get good"."""
+    title = title[:TITLE_MAX_CHARS]
+    lowered = title.lower()
+    strength = sum(weight for rx, weight in TITLE_SIGNALS if rx.search(title))
+    if any(p in lowered for p in HOOK_PHRASES):
+        strength += 0.6
+    return min(strength, 1.0)
+
+
+def triage_submission(subm, policy: TriagePolicy = TriagePolicy(), *, now: Optional[float] = None) -> TriageDecision:
+    """Decide from search-listing fields alone whether a submission's comments are worth fetching."""
+    title = getattr(subm, 'title', '') or ''
+    strength = title_match_strength(title)
+    if not normalize_show_title(title):
+        return TriageDecision(False, 0, "empty_title", strength)
+    num_comments = getattr(subm, 'num_comments', None)
+    if num_comments is not None and int(num_comments) < policy.min_comments:
+        return TriageDecision(False, 0, "few_comments", strength)
+    if int(getattr(subm, 'score', 0) or 0) < policy.min_score:
+        return TriageDecision(False, 0, "low_score", strength)
+    if strength < policy.min_title_strength:
+        return TriageDecision(False, 0, "off_topic", strength)
+    if policy.min_age_hours:
+        age_hours = ((now or time.time()) - float(getattr(subm, 'created_utc', 0) or 0)) / 3600.0
+        if age_hours < policy.min_age_hours:
+            return TriageDecision(False, 0, "too_new", strength)
+    budget = policy.max_comment_budget if strength >= 0.6 else min(policy.weak_title_budget, policy.max_comment_budget)
+    if num_comments is not None:
+        budget = min(budget, int(num_comments))
+    return TriageDecision(True, budget, "strong_title" if strength >= 0.6 else "weak_title", strength)
+
+
+class SubmissionTriage:
+    """Applies a TriagePolicy and keeps counts for the end-of-run report."""
+
+    def __init__(self, policy: TriagePolicy = TriagePolicy()) -> None:
+        self.policy = policy
+        self.reasons: Dict[str, int] = {}
+        self.evaluated = 0
+        self.fetched = 0
+        self.budget_total = 0
+
+    def decide(self, subm) -> TriageDecision:
+        decision = triage_submission(subm, self.policy)
+        self.evaluated += 1
+        self.reasons[decision.reason] = self.reasons.get(decision.reason, 0) + 1
+        if decision.fetch_comments:
+            self.fetched += 1
+            self.budget_total += decision.comment_budget
+        return decision
+
+    @property
+    def skip_rate(self) -> float:
+        return (self.evaluated - self.fetched) / self.evaluated if self.evaluated else 0.0
+
+    def log_report(self, log: logging.Logger) -> None:
+        log.info(
+            "[Triage] evaluated=%d fetched=%d skipped=%d skip_rate=%.1f%% avg_comment_budget=%.0f reasons=%s",
+            self.evaluated,
+            self.fetched,
+            self.evaluated - self.fetched,
+            self.skip_rate * 100,
+            self.budget_total / self.fetched if self.fetched else 0.0,
+            ",".join(f"{k}={v}" for k, v in sorted(self.reasons.items())) or "<none>",
+        )
+
+
+# ----------------------------- Score refresh ---------------------------
+REDDIT_INFO_BATCH = 100  # /api/info accepts at most 100 fullnames per call.
+KIND_PREFIX = {"comment": "t1_", "submission": "t3_"}
+
+
+def refreshed_confidence(confidence: float, old_score: int, new_score: int, kind: str) -> float:
+    """Swap the crawl-time upvote bonus for one based on the current score."""
+    if kind != "comment":
+        return confidence
+    base = float(confidence) - comment_score_bonus(old_score)
+    return round(min(0.95, max(base, 0.0) + comment_score_bonus(new_score)), 3)
+
+
+@dataclass
+class RefreshStats:
+    scanned: int = 0
+    fetched: int = 0
+    missing: int = 0
+    changed: int = 0
+    info_calls: int = 0
+    pages: int = 0
+
+
+class ScoreRefresher:
+    """Re-reads live Reddit scores for already-seeded rows and patches only the rows that changed, by primary key."""
+
+    def __init__(
+        self,
+        reddit,
+        writer: SupabaseWriter,
+        *,
+        page_size: int = 1000,
+        logger: Optional[logging.Logger] = None,
+    ) -> None:
+        self.reddit = reddit
+        self.writer = writer
+        self.page_size = page_size
+        self.logger = logger or logging.getLogger("wigg.reddit_seed.refresh")
+        discovery = writer.discovery
+        mapping = discovery.column_mapping
+        self.source_id_col = mapping.get("source_id")
+        self.kind_col = mapping.get("source_kind")
+        self.score_col = mapping.get("score")
+        self.confidence_col = mapping.get("confidence")
+        if not (self.source_id_col and self.score_col and self.confidence_col):
+            raise RuntimeError("Refresh needs source_id, score and confidence columns in the target table.")
+        pk = discovery.primary_key_columns
+        if len(pk) != 1:
+            raise RuntimeError("Refresh pages by primary key and needs a single-column primary key.")
+        self.key_col = pk[0]
+        wanted = [self.key_col, self.source_id_col, self.kind_col, self.score_col, self.confidence_col]
+        self.select = ",".join(dict.fromkeys(c for c in wanted if c))
+
+    def run(self) -> RefreshStats:
+        stats = RefreshStats()
+        for rows in iter_keyset_pages(
+            self.writer.client,
+            self.writer.discovery.table_name,
+            key_column=self.key_col,
+            select=self.select,
+            page_size=self.page_size,
+        ):
+            stats.pages += 1
+            self.write(self.refresh_rows(rows, stats))
+        self.logger.info(
+            "[Refresh] scanned=%d fetched=%d missing=%d changed=%d info_calls=%d pages=%d",
+            stats.scanned,
+            stats.fetched,
+            stats.missing,
+            stats.changed,
+            stats.info_calls,
+            stats.pages,
+        )
+        return stats
+
+    def write(self, changed: Sequence[Dict[str, object]]) -> int:
+        """PATCH new scores onto changed rows by primary key, one request per distinct (score, confidence)."""
+        keys: Dict[Tuple[object, object], List[object]] = {}
+        for row in changed:
+            keys.setdefault((row[self.score_col], row[self.confidence_col]), []).append(row[self.key_col])
+        return sum(
+            self.writer.update_rows(self.key_col, ids, {self.score_col: score, self.confidence_col: confidence})
+            for (score, confidence), ids in keys.items()
+        )
+
+    def refresh_rows(self, rows: Sequence[Dict[str, object]], stats: RefreshStats) -> List[Dict[str, object]]:
+        by_fullname: Dict[str, List[Dict[str, object]]] = {}
+        for row in rows:
+            stats.scanned += 1
+            kind = str(row.get(self.kind_col) or "comment") if self.kind_col else "comment"
+            fullname = KIND_PREFIX.get(kind, "t1_") + str(row[self.source_id_col])
+            by_fullname.setdefault(fullname, []).append(row)
+
+        changed: List[Dict[str, object]] = []
+        names = list(by_fullname)
+        for start in range(0, len(names), REDDIT_INFO_BATCH):
+            batch = names[start : start + REDDIT_INFO_BATCH]
+            stats.info_calls += 1
+            seen = 0
+            for thing in self.reddit.info(fullnames=batch):
+                group = by_fullname.get(str(getattr(thing, "fullname", "")))
+                if group is None:
+                    continue
+                seen += 1
+                new_score = int(getattr(thing, "score", 0) or 0)
+                for row in group:
+                    old_score = int(row.get(self.score_col) or 0)
+                    old_conf = float(row.get(self.confidence_col) or 0.0)
+                    kind = str(row.get(self.kind_col) or "comment") if self.kind_col else "comment"
+                    new_conf = refreshed_confidence(old_conf, old_score, new_score, kind)
+                    if new_score == old_score and new_conf == old_conf:
+                        continue
+                    updated = dict(row)
+                    updated[self.score_col] = new_score
+                    updated[self.confidence_col] = new_conf
+                    changed.append(updated)
+            stats.fetched += seen
+            stats.missing += len(batch) - seen
+        stats.changed += len(changed)
+        return changed
+
+
+# ----------------------------- Moderation -----------------------------
+MODERATION_STATUSES = ("needs_review", "approved", "rejected")
+MODERATION_JOB_PREFIX = "moderate:"
+
+
+@dataclass(frozen=True)
+class ModerationRule:
+    """Rows to move from one status to another; every field that is set must match."""
+
+    to_status: str
+    from_status: str = "needs_review"
+    min_confidence: Optional[float] = None
+    max_confidence: Optional[float] = None
+    titles: Tuple[str, ...] = ()
+    subreddits: Tuple[str, ...] = ()
+    older_than_days: Optional[float] = None
+    newer_than_days: Optional[float] = None
+
+    def fingerprint(self) -> str:
+        return hashlib.blake2b(json.dumps(asdict(self), sort_keys=True).encode("utf-8"), digest_size=8).hexdigest()
+
+
+@dataclass
+class ModerationStats:
+    matched: int = 0
+    updated: int = 0
+    pages: int = 0
+    resumed_after: Optional[object] = None
+
+
+class BulkModerator:
+    """Moves every row matching a ModerationRule to its target status, a keyset page at a time, resumably."""
+
+    def __init__(
+        self,
+        writer: SupabaseWriter,
+        rule: ModerationRule,
+        *,
+        checkpoints: Optional[CheckpointStore] = None,
+        page_size: int = 1000,
+        logger: Optional[logging.Logger] = None,
+        now: Optional[float] = None,
+    ) -> None:
+        self.writer = writer
+        self.rule = rule
+        self.checkpoints = checkpoints
+        self.page_size = page_size
+        self.logger = logger or logging.getLogger("wigg.reddit_seed.moderate")
+        discovery = writer.discovery
+        mapping = discovery.column_mapping
+        self.status_col = mapping.get("status")
+        if not self.status_col:
+            raise RuntimeError("Moderation needs a status column in the target table.")
+        pk = discovery.primary_key_columns
+        if len(pk) != 1:
+            raise RuntimeError("Moderation pages by primary key and needs a single-column primary key.")
+        self.key_col = pk[0]
+        self.filters: List[Tuple[str, str, object]] = [(self.status_col, "eq", rule.from_status)]
+        now = time.time() if now is None else now
+        conditions = [
+            ("confidence", "gte", rule.min_confidence),
+            ("confidence", "lte", rule.max_confidence),
+            ("created_utc", "lt", int(now - rule.older_than_days * 86400) if rule.older_than_days else None),
+            ("created_utc", "gte", int(now - rule.newer_than_days * 86400) if rule.newer_than_days else None),
+            ("content_title", "in", list(rule.titles) or None),
+            ("source_subreddit", "in", list(rule.subreddits) or None),
+        ]
+        for canonical, op, value in conditions:
+            if value is None:
+                continue
+            column = mapping.get(canonical)
+            if not column:
+                raise RuntimeError(f"The rule filters on {canonical}, which the target table does not have.")
+            self.filters.append((column, op, value))
+        self.job = f"{MODERATION_JOB_PREFIX}{discovery.table_name}:{rule.fingerprint()}"
+
+    def run(self) -> ModerationStats:
+        stats = ModerationStats()
+        stats.resumed_after = self.checkpoints.last_key(self.job) if self.checkpoints is not None else None
+        if stats.resumed_after is not None:
+            self.logger.info("[Moderate] resuming %s after %s=%s", self.job, self.key_col, stats.resumed_after)
+        started = time.monotonic()
+        for rows in iter_keyset_pages(
+            self.writer.client,
+            self.writer.discovery.table_name,
+            key_column=self.key_col,
+            select=self.key_col,
+            page_size=self.page_size,
+            after=stats.resumed_after,
+            filters=self.filters,
+        ):
+            keys = [row[self.key_col] for row in rows]
+            stats.pages += 1
+            stats.matched += len(keys)
+            stats.updated += self.writer.update_rows(self.key_col, keys, {self.status_col: self.rule.to_status})
+            if self.checkpoints is not None and not self.writer.dry_run:
+                self.checkpoints.save_last_key(self.job, keys[-1])
+            elapsed = time.monotonic() - started
+            self.logger.info(
+                "[Moderate] page=%d matched=%d updated=%d last_%s=%s rows/s=%.0f",
+                stats.pages,
+                stats.matched,
+                stats.updated,
+                self.key_col,
+                keys[-1],
+                stats.matched / elapsed if elapsed else 0.0,
+            )
+        if self.checkpoints is not None and not self.writer.dry_run:
+            self.checkpoints.clear_last_key(self.job)
+        self.logger.info(
+            "[Moderate] %s -> %s: matched=%d updated=%d pages=%d dry_run=%s",
+            self.rule.from_status,
+            self.rule.to_status,
+            stats.matched,
+            stats.updated,
+            stats.pages,
+            self.writer.dry_run,
+        )
+        return stats
+
+
+def moderation_rule_from_args(args: argparse.Namespace, titles: Optional["TitleAliasStore"] = None) -> ModerationRule:
+    """Build the --mode moderate rule; --title expands to its whole cluster when an alias map is loaded."""
+    if not args.set_status:
+        raise SystemExit("--mode moderate needs --set-status")
+    cluster: List[str] = []
+    for title in args.title or []:
+        canonical = titles.lookup(title) if titles is not None else title
+        cluster.extend(titles.members(canonical) if titles is not None else [canonical])
+    return ModerationRule(
+        to_status=args.set_status,
+        from_status=args.from_status,
+        min_confidence=args.min_confidence,
+        max_confidence=args.max_confidence,
+        titles=tuple(dict.fromkeys(cluster)),
+        subreddits=tuple(sub.replace("r/", "") for sub in args.moderate_subs or []),
+        older_than_days=args.older_than_days,
+        newer_than_days=args.newer_than_days,
+    )
+
+
+# ----------------------------- Dry-run export & diff -------------------
+PARQUET_TYPES = {
+    "smallint": "int64",
+    "integer": "int64",
+    "bigint": "int64",
+    "real": "float64",
+    "double precision": "float64",
+    "numeric": "float64",
+    "boolean": "bool_",
+}
+
+
+class PayloadExport:
+    """Streams every would-be payload of a dry run to NDJSON, or to Parquet for a `.parquet` path."""
+
+    PARQUET_ROW_GROUP = 50_000
+
+    def __init__(self, path: str, discovery: DiscoveryResult) -> None:
+        self.path = path
+        self.rows = 0
+        self.parquet = path.endswith(".parquet")
+        self._fh = None
+        self._writer = None
+        self._buffer: List[Dict[str, object]] = []
+        if self.parquet:
+            try:
+                import pyarrow as pa
+                import pyarrow.parquet as pq
+            except ImportError:
+                raise SystemExit("Parquet export needs pyarrow (pip install pyarrow); use a .ndjson path instead")
+            self._pa = pa
+            columns = list(dict.fromkeys(c for c in discovery.column_mapping.values() if c))
+            self._schema = pa.schema(
+                [
+                    (c, getattr(pa, PARQUET_TYPES.get(getattr(discovery.columns.get(c), "data_type", ""), "string"))())
+                    for c in columns
+                ]
+            )
+            self._writer = pq.ParquetWriter(path, self._schema)
+        else:
+            self._fh = open(path, "wb")
+
+    def write(self, payloads: Sequence[Dict[str, object]]) -> None:
+        if self._fh is not None:
+            codec = json_codec()
+            self._fh.write(b"".join(codec.dumps(p) + b"\n" for p in payloads))
+        else:
+            self._buffer.extend(payloads)
+            if len(self._buffer) >= self.PARQUET_ROW_GROUP:
+                self._flush()
+        self.rows += len(payloads)
+
+    def _flush(self) -> None:
+        if self._buffer:
+            self._writer.write_table(self._pa.Table.from_pylist(self._buffer, schema=self._schema))
+            self._buffer = []
+
+    def close(self) -> None:
+        if self._fh is not None:
+            self._fh.close()
+        else:
+            self._flush()
+            self._writer.close()
+
+
+@dataclass
+class DiffSample:
+    key: str
+    changes: Dict[str, Tuple[object, object]]  # column -> (stored, would-be)
+
+
+class TableDiff:
+    """Classifies would-be payloads as new, changed or unchanged against the live table."""
+
+    IN_CHUNK = 200  # values per in.(...) filter, keeping request URLs short
+
+    def __init__(
+        self,
+        client: "Client",
+        discovery: DiscoveryResult,
+        *,
+        page_size: int = 1000,
+        max_samples: int = 5,
+    ) -> None:
+        if not discovery.on_conflict_columns:
+            raise RuntimeError("--diff needs a discovered UNIQUE constraint to match payloads to stored rows.")
+        if len(discovery.primary_key_columns) != 1:
+            raise RuntimeError("--diff pages by primary key and needs a single-column primary key.")
+        self.client = client
+        self.discovery = discovery
+        self.page_size = page_size
+        self.max_samples = max_samples
+        self.new = 0
+        self.changed = 0
+        self.unchanged = 0
+        self.pages = 0
+        self.changed_columns: Dict[str, int] = {}
+        self.samples: List[DiffSample] = []
+        self._pending: Dict[str, Dict[str, object]] = {}
+
+    def add(self, payloads: Sequence[Dict[str, object]]) -> None:
+        conflict = self.discovery.on_conflict_columns
+        for payload in payloads:
+            normalized = normalize_row(payload, self.discovery)
+            self._pending[PayloadHashIndex.conflict_key(normalized, conflict)] = normalized
+
+    def finish(self) -> None:
+        """Compare every payload collected since the last call with the stored rows."""
+        if not self._pending:
+            return
+        conflict = self.discovery.on_conflict_columns
+        pending, self._pending = self._pending, {}
+        stored = self._fetch(list(dict.fromkeys(p[conflict[0]] for p in pending.values() if p.get(conflict[0]) is not None)))
+        for key, payload in pending.items():
+            row = stored.get(key)
+            if row is None:
+                self.new += 1
+                continue
+            changes = {c: (row.get(c), v) for c, v in payload.items() if row.get(c) != v}
+            if not changes:
+                self.unchanged += 1
+                continue
+            self.changed += 1
+            for column in changes:
+                self.changed_columns[column] = self.changed_columns.get(column, 0) + 1
+            if len(self.samples) < self.max_samples:
+                self.samples.append(DiffSample(key, changes))
+
+    def _fetch(self, lead_values: List[object]) -> Dict[str, Dict[str, object]]:
+        conflict = self.discovery.on_conflict_columns
+        pk = self.discovery.primary_key_columns[0]
+        columns = list(dict.fromkeys([pk, *conflict, *(c for c in self.discovery.column_mapping.values() if c)]))
+        stored: Dict[str, Dict[str, object]] = {}
+        for start in range(0, len(lead_values), self.IN_CHUNK):
+            chunk = lead_values[start : start + self.IN_CHUNK]
+            for rows in iter_keyset_pages(
+                self.client,
+                self.discovery.table_name,
+                key_column=pk,
+                select=",".join(columns),
+                page_size=self.page_size,
+                where_in=(conflict[0], chunk),
+            ):
+                self.pages += 1
+                for row in rows:
+                    normalized = normalize_row(row, self.discovery)
+                    stored[PayloadHashIndex.conflict_key(normalized, conflict)] = normalized
+        return stored
+
+    def log_report(self, log: logging.Logger) -> None:
+        self.finish()
+        log.info(
+            "[Diff] new=%d changed=%d unchanged=%d pages_read=%d changed_columns=%s",
+            self.new,
+            self.changed,
+            self.unchanged,
+            self.pages,
+            ",".join(f"{c}:{n}" for c, n in sorted(self.changed_columns.items(), key=lambda kv: -kv[1])) or "-",
+        )
+        for sample in self.samples:
+            log.info(
+                "[Diff] %s %s",
+                sample.key,
+                " ".join(f"{c}: {old!r} -> {new!r}" for c, (old, new) in sample.changes.items()),
+            )
+
+
+# ----------------------------- Candidate retention ---------------------
+@dataclass
+class RetentionStats:
+    offered: int = 0
+    kept: int = 0
+    evicted: int = 0
+    duplicates: int = 0
+
+
+class TopKRetainer:
+    """Keeps the K best candidates per (title, season, episode), ranked by confidence, then score, then arrival."""
+
+    def __init__(self, k: int, stats: Optional[RetentionStats] = None, *, key_fields: Sequence[str] = CANDIDATE_KEY_FIELDS) -> None:
+        if k < 1:
+            raise ValueError("top-K retention needs k >= 1")
+        self.k = k
+        self.stats = stats or RetentionStats()
+        self.key_fields = tuple(key_fields)
+        self.offered = 0
+        self._seq = 0
+        self._heaps: Dict[Tuple[str, Optional[int], Optional[int]], List[Tuple[float, int, int, CandidateMoment]]] = {}
+
+    def offer(self, candidate: CandidateMoment) -> None:
+        self.offered += 1
+        self.stats.offered += 1
+        self._seq += 1
+        # Earlier arrivals win ties, so the newest of equal candidates sits at the heap top.
+        entry = (candidate.confidence, candidate.score, -self._seq, candidate)
+        heap = self._heaps.setdefault((candidate.content_title, candidate.season, candidate.episode), [])
+        key = [getattr(candidate, name) for name in self.key_fields]
+        for i, kept in enumerate(heap):
+            if [getattr(kept[3], name) for name in self.key_fields] == key:
+                self.stats.duplicates += 1
+                if entry[:3] > kept[:3]:
+                    heap[i] = entry
+                    heapq.heapify(heap)
+                return
+        if len(heap) < self.k:
+            heapq.heappush(heap, entry)
+            return
+        self.stats.evicted += 1
+        if entry[:3] > heap[0][:3]:
+            heapq.heapreplace(heap, entry)
+
+    def drain(self) -> List[CandidateMoment]:
+        """Every kept candidate, best first within each key, and reset."""
+        kept = [entry[3] for heap in self._heaps.values() for entry in sorted(heap, key=lambda e: e[:3], reverse=True)]
+        self._heaps = {}
+        self.stats.kept += len(kept)
+        return kept
+
+
 # ----------------------------- Core crawl ------------------------------
-@retry(stop=stop_after_attempt(3), wait=wait_exponential_jitter(1, 5))
-def index_submission(subm, writer: SupabaseWriter) -> UpsertResult:
+@functools.lru_cache(maxsize=None)
+def _retrying_index_submission():
+    from tenacity import retry, stop_after_attempt, wait_exponential_jitter
+
+    return retry(stop=stop_after_attempt(3), wait=wait_exponential_jitter(1, 5))(_index_submission)
+
+
+def index_submission(
+    subm,
+    writer: SupabaseWriter,
+    decision: Optional[TriageDecision] = None,
+    rules: Optional[RulesetEvaluator] = None,
+    watermarks: Optional[CheckpointStore] = None,
+    query: Optional[str] = None,
+) -> UpsertResult:
+    return _retrying_index_submission()(subm, writer, decision, rules, watermarks, query)
+
+
+THREAD_STREAM_PREFIX = "thread:"
+INCREMENTAL_COMMENT_LIMIT = 500  # one newest-first page of /comments/{id}
+
+
+def _index_submission(
+    subm,
+    writer: SupabaseWriter,
+    decision: Optional[TriageDecision] = None,
+    rules: Optional[RulesetEvaluator] = None,
+    watermarks: Optional[CheckpointStore] = None,
+    query: Optional[str] = None,
+) -> UpsertResult:
+    """Index a submission and its comments, or only the new comments of a thread already indexed."""
+    rules = rules or default_evaluator()
+    stream = f"{THREAD_STREAM_PREFIX}{subm.id}"
+    watermark = watermarks.get(stream) if watermarks is not None else None
+    if watermark is not None:
+        # Set before anything touches a lazy submission, so its one fetch already sorts by new.
+        subm.comment_sort = "new"
+        subm.comment_limit = INCREMENTAL_COMMENT_LIMIT
     title = subm.title or ""
     selftext = subm.selftext or ""
     content_title = normalize_show_title(title)
+    if decision is not None and decision.reason == "empty_title":
+        return UpsertResult(inserted=0, updated=0)
 
-    inserted = 0
-    updated = 0
-
-    for (s, e, minute, conf, quote) in extract_moments(f"{title}\n{selftext}"):
-        result = insert_moment(writer, content_title, s, e, minute, conf, subm, quote)
-        inserted += result.inserted
-        updated += result.updated
-
-    subm.comments.replace_more(limit=0)
-    for c in subm.comments.list()[:200]:
-        for (s, e, minute, conf, quote) in extract_moments(getattr(c, 'body', '') or ''):
-            conf2 = min(0.95, conf + min(max(getattr(c, 'score', 0), 0), 50) / 400.0)
-            result = insert_moment(writer, content_title, s, e, minute, conf2, c, quote)
-            inserted += result.inserted
-            updated += result.updated
+    totals = CrawlStats()
+    retainer = (
+        TopKRetainer(writer.top_k, writer.retention, key_fields=writer.discovery.conflict_fields) if getattr(writer, "top_k", 0) else None
+    )
 
-    return UpsertResult(inserted=inserted, updated=updated)
+    def emit(candidate: CandidateMoment) -> None:
+        if retainer is not None:
+            retainer.offer(candidate)
+        else:
+            totals.add(writer.upsert_candidates([candidate]))
+
+    def finish() -> UpsertResult:
+        if retainer is not None and retainer.offered:
+            # candidates counts what extraction found, not what survived retention.
+            result = writer.upsert_candidates(retainer.drain())
+            totals.add(UpsertResult(inserted=result.inserted, updated=result.updated, candidates=retainer.offered))
+        return UpsertResult(inserted=totals.inserted, updated=totals.updated, candidates=totals.candidates)
+
+    if watermark is None:
+        with profile_stage("extract_moments"):
+            moments = rules.extract(f"{title}\n{selftext}", query=query)
+        for (s, e, minute, conf, quote, ruleset) in moments:
+            emit(build_candidate(content_title, s, e, minute, conf, subm, quote, ruleset))
+
+    if decision is not None and not decision.fetch_comments:
+        return finish()
+
+    comment_budget = decision.comment_budget if decision is not None else 200
+    with profile_stage("comment_expansion"):
+        unexpanded = subm.comments.replace_more(limit=0)
+        listed = subm.comments.list()
+        if watermark is None:
+            comments = listed[:comment_budget]
+        else:
+            comments = [c for c in listed if not watermark.covers(float(getattr(c, 'created_utc', 0) or 0), str(c.id))]
+    for c in comments:
+        with profile_stage("extract_moments"):
+            moments = rules.extract(getattr(c, 'body', '') or '', query=query)
+        for (s, e, minute, conf, quote, ruleset) in moments:
+            conf2 = min(0.95, conf + comment_score_bonus(getattr(c, 'score', 0)))
+            emit(build_candidate(content_title, s, e, minute, conf2, c, quote, ruleset))
+
+    result = finish()
+    if watermarks is not None and not writer.dry_run:
+        advanced = watermark or StreamCheckpoint(float(getattr(subm, 'created_utc', 0) or 0))
+        for c in comments:
+            advanced = advanced.advanced(float(getattr(c, 'created_utc', 0) or 0), str(c.id))
+        hold = _stub_hold(unexpanded or (), comments)
+        if hold is not None and hold.created_utc <= advanced.created_utc:
+            logger.info("Thread %s: watermark held at %s, parent of an unexpanded stub", subm.id, hold.seen_ids[0])
+            advanced = hold
+        if advanced != watermark:
+            watermarks.save(stream, advanced)
+    return result
+
+
+def _stub_hold(unexpanded, comments) -> Optional[StreamCheckpoint]:
+    """The watermark that keeps replies hidden behind "more" stubs unread, or None."""
+    fetched = {str(c.id): c for c in comments}
+    hold: Optional[StreamCheckpoint] = None
+    for stub in unexpanded:
+        parent_id = str(getattr(stub, 'parent_id', '') or '')
+        parent = fetched.get(parent_id[3:]) if parent_id.startswith("t1_") else None
+        if parent is None:
+            continue
+        created = float(getattr(parent, 'created_utc', 0) or 0)
+        if hold is None or created < hold.created_utc:
+            hold = StreamCheckpoint(created, (str(parent.id),))
+    return hold
 
 
 def insert_moment(
@@ -729,8 +2336,24 @@ def insert_moment(
     confidence: float,
     src,
     quote: str,
+    ruleset: Optional[str] = None,
 ) -> UpsertResult:
-    candidate = CandidateMoment(
+    candidate = build_candidate(content_title, season, episode, minute, confidence, src, quote, ruleset)
+    return writer.upsert_candidates([candidate])
+
+
+def build_candidate(
+    content_title: str,
+    season: Optional[int],
+    episode: Optional[int],
+    minute: Optional[int],
+    confidence: float,
+    src,
+    quote: str,
+    ruleset: Optional[str] = None,
+    kind: Optional[str] = None,
+) -> CandidateMoment:
+    return CandidateMoment(
         content_title=content_title,
         season=season,
         episode=episode,
@@ -738,20 +2361,182 @@ def insert_moment(
         source_url=f"https://www.reddit.com{getattr(src, 'permalink', '')}",
         source_type="reddit",
         source_subreddit=str(getattr(src, 'subreddit', '')),
-        source_kind=src.__class__.__name__.lower(),
+        source_kind=kind or src.__class__.__name__.lower(),
         source_id=str(getattr(src, 'id', '')),
         score=int(getattr(src, 'score', 0)),
         confidence=round(confidence, 3),
         quote=quote,
         created_utc=int(getattr(src, 'created_utc', time.time())),
         status="needs_review",
+        ruleset=ruleset,
     )
-    return writer.upsert_candidates([candidate])
+
+
+class LeaseLostError(RuntimeError):
+    pass
+
+
+def crawl_unit(
+    reddit,
+    writer: SupabaseWriter,
+    unit: WorkUnit,
+    limit: int,
+    *,
+    heartbeat: Optional[Callable[[], bool]] = None,
+    budget: Optional[RequestBudget] = None,
+    triage: Optional[SubmissionTriage] = None,
+    rules: Optional[RulesetEvaluator] = None,
+    watermarks: Optional[CheckpointStore] = None,
+) -> CrawlStats:
+    """Search one subreddit for one query and index every submission inside the unit's window."""
+    stats = CrawlStats()
+    if budget is not None and budget.remaining_requests is not None:
+        limit = min(limit, max(budget.remaining_requests - 1, 0))
+    sr = reddit.subreddit(unit.subreddit.replace("r/", ""))
+    logger.info("Searching %s for %s", unit.subreddit, unit.query)
+    listed = 0
+    stats.requests += 1
+    if budget is not None:
+        budget.charge()
+    listing = sr.search(unit.query, sort="new", limit=limit, time_filter=search_time_filter(unit.window_start))
+    for submission in profile_iter("search", listing):
+        listed += 1
+        if listed > 1 and listed % SEARCH_PAGE_SIZE == 1:
+            stats.requests += 1
+            if budget is not None:
+                budget.charge()
+        created = int(getattr(submission, 'created_utc', 0))
+        if unit.window_start and created < unit.window_start:
+            break
+        if not unit.contains(created):
+            continue
+        if budget is not None and budget.exhausted:
+            break
+        decision = triage.decide(submission) if triage is not None else None
+        stats.add(index_submission(submission, writer, decision, rules, watermarks, unit.query))
+        stats.processed += 1
+        if decision is None or decision.fetch_comments:
+            stats.requests += 1
+            if budget is not None:
+                budget.charge()
+        if heartbeat is not None and not heartbeat():
+            raise LeaseLostError(f"lease lost for {unit.unit_id}")
+    return stats
+
+
+def refresh_threads(
+    reddit,
+    writer: SupabaseWriter,
+    watermarks: CheckpointStore,
+    *,
+    budget: Optional[RequestBudget] = None,
+    rules: Optional[RulesetEvaluator] = None,
+) -> CrawlStats:
+    """Revisit every thread with a stored watermark, most recently active first, indexing only new comments."""
+    stats = CrawlStats()
+    for stream in watermarks.streams(THREAD_STREAM_PREFIX):
+        if budget is not None and budget.exhausted:
+            logger.info("Request budget exhausted after %d requests; leaving remaining threads", budget.used)
+            break
+        submission = reddit.submission(id=stream[len(THREAD_STREAM_PREFIX) :])
+        stats.requests += 1
+        if budget is not None:
+            budget.charge()
+        try:
+            stats.add(index_submission(submission, writer, None, rules, watermarks))
+        except Exception as exc:
+            logger.error("Thread refresh failed for %s: %s", stream, exc)
+            continue
+        stats.processed += 1
+    return stats
+
+
+def run_queue_worker(
+    reddit,
+    writer: SupabaseWriter,
+    queue: WorkQueue,
+    *,
+    worker_id: str,
+    limit: int,
+    lease_seconds: float = 300.0,
+    budget: Optional[RequestBudget] = None,
+    yield_store: Optional[YieldStore] = None,
+    triage: Optional[SubmissionTriage] = None,
+    rules: Optional[RulesetEvaluator] = None,
+    watermarks: Optional[CheckpointStore] = None,
+) -> CrawlStats:
+    """Lease and crawl units until the queue is drained or the budget runs out; returns this worker's totals."""
+    totals = CrawlStats()
+    while budget is None or not budget.exhausted:
+        unit = queue.lease(worker_id, lease_seconds)
+        if unit is None:
+            break
+        last_beat = time.monotonic()
+
+        def keep_alive() -> bool:
+            nonlocal last_beat
+            if time.monotonic() - last_beat < lease_seconds / 3:
+                return True
+            last_beat = time.monotonic()
+            return queue.heartbeat(unit, worker_id, lease_seconds)
+
+        try:
+            stats = crawl_unit(
+                reddit, writer, unit, limit, heartbeat=keep_alive, budget=budget, triage=triage, rules=rules, watermarks=watermarks
+            )
+        except LeaseLostError as exc:
+            logger.warning("[Queue] %s; another worker owns it now", exc)
+            continue
+        except Exception as exc:
+            logger.error("Search error in %s for '%s': %s", unit.subreddit, unit.query, exc)
+            queue.fail(unit, worker_id, str(exc))
+            continue
+        totals.merge(stats)
+        if yield_store is not None:
+            yield_store.record(unit, stats)
+        if budget is not None and budget.exhausted:
+            # The unit may have been cut short; hand it back untouched for the next run.
+            queue.release(unit, worker_id)
+            break
+        if not queue.complete(unit, worker_id, stats):
+            logger.warning("[Queue] lease on %s expired before completion; results kept but unit will be retried", unit.unit_id)
+    return totals
 
 
 # ----------------------------- Runner ---------------------------------
 def run(args: argparse.Namespace) -> None:
-    reddit = make_reddit()
+    install_codec(make_codec(getattr(args, "json_backend", None) or "auto"))
+    logger.info("[Codec] JSON backend: %s", json_codec().name)
+    profiler: Optional[StageProfiler] = None
+    if getattr(args, "profile", None):
+        profiler = StageProfiler(
+            args.profile,
+            args.profile_dir,
+            sample_interval=args.profile_interval,
+            top_n=args.profile_top,
+        ).start()
+        install_profiler(profiler)
+    try:
+        _run(args)
+    finally:
+        if profiler is not None:
+            install_profiler(None)
+            profiler.stop()
+            for path in profiler.write():
+                logger.info("[Profile] wrote %s", path)
+
+
+def _run(args: argparse.Namespace) -> None:
+    from dateutil import parser as dtparser
+    from supabase import create_client
+
+    try:
+        from scripts.wigg_seed_streams import CandidateBuffer, StreamDaemon, reprocess_dumps
+    except ModuleNotFoundError:  # run as `python wigg_reddit_seed.py` from scripts/
+        from wigg_seed_streams import CandidateBuffer, StreamDaemon, reprocess_dumps  # type: ignore[no-redef]
+
+    load_env_files()
+    reddit = make_reddit() if args.mode not in ("moderate", "dump", "mirror") else None
     url = os.environ.get("SUPABASE_URL")
     key = os.environ.get("SUPABASE_SERVICE_KEY")
     if not url or not key:
@@ -759,62 +2544,320 @@ def run(args: argparse.Namespace) -> None:
 
     service_role = decode_supabase_role(key)
     meta_fetcher = SupabaseMetaFetcher(url, key, logger=logger)
-    discovery = DatabaseDiscovery(meta_fetcher, logger=logger).discover(args.moment_table)
+    discovery_engine = DatabaseDiscovery(meta_fetcher, logger=logger)
+    discovery = discovery_engine.discover(args.moment_table)
+    if getattr(args, "index_check", False) or getattr(args, "index_probe", False):
+        report = discovery_engine.check_indexes(discovery, probe=args.index_probe)
+        migration = write_index_migration(report, args.migrations_dir)
+        if migration is not None:
+            logger.warning("[Indexes] wrote %s; apply it before long runs", migration)
 
     supabase_client = create_client(url, key)
+    hash_index = PayloadHashIndex(args.hash_index) if getattr(args, "hash_index", None) else None
+    dry_run_out = getattr(args, "dry_run_out", None)
+    if (dry_run_out or getattr(args, "diff", False)) and not args.dry_run:
+        raise SystemExit("--dry-run-out and --diff only apply together with --dry-run")
+    export = PayloadExport(dry_run_out, discovery) if dry_run_out else None
+    diff = TableDiff(supabase_client, discovery, page_size=args.page_size) if getattr(args, "diff", False) else None
+    aggregates = TitleAggregateStore(args.aggregates) if getattr(args, "aggregates", None) else None
+    watermarks = CheckpointStore(args.thread_watermarks) if getattr(args, "thread_watermarks", None) else None
+    titles = (
+        TitleAliasStore(args.title_aliases, threshold=args.title_threshold, persist=not args.dry_run)
+        if getattr(args, "title_aliases", None)
+        else None
+    )
+    if aggregates is not None:
+        for path in getattr(args, "merge_aggregates", None) or []:
+            logger.info("[Aggregates] merged %d new moments from %s", aggregates.merge_from(path), path)
     writer = SupabaseWriter(
         client=supabase_client,
         discovery=discovery,
         dry_run=args.dry_run,
         logger=logger,
         service_key_role=service_role,
+        hash_index=hash_index,
+        export=export,
+        diff=diff,
+        aggregates=aggregates,
+        titles=titles,
+        top_k=getattr(args, "top_k", 0),
     )
+    if hash_index is not None and args.rebuild_hash_index:
+        rebuilt = hash_index.rebuild(supabase_client, discovery, page_size=args.page_size)
+        logger.info("[HashIndex] rebuilt %d entries from %s", rebuilt, discovery.full_table_name)
 
-    since_ts = 0
-    if args.since:
-        since_ts = int(dtparser.parse(args.since).replace(tzinfo=timezone.utc).timestamp())
-
-    total_inserted = 0
-    total_updated = 0
-    total_processed = 0
+    try:
+        rule_specs = getattr(args, "ruleset", None) or [DEFAULT_RULESET.name]
+        rules = RulesetEvaluator([load_ruleset(spec) for spec in rule_specs])
 
-    for sub in args.subs:
-        sr = reddit.subreddit(sub.replace("r/", ""))
-        for q in SEARCH_QUERIES:
-            logger.info("Searching %s for %s", sub, q)
+        if args.mode == "moderate":
+            checkpoints = CheckpointStore(args.checkpoint_db)
             try:
-                for submission in sr.search(q, sort="new", limit=args.limit, time_filter="all"):
-                    if since_ts and int(getattr(submission, 'created_utc', 0)) < since_ts:
-                        continue
-                    result = index_submission(submission, writer)
-                    total_inserted += result.inserted
-                    total_updated += result.updated
-                    total_processed += 1
-            except Exception as exc:
-                logger.error("Search error in %s for '%s': %s", sub, q, exc)
-                continue
-
-    logger.info(
-        "Run complete. processed_submissions=%d inserted=%d updated=%d dry_run=%s",
-        total_processed,
-        total_inserted,
-        total_updated,
-        args.dry_run,
-    )
+                BulkModerator(
+                    writer, moderation_rule_from_args(args, titles), checkpoints=checkpoints, page_size=args.page_size, logger=logger
+                ).run()
+            finally:
+                checkpoints.close()
+            return
+        if args.mode == "mirror":
+            mirror = TableMirror(args.mirror, discovery)
+            try:
+                mirror.sync(
+                    supabase_client, page_size=args.page_size, full=args.mirror_full, lookback=args.mirror_lookback_days * 86400
+                )
+                mirror.log_report(logger)
+            finally:
+                mirror.close()
+            return
+        if args.mode == "dump":
+            if not getattr(args, "dump", None):
+                raise SystemExit("--mode dump needs --dump FILE [FILE ...]")
+            reprocess_dumps(
+                args.dump,
+                writer,
+                rule_specs=rule_specs,
+                subreddits=args.dump_subs or (),
+                months=args.dump_months or (),
+                workers=args.dump_workers or os.cpu_count() or 1,
+                batch_size=args.batch_size,
+                stride=args.dump_stride,
+                rebuild_index=args.rebuild_dump_index,
+                rules=rules,
+                logger=logger,
+            )
+            rules.log_report(logger)
+            return
+        if args.mode == "refresh":
+            ScoreRefresher(reddit, writer, page_size=args.page_size, logger=logger).run()
+            return
+        if args.mode == "threads":
+            if watermarks is None:
+                raise SystemExit("--mode threads needs --thread-watermarks")
+            totals = refresh_threads(reddit, writer, watermarks, budget=RequestBudget(args.max_requests, args.max_runtime), rules=rules)
+            rules.log_report(logger)
+            logger.info(
+                "[Threads] refreshed=%d inserted=%d updated=%d candidates=%d requests=%d",
+                totals.processed,
+                totals.inserted,
+                totals.updated,
+                totals.candidates,
+                totals.requests,
+            )
+            return
+        if args.mode == "daemon":
+            checkpoints = CheckpointStore(args.checkpoint_db)
+            try:
+                buffer = CandidateBuffer(writer, max_rows=args.batch_size, flush_interval=args.flush_interval)
+                stats = StreamDaemon(reddit, buffer, checkpoints, args.subs, rules=rules, logger=logger).run()
+            finally:
+                checkpoints.close()
+            rules.log_report(logger)
+            logger.info("[Daemon] stopped: %s", ",".join(f"{k}={v}" for k, v in stats.items()))
+            return
+
+        since_ts = 0
+        if args.since:
+            since_ts = int(dtparser.parse(args.since).replace(tzinfo=timezone.utc).timestamp())
+
+        budget = RequestBudget(args.max_requests, args.max_runtime)
+        triage = None
+        if not args.no_triage:
+            triage = SubmissionTriage(TriagePolicy(min_comments=args.triage_min_comments, min_score=args.triage_min_score))
+        yield_store = YieldStore(args.yield_db) if args.yield_db else None
+        units = plan_work_units(args.subs, rules.search_queries, since_ts=since_ts)
+        if yield_store is not None:
+            units = YieldScheduler(yield_store, explore=args.explore).order(units)
+
+        if args.queue:
+            queue = SQLiteWorkQueue(args.queue)
+            if args.enqueue:
+                logger.info("[Queue] enqueued %d/%d work units into %s", queue.enqueue(units), len(units), args.queue)
+            elif yield_store is not None:
+                logger.info("[Queue] reprioritized %d pending work units by yield", queue.prioritize(units))
+            worker_id = args.worker_id or f"{socket.gethostname()}:{os.getpid()}"
+            totals = run_queue_worker(
+                reddit,
+                writer,
+                queue,
+                worker_id=worker_id,
+                limit=args.limit,
+                lease_seconds=args.lease_seconds,
+                budget=budget,
+                yield_store=yield_store,
+                triage=triage,
+                rules=rules,
+                watermarks=watermarks,
+            )
+            aggregate = queue.aggregate_stats()
+            logger.info(
+                "[Queue] all workers: done=%d pending=%d leased=%d failed=%d workers=%d processed_submissions=%d inserted=%d updated=%d",
+                aggregate["done"],
+                aggregate["pending"],
+                aggregate["leased"],
+                aggregate["failed"],
+                aggregate["workers"],
+                aggregate["processed"],
+                aggregate["inserted"],
+                aggregate["updated"],
+            )
+            queue.close()
+        else:
+            totals = CrawlStats()
+            for unit in units:
+                if budget.exhausted:
+                    logger.info("Request budget exhausted after %d requests; skipping remaining units", budget.used)
+                    break
+                try:
+                    stats = crawl_unit(
+                        reddit, writer, unit, args.limit, budget=budget, triage=triage, rules=rules, watermarks=watermarks
+                    )
+                except Exception as exc:
+                    logger.error("Search error in %s for '%s': %s", unit.subreddit, unit.query, exc)
+                    continue
+                totals.merge(stats)
+                if yield_store is not None:
+                    yield_store.record(unit, stats)
+
+        if yield_store is not None:
+            yield_store.close()
+        if triage is not None:
+            triage.log_report(logger)
+        rules.log_report(logger)
+
+        logger.info(
+            "Run complete. processed_submissions=%d inserted=%d updated=%d candidates=%d requests=%d dry_run=%s",
+            totals.processed,
+            totals.inserted,
+            totals.updated,
+            totals.candidates,
+            totals.requests,
+            args.dry_run,
+        )
+    finally:
+        if hash_index is not None:
+            hash_index.log_report(logger)
+            hash_index.close()
+        if export is not None:
+            export.close()
+            logger.info("[Export] wrote %d payloads to %s", export.rows, export.path)
+        if diff is not None:
+            diff.log_report(logger)
+        if watermarks is not None:
+            watermarks.close()
+        if titles is not None:
+            titles.log_report(logger)
+            titles.close()
+        if writer.top_k:
+            kept = writer.retention
+            logger.info(
+                "[TopK] k=%d offered=%d kept=%d evicted=%d duplicates=%d",
+                writer.top_k,
+                kept.offered,
+                kept.kept,
+                kept.evicted,
+                kept.duplicates,
+            )
+        if aggregates is not None:
+            aggregates.log_report(logger)
+            if not args.dry_run:
+                published = aggregates.publish(supabase_client, args.metrics_table)
+                logger.info("[Aggregates] published %d changed titles to %s", published, args.metrics_table)
+            aggregates.close()
 
 
 # ----------------------------- CLI ------------------------------------
-if __name__ == "__main__":
+def build_arg_parser(default_rulesets: Sequence[str] = ("default",)) -> argparse.ArgumentParser:
     ap = argparse.ArgumentParser(description="Seed Wigg DB with Reddit 'when does it get good' signals.")
+    ap.add_argument(
+        "--mode",
+        choices=["crawl", "refresh", "daemon", "threads", "moderate", "dump", "mirror"],
+        default="crawl",
+        help=(
+            "crawl: search and index; refresh: re-score already-seeded rows; daemon: follow live subreddit streams; "
+            "threads: index new comments in threads with a --thread-watermarks entry; "
+            "moderate: bulk-move rows matching the --set-status rule (resumes via --checkpoint-db); "
+            "dump: extract from local NDJSON dumps (--dump) instead of the API; "
+            "mirror: sync the moments table into the local --mirror file"
+        ),
+    )
     ap.add_argument("--subs", nargs="*", default=DEFAULT_SUBS, help="Subreddits to search (e.g., r/television r/anime)")
     ap.add_argument("--limit", type=int, default=200, help="Max results per query per sub")
     ap.add_argument("--since", type=str, default=None, help="Only index posts after this date (e.g., 2023-01-01)")
     ap.add_argument("--moment-table", type=str, default="moments_seed", help="Supabase table for candidate moments")
     ap.add_argument("--dry-run", action="store_true", help="Log payloads without writing to the database")
-    args = ap.parse_args()
-
+    ap.add_argument(
+        "--ruleset",
+        nargs="+",
+        default=list(default_rulesets),
+        help="Extraction rulesets evaluated in one pass: 'default', a name under scripts/rulesets/, or a JSON file path",
+    )
+    ap.add_argument("--page-size", type=int, default=1000, help="Rows per keyset page when reading the moments table")
+    ap.add_argument("--dry-run-out", type=str, default=None, help="Dry-run: write every would-be payload to this .ndjson or .parquet file")
+    ap.add_argument("--diff", action="store_true", help="Dry-run: compare payloads with stored rows and report new/changed/unchanged")
+    ap.add_argument("--top-k", type=int, default=20, help="Write at most this many candidates per title/season/episode per thread (daemon: per flush); 0 = all")
+    ap.add_argument("--title-aliases", type=str, default=None, help="SQLite alias map clustering title variants onto one canonical write key")
+    ap.add_argument("--title-threshold", type=float, default=90.0, help="rapidfuzz ratio (0-100) needed to join an existing title cluster")
+    ap.add_argument("--aggregates", type=str, default=None, help="SQLite file of per-title Reddit aggregates; changed titles are published after the run")
+    ap.add_argument("--merge-aggregates", nargs="+", default=None, help="Other workers' --aggregates files to merge in before crawling")
+    ap.add_argument("--metrics-table", type=str, default="reddit_title_metrics", help="Table receiving per-title Reddit metrics")
+    ap.add_argument("--hash-index", type=str, default=None, help="SQLite file of last-written payload hashes; unchanged rows are not re-sent")
+    ap.add_argument("--rebuild-hash-index", action="store_true", help="Rebuild --hash-index from the moments table before running")
+    ap.add_argument("--thread-watermarks", type=str, default=None, help="SQLite file of per-thread comment watermarks; known threads only fetch newer comments")
+    ap.add_argument("--index-check", action="store_true", help="Report the indexes behind upserts and lookups; write a migration for any that are missing or invalid")
+    ap.add_argument("--index-probe", action="store_true", help="Also time the upsert and lookup queries with EXPLAIN ANALYZE (implies --index-check)")
+    ap.add_argument("--migrations-dir", type=str, default="supabase/migrations", help="Where --index-check writes fix-up migrations")
+    ap.add_argument("--set-status", choices=MODERATION_STATUSES, default=None, help="Moderate: status to move matching rows to")
+    ap.add_argument("--from-status", choices=MODERATION_STATUSES, default="needs_review", help="Moderate: only rows currently in this status")
+    ap.add_argument("--min-confidence", type=float, default=None, help="Moderate: only rows with confidence >= this")
+    ap.add_argument("--max-confidence", type=float, default=None, help="Moderate: only rows with confidence <= this")
+    ap.add_argument("--title", nargs="+", default=None, help="Moderate: only these titles (whole clusters with --title-aliases)")
+    ap.add_argument("--moderate-subs", nargs="+", default=None, help="Moderate: only rows from these subreddits")
+    ap.add_argument("--older-than-days", type=float, default=None, help="Moderate: only rows created more than this many days ago")
+    ap.add_argument("--newer-than-days", type=float, default=None, help="Moderate: only rows created within this many days")
+    ap.add_argument("--checkpoint-db", type=str, default="wigg_stream_checkpoints.db", help="Daemon stream / moderation progress checkpoint file")
+    ap.add_argument("--flush-interval", type=float, default=30.0, help="Daemon: flush buffered candidates at least this often (seconds)")
+    ap.add_argument("--batch-size", type=int, default=500, help="Daemon/dump: flush once this many candidates are buffered")
+    ap.add_argument("--mirror", type=str, default="wigg_mirror.db", help="Mirror: local SQLite copy of the moments table")
+    ap.add_argument("--mirror-full", action="store_true", help="Mirror: re-read every row and drop rows deleted upstream")
+    ap.add_argument(
+        "--mirror-lookback-days", type=float, default=1.0, help="Mirror: also re-read rows this far behind a time cursor (clock skew, late commits)"
+    )
+    ap.add_argument("--dump", nargs="+", default=None, help="Dump: NDJSON files of submissions/comments, submission dumps first")
+    ap.add_argument("--dump-subs", nargs="+", default=None, help="Dump: only these subreddits (default: all)")
+    ap.add_argument("--dump-months", nargs="+", default=None, help="Dump: only these months, e.g. 2023-01 (default: all)")
+    ap.add_argument("--dump-workers", type=int, default=0, help="Dump: extraction processes (0 = one per CPU)")
+    ap.add_argument("--dump-stride", type=int, default=DUMP_STRIDE, help="Dump: records per indexed block in the <dump>.idx sidecar")
+    ap.add_argument("--rebuild-dump-index", action="store_true", help="Dump: rebuild the sidecar index even if it matches the file")
+    ap.add_argument("--json-backend", choices=["auto", *JSON_BACKENDS], default="auto", help="JSON encoder for request bodies and payload hashes (auto prefers msgspec, then orjson)")
+    ap.add_argument("--profile", choices=["cpu", "mem"], default=None, help="Profile run stages: cpu (stack sampling + pstats) or mem (tracemalloc, on only during sampled stage calls)")
+    ap.add_argument("--profile-dir", type=str, default="profiles", help="Where profile output files are written")
+    ap.add_argument("--profile-interval", type=float, default=0.005, help="Stack sampling interval in seconds for --profile cpu")
+    ap.add_argument("--profile-top", type=int, default=25, help="Allocation sites kept per stage for --profile mem")
+    ap.add_argument("--queue", type=str, default=None, help="SQLite work-queue file shared by crawl workers")
+    ap.add_argument("--enqueue", action="store_true", help="Seed the queue with --subs x ruleset search queries before working")
+    ap.add_argument("--worker-id", type=str, default=None, help="Queue worker id (default: hostname:pid)")
+    ap.add_argument("--lease-seconds", type=float, default=300.0, help="Queue lease length; renewed by heartbeats while crawling")
+    ap.add_argument("--yield-db", type=str, default=None, help="SQLite file of per-(sub, query) yield history; enables yield-ordered scheduling")
+    ap.add_argument("--max-requests", type=int, default=0, help="Stop after roughly this many Reddit API requests (0 = unlimited)")
+    ap.add_argument("--max-runtime", type=float, default=0.0, help="Stop starting new work after this many seconds (0 = unlimited)")
+    ap.add_argument("--no-triage", action="store_true", help="Fetch comments for every submission instead of triaging on listing fields")
+    ap.add_argument("--triage-min-comments", type=int, default=3, help="Skip comment fetches for submissions with fewer comments")
+    ap.add_argument("--triage-min-score", type=int, default=0, help="Skip comment fetches for submissions scoring below this")
+    ap.add_argument("--explore", type=float, default=0.1, help="Chance of spending a slot on a lower-yield pair instead of the best one")
+    return ap
+
+
+def main(argv: Optional[Sequence[str]] = None, *, default_rulesets: Sequence[str] = ("default",)) -> int:
+    args = build_arg_parser(default_rulesets).parse_args(argv)
     try:
         run(args)
     except Exception as exc:
         logger.error("Fatal error: %s", exc)
-        sys.exit(1)
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    # wigg_seed_streams imports this module by name; let it find the running copy instead of loading a second one.
+    sys.modules.setdefault(__spec__.name if __spec__ else "wigg_reddit_seed", sys.modules[__name__])
+    sys.exit(main())
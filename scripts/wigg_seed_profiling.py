@@ -0,0 +1,223 @@
+"""
+wigg_seed_profiling.py
+
+Per-stage timing, sampling and allocation profiling for wigg_reddit_seed.py
+crawl runs (--profile). Stages are marked with profile_stage/profile_iter and
+cost nothing until install_profiler is called.
+"""
+from __future__ import annotations
+
+import os
+import sys
+import time
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional
+
+
+class _NullStage:
+    def __enter__(self) -> None:
+        return None
+
+    def __exit__(self, *exc) -> None:
+        return None
+
+
+_NULL_STAGE = _NullStage()
+
+
+_PROFILER: Optional["StageProfiler"] = None
+
+
+def install_profiler(profiler: Optional["StageProfiler"]) -> None:
+    global _PROFILER
+    _PROFILER = profiler
+
+
+def profile_stage(name: str):
+    """Context manager attributing the enclosed work to a pipeline stage; free when profiling is off."""
+    return _PROFILER.stage(name) if _PROFILER is not None else _NULL_STAGE
+
+
+def profile_iter(name: str, iterable: Iterable):
+    """Attribute the time spent producing each item (e.g. listing pages) to a stage."""
+    return _PROFILER.iterate(name, iterable) if _PROFILER is not None else iterable
+
+
+class _Stage:
+    __slots__ = ("profiler", "name", "started", "capture")
+
+    def __init__(self, profiler: "StageProfiler", name: str) -> None:
+        self.profiler = profiler
+        self.name = name
+
+    def __enter__(self) -> None:
+        self.profiler._stack.append(self.name)
+        self.capture = self.profiler._begin_capture(self.name)
+        self.started = time.perf_counter()
+
+    def __exit__(self, *exc) -> None:
+        elapsed = time.perf_counter() - self.started
+        if self.capture is not None:
+            self.profiler._end_capture(self.name, self.capture)
+        timing = self.profiler.timings.setdefault(self.name, [0, 0.0])
+        timing[0] += 1
+        timing[1] += elapsed
+        self.profiler._stack.pop()
+
+
+class StageProfiler:
+    """Low-overhead per-stage timing for crawl runs, with optional cpu sampling or mem snapshots."""
+
+    def __init__(
+        self,
+        mode: str,
+        out_dir: str,
+        *,
+        sample_interval: float = 0.005,
+        capture_interval: float = 1.0,
+        top_n: int = 25,
+    ) -> None:
+        if mode not in ("cpu", "mem"):
+            raise ValueError(f"Unknown profile mode {mode!r}; expected cpu or mem")
+        self.mode = mode
+        self.out_dir = Path(out_dir)
+        self.sample_interval = sample_interval
+        self.capture_interval = capture_interval
+        self.top_n = top_n
+        self.timings: Dict[str, List[float]] = {}
+        self.collapsed: Dict[str, int] = {}
+        self.captures: Dict[str, int] = {}
+        self._stack: List[str] = []
+        self._pstats: Dict[str, object] = {}
+        self._mem: Dict[str, Dict[str, List[int]]] = {}
+        self._last_capture: Dict[str, float] = {}
+        self._capturing = False
+        self._tracing = False
+        self._sampler = None
+        self._stop = None
+
+    # -- lifecycle --
+    def start(self) -> "StageProfiler":
+        import threading
+
+        if self.mode == "cpu":
+            self._stop = threading.Event()
+            target = threading.get_ident()
+            self._sampler = threading.Thread(target=self._sample_loop, args=(target,), name="wigg-stack-sampler", daemon=True)
+            self._sampler.start()
+        return self
+
+    def stop(self) -> None:
+        if self._sampler is not None:
+            self._stop.set()
+            self._sampler.join()
+            self._sampler = None
+        if self._tracing:
+            import tracemalloc
+
+            tracemalloc.stop()
+            self._tracing = False
+
+    def stage(self, name: str) -> _Stage:
+        return _Stage(self, name)
+
+    def iterate(self, name: str, iterable: Iterable):
+        iterator = iter(iterable)
+        while True:
+            with self.stage(name):
+                try:
+                    item = next(iterator)
+                except StopIteration:
+                    return
+            yield item
+
+    # -- captures --
+    def _begin_capture(self, name: str):
+        now = time.monotonic()
+        if self._capturing or now - self._last_capture.get(name, float("-inf")) < self.capture_interval:
+            return None
+        self._capturing = True
+        self._last_capture[name] = now
+        if self.mode == "cpu":
+            import cProfile
+
+            prof = cProfile.Profile()
+            prof.enable()
+            return prof
+        import tracemalloc
+
+        if not tracemalloc.is_tracing():
+            tracemalloc.start()
+            self._tracing = True
+        return tracemalloc.take_snapshot()
+
+    def _end_capture(self, name: str, capture) -> None:
+        self.captures[name] = self.captures.get(name, 0) + 1
+        if self.mode == "cpu":
+            import pstats
+
+            capture.disable()
+            existing = self._pstats.get(name)
+            if existing is None:
+                self._pstats[name] = pstats.Stats(capture)
+            else:
+                existing.add(capture)
+        else:
+            import tracemalloc
+
+            after = tracemalloc.take_snapshot()
+            if self._tracing:
+                tracemalloc.stop()
+                self._tracing = False
+            filters = [tracemalloc.Filter(False, tracemalloc.__file__)]
+            per_line = self._mem.setdefault(name, {})
+            for diff in after.filter_traces(filters).compare_to(capture.filter_traces(filters), "lineno"):
+                if diff.size_diff <= 0:
+                    continue
+                entry = per_line.setdefault(str(diff.traceback[0]), [0, 0])
+                entry[0] += diff.size_diff
+                entry[1] += diff.count_diff
+        self._capturing = False
+
+    def _sample_loop(self, thread_id: int) -> None:
+        while not self._stop.wait(self.sample_interval):
+            frame = sys._current_frames().get(thread_id)
+            if frame is None:
+                continue
+            frames: List[str] = []
+            while frame is not None:
+                code = frame.f_code
+                frames.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{frame.f_lineno})")
+                frame = frame.f_back
+            stages = list(self._stack) or ["other"]
+            key = ";".join([*stages, *reversed(frames)])
+            self.collapsed[key] = self.collapsed.get(key, 0) + 1
+
+    # -- output --
+    def write(self) -> List[Path]:
+        self.out_dir.mkdir(parents=True, exist_ok=True)
+        written: List[Path] = []
+        summary = self.out_dir / "summary.txt"
+        lines = [f"{'stage':<20} {'calls':>10} {'total_s':>10} {'mean_ms':>10} {'captures':>9}"]
+        for name, (calls, total) in sorted(self.timings.items(), key=lambda item: item[1][1], reverse=True):
+            lines.append(f"{name:<20} {int(calls):>10} {total:>10.3f} {total / calls * 1000:>10.3f} {self.captures.get(name, 0):>9}")
+        summary.write_text("\n".join(lines) + "\n", encoding="utf-8")
+        written.append(summary)
+        if self.mode == "cpu":
+            for name, stats in self._pstats.items():
+                path = self.out_dir / f"{name}.pstats"
+                stats.dump_stats(str(path))
+                written.append(path)
+            collapsed = self.out_dir / "cpu.collapsed"
+            collapsed.write_text("".join(f"{stack} {count}\n" for stack, count in sorted(self.collapsed.items())), encoding="utf-8")
+            written.append(collapsed)
+        else:
+            for name, per_line in self._mem.items():
+                path = self.out_dir / f"{name}.tracemalloc.txt"
+                top = sorted(per_line.items(), key=lambda item: item[1][0], reverse=True)[: self.top_n]
+                path.write_text(
+                    "".join(f"{size / 1024:>10.1f} KiB {count:>8} blocks  {where}\n" for where, (size, count) in top),
+                    encoding="utf-8",
+                )
+                written.append(path)
+        return written
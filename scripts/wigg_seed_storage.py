@@ -0,0 +1,1420 @@
+"""
+wigg_seed_storage.py
+
+Local SQLite state kept by wigg_reddit_seed.py between runs and workers: the
+work queue, per-pair yield history, payload hash index, table mirror, title
+aliases and aggregates, stream checkpoints and the dump sidecar index. Only
+the standard library is needed; the rest of the crawler is imported for
+type annotations only.
+"""
+from __future__ import annotations
+
+import hashlib
+import json
+import logging
+import math
+import os
+import re
+import time
+from dataclasses import dataclass, field
+from datetime import date, datetime, timedelta, timezone
+from typing import TYPE_CHECKING, Any, Dict, Iterable, List, Optional, Protocol, Sequence, Tuple
+
+if TYPE_CHECKING:
+    from supabase import Client
+
+    from scripts.wigg_reddit_seed import CandidateMoment, CrawlStats, DiscoveryResult
+
+logger = logging.getLogger("wigg.reddit_seed")
+
+
+# ----------------------------- Work queue ------------------------------
+@dataclass(frozen=True)
+class WorkUnit:
+    """One (subreddit, query, time-window) slice of a crawl; 0 means unbounded on that side."""
+    subreddit: str
+    query: str
+    window_start: int = 0
+    window_end: int = 0
+    attempts: int = 0
+
+    @property
+    def unit_id(self) -> str:
+        return f"{self.subreddit}|{self.query}|{self.window_start}|{self.window_end}"
+
+    def contains(self, created_utc: int) -> bool:
+        if self.window_start and created_utc < self.window_start:
+            return False
+        if self.window_end and created_utc >= self.window_end:
+            return False
+        return True
+
+
+class WorkQueue(Protocol):
+    """Durable source of WorkUnits shared by crawl workers, leased highest priority first."""
+
+    def enqueue(self, units: Iterable[WorkUnit]) -> int: ...
+
+    def prioritize(self, units: Sequence[WorkUnit]) -> int: ...
+
+    def lease(self, worker_id: str, lease_seconds: float) -> Optional[WorkUnit]: ...
+
+    def heartbeat(self, unit: WorkUnit, worker_id: str, lease_seconds: float) -> bool: ...
+
+    def complete(self, unit: WorkUnit, worker_id: str, stats: CrawlStats) -> bool: ...
+
+    def fail(self, unit: WorkUnit, worker_id: str, error: str) -> None: ...
+
+    def release(self, unit: WorkUnit, worker_id: str) -> None: ...
+
+    def aggregate_stats(self) -> Dict[str, int]: ...
+
+
+def open_sqlite(path: str):
+    """Autocommit SQLite connection with WAL enabled for on-disk files."""
+    import sqlite3
+
+    conn = sqlite3.connect(path, timeout=30, isolation_level=None)
+    conn.row_factory = sqlite3.Row
+    if path != ":memory:":
+        conn.execute("PRAGMA journal_mode=WAL")
+    return conn
+
+
+class SQLiteWorkQueue:
+    """WorkQueue backed by a local SQLite file (WAL mode, safe across processes)."""
+
+    def __init__(self, path: str, *, max_attempts: int = 3, clock=time.time) -> None:
+        self.path = path
+        self.max_attempts = max_attempts
+        self.clock = clock
+        self._conn = open_sqlite(path)
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS work_units (
+                unit_id TEXT PRIMARY KEY,
+                subreddit TEXT NOT NULL,
+                query TEXT NOT NULL,
+                window_start INTEGER NOT NULL DEFAULT 0,
+                window_end INTEGER NOT NULL DEFAULT 0,
+                status TEXT NOT NULL DEFAULT 'pending',
+                worker_id TEXT,
+                lease_expires REAL NOT NULL DEFAULT 0,
+                attempts INTEGER NOT NULL DEFAULT 0,
+                processed INTEGER NOT NULL DEFAULT 0,
+                inserted INTEGER NOT NULL DEFAULT 0,
+                updated INTEGER NOT NULL DEFAULT 0,
+                error TEXT,
+                completed_at REAL,
+                priority REAL NOT NULL DEFAULT 0
+            )
+            """
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS work_units_status_idx ON work_units (status, lease_expires)")
+
+    def close(self) -> None:
+        self._conn.close()
+
+    @staticmethod
+    def _priorities(units: Sequence[WorkUnit]) -> List[Tuple[float, str]]:
+        return [(float(len(units) - i), u.unit_id) for i, u in enumerate(units)]
+
+    def enqueue(self, units: Iterable[WorkUnit]) -> int:
+        """Add units not queued yet and reprioritize pending ones; returns how many were added."""
+        units = list(units)
+        rows = [(u.unit_id, u.subreddit, u.query, u.window_start, u.window_end, p) for u, (p, _) in zip(units, self._priorities(units))]
+        self._conn.execute("BEGIN IMMEDIATE")
+        try:
+            before = self._conn.total_changes
+            self._conn.executemany(
+                "INSERT OR IGNORE INTO work_units (unit_id, subreddit, query, window_start, window_end, priority) VALUES (?, ?, ?, ?, ?, ?)",
+                rows,
+            )
+            added = self._conn.total_changes - before
+            self._set_priorities(units)
+            self._conn.execute("COMMIT")
+        except Exception:
+            self._conn.execute("ROLLBACK")
+            raise
+        return added
+
+    def prioritize(self, units: Sequence[WorkUnit]) -> int:
+        """Store `units`' order (best first) as the priority of those still pending; returns how many changed."""
+        self._conn.execute("BEGIN IMMEDIATE")
+        try:
+            changed = self._set_priorities(units)
+            self._conn.execute("COMMIT")
+        except Exception:
+            self._conn.execute("ROLLBACK")
+            raise
+        return changed
+
+    def _set_priorities(self, units: Sequence[WorkUnit]) -> int:
+        before = self._conn.total_changes
+        self._conn.executemany(
+            "UPDATE work_units SET priority = ? WHERE unit_id = ? AND status = 'pending' AND priority != ?",
+            [(p, unit_id, p) for p, unit_id in self._priorities(units)],
+        )
+        return self._conn.total_changes - before
+
+    def lease(self, worker_id: str, lease_seconds: float) -> Optional[WorkUnit]:
+        now = self.clock()
+        self._conn.execute("BEGIN IMMEDIATE")
+        try:
+            # Units whose worker stopped heartbeating are reclaimed here, or failed
+            # for good once they have used up their attempts.
+            self._conn.execute(
+                "UPDATE work_units SET status = 'failed', worker_id = NULL, error = COALESCE(error, 'lease expired') "
+                "WHERE status = 'leased' AND lease_expires < ? AND attempts >= ?",
+                (now, self.max_attempts),
+            )
+            row = self._conn.execute(
+                "SELECT * FROM work_units "
+                "WHERE status = 'pending' OR (status = 'leased' AND lease_expires < ?) "
+                "ORDER BY attempts, priority DESC, rowid LIMIT 1",
+                (now,),
+            ).fetchone()
+            if row is None:
+                self._conn.execute("COMMIT")
+                return None
+            if row["status"] == "leased":
+                logger.warning("[Queue] reclaiming %s from expired worker %s", row["unit_id"], row["worker_id"])
+            self._conn.execute(
+                "UPDATE work_units SET status = 'leased', worker_id = ?, lease_expires = ?, attempts = attempts + 1 WHERE unit_id = ?",
+                (worker_id, now + lease_seconds, row["unit_id"]),
+            )
+            self._conn.execute("COMMIT")
+        except Exception:
+            self._conn.execute("ROLLBACK")
+            raise
+        return WorkUnit(
+            subreddit=row["subreddit"],
+            query=row["query"],
+            window_start=int(row["window_start"]),
+            window_end=int(row["window_end"]),
+            attempts=int(row["attempts"]) + 1,
+        )
+
+    def heartbeat(self, unit: WorkUnit, worker_id: str, lease_seconds: float) -> bool:
+        cur = self._conn.execute(
+            "UPDATE work_units SET lease_expires = ? WHERE unit_id = ? AND worker_id = ? AND status = 'leased'",
+            (self.clock() + lease_seconds, unit.unit_id, worker_id),
+        )
+        return cur.rowcount == 1
+
+    def complete(self, unit: WorkUnit, worker_id: str, stats: CrawlStats) -> bool:
+        cur = self._conn.execute(
+            "UPDATE work_units SET status = 'done', processed = ?, inserted = ?, updated = ?, error = NULL, completed_at = ? "
+            "WHERE unit_id = ? AND worker_id = ? AND status = 'leased'",
+            (stats.processed, stats.inserted, stats.updated, self.clock(), unit.unit_id, worker_id),
+        )
+        return cur.rowcount == 1
+
+    def fail(self, unit: WorkUnit, worker_id: str, error: str) -> None:
+        self._conn.execute(
+            "UPDATE work_units SET status = CASE WHEN attempts >= ? THEN 'failed' ELSE 'pending' END, "
+            "worker_id = NULL, lease_expires = 0, error = ? WHERE unit_id = ? AND worker_id = ?",
+            (self.max_attempts, error[:500], unit.unit_id, worker_id),
+        )
+
+    def release(self, unit: WorkUnit, worker_id: str) -> None:
+        self._conn.execute(
+            "UPDATE work_units SET status = 'pending', worker_id = NULL, lease_expires = 0, attempts = MAX(attempts - 1, 0) "
+            "WHERE unit_id = ? AND worker_id = ? AND status = 'leased'",
+            (unit.unit_id, worker_id),
+        )
+
+    def aggregate_stats(self) -> Dict[str, int]:
+        stats: Dict[str, int] = {"pending": 0, "leased": 0, "done": 0, "failed": 0}
+        for row in self._conn.execute("SELECT status, COUNT(*) AS n FROM work_units GROUP BY status"):
+            stats[str(row["status"])] = int(row["n"])
+        totals = self._conn.execute(
+            "SELECT COALESCE(SUM(processed), 0) AS processed, COALESCE(SUM(inserted), 0) AS inserted, "
+            "COALESCE(SUM(updated), 0) AS updated, COUNT(DISTINCT worker_id) AS workers FROM work_units WHERE status = 'done'"
+        ).fetchone()
+        stats.update({key: int(totals[key]) for key in ("processed", "inserted", "updated", "workers")})
+        return stats
+
+
+# ----------------------------- Yield history ---------------------------
+@dataclass(frozen=True)
+class PairYield:
+    subreddit: str
+    query: str
+    runs: int = 0
+    requests: int = 0
+    candidates: int = 0
+    new_rows: int = 0
+    duplicate_rows: int = 0
+
+    @property
+    def candidates_per_request(self) -> float:
+        return self.candidates / self.requests if self.requests else 0.0
+
+    @property
+    def new_ratio(self) -> float:
+        # Dry runs cannot tell new from duplicate rows; treat them as all new.
+        written = self.new_rows + self.duplicate_rows
+        return self.new_rows / written if written else 1.0
+
+    @property
+    def score(self) -> float:
+        return self.candidates_per_request * self.new_ratio
+
+
+class YieldStore:
+    """Per-(subreddit, query) yield history persisted in a local SQLite file."""
+
+    def __init__(self, path: str) -> None:
+        self.path = path
+        self._conn = open_sqlite(path)
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS query_yield (
+                subreddit TEXT NOT NULL,
+                query TEXT NOT NULL,
+                runs INTEGER NOT NULL DEFAULT 0,
+                requests INTEGER NOT NULL DEFAULT 0,
+                candidates INTEGER NOT NULL DEFAULT 0,
+                new_rows INTEGER NOT NULL DEFAULT 0,
+                duplicate_rows INTEGER NOT NULL DEFAULT 0,
+                last_run REAL,
+                PRIMARY KEY (subreddit, query)
+            )
+            """
+        )
+
+    def close(self) -> None:
+        self._conn.close()
+
+    def record(self, unit: WorkUnit, stats: CrawlStats) -> None:
+        self._conn.execute(
+            """
+            INSERT INTO query_yield (subreddit, query, runs, requests, candidates, new_rows, duplicate_rows, last_run)
+            VALUES (?, ?, 1, ?, ?, ?, ?, ?)
+            ON CONFLICT (subreddit, query) DO UPDATE SET
+                runs = runs + 1,
+                requests = requests + excluded.requests,
+                candidates = candidates + excluded.candidates,
+                new_rows = new_rows + excluded.new_rows,
+                duplicate_rows = duplicate_rows + excluded.duplicate_rows,
+                last_run = excluded.last_run
+            """,
+            (unit.subreddit, unit.query, stats.requests, stats.candidates, stats.inserted, stats.updated, time.time()),
+        )
+
+    def get_all(self) -> Dict[Tuple[str, str], PairYield]:
+        rows = self._conn.execute(
+            "SELECT subreddit, query, runs, requests, candidates, new_rows, duplicate_rows FROM query_yield"
+        ).fetchall()
+        return {(str(r["subreddit"]), str(r["query"])): PairYield(**dict(r)) for r in rows}
+
+
+# ----------------------------- Keyset paging ---------------------------
+def quote_ident(name: str) -> str:
+    return name if re.match(r"^[a-z_][a-z0-9_]*$", name) else '"' + name.replace('"', '""') + '"'
+
+
+def iter_keyset_pages(
+    client: "Client",
+    table: str,
+    *,
+    key_column: str,
+    select: str = "*",
+    page_size: int = 1000,
+    after: Optional[object] = None,
+    where_in: Optional[Tuple[str, Sequence[object]]] = None,
+    filters: Sequence[Tuple[str, str, object]] = (),
+) -> Iterable[List[Dict[str, object]]]:
+    """Yield pages of rows ordered by key_column using `key > last` instead of OFFSET."""
+    last = after
+    while True:
+        query = client.table(table).select(select).order(key_column).limit(page_size)
+        if where_in is not None:
+            query = query.in_(where_in[0], list(where_in[1]))
+        for column, op, value in filters:
+            query = query.in_(column, list(value)) if op == "in" else getattr(query, op)(column, value)
+        if last is not None:
+            query = query.gt(key_column, last)
+        rows = list(getattr(query.execute(), "data", None) or [])
+        if not rows:
+            return
+        yield rows
+        if len(rows) < page_size:
+            return
+        last = rows[-1][key_column]
+
+
+# ----------------------------- Payload hash index ----------------------
+INTEGER_TYPES = ("smallint", "integer", "bigint")
+
+
+FLOAT_TYPES = ("real", "double precision", "numeric")
+
+
+TIMESTAMP_TYPES = ("timestamp with time zone", "timestamp without time zone", "timestamptz", "timestamp")
+
+
+TEXT_TYPES = ("text", "character varying", "character", "varchar")
+
+
+def coerce_to_column(value: object, data_type: Optional[str]) -> object:
+    """`value` as a column of `data_type` holds it, so payloads and rows read back compare equal."""
+    if value is None or not data_type:
+        return value
+    kind = data_type.lower()
+    try:
+        if kind in INTEGER_TYPES:
+            if isinstance(value, str):
+                return int(float(value)) if any(ch in value for ch in ".eE") else int(value)
+            return int(value)  # type: ignore[call-overload]
+        if kind in FLOAT_TYPES:
+            return float(value)  # type: ignore[arg-type]
+        if kind == "boolean":
+            return value.strip().lower() in ("t", "true", "1", "yes", "on") if isinstance(value, str) else bool(value)
+        if kind in TIMESTAMP_TYPES:
+            if isinstance(value, (int, float)) and not isinstance(value, bool):
+                moment = datetime.fromtimestamp(value, timezone.utc)
+            else:
+                moment = datetime.fromisoformat(str(value).replace("Z", "+00:00"))
+            if moment.tzinfo is None:
+                moment = moment.replace(tzinfo=timezone.utc)
+            return moment.astimezone(timezone.utc).isoformat()
+        if kind in ("json", "jsonb"):
+            return json.loads(value) if isinstance(value, str) else value
+        if kind in TEXT_TYPES and not isinstance(value, str):
+            return str(value)
+    except (TypeError, ValueError, OverflowError):
+        return value
+    return value
+
+
+def normalize_row(row: Dict[str, object], discovery: DiscoveryResult, columns: Optional[Sequence[str]] = None) -> Dict[str, object]:
+    """Project `row` onto `columns` (default: its own keys) and coerce each value to its column's type."""
+    types = discovery.columns
+    return {
+        c: coerce_to_column(row.get(c), types[c].data_type if c in types else None)
+        for c in (row.keys() if columns is None else columns)
+    }
+
+
+def _canonical(value: object) -> object:
+    if value is None or isinstance(value, (str, bool, int)):
+        return value
+    if isinstance(value, float):
+        return value if math.isfinite(value) else repr(value)
+    if isinstance(value, datetime):
+        return (value.astimezone(timezone.utc) if value.tzinfo else value).isoformat()
+    if isinstance(value, date):
+        return value.isoformat()
+    if isinstance(value, dict):
+        return {str(k): _canonical(v) for k, v in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [_canonical(v) for v in value]
+    return str(value)
+
+
+def canonical_json(obj: object) -> bytes:
+    """Stable encoding for digests: stdlib json with sorted keys, whatever transport codec is installed."""
+    return json.dumps(_canonical(obj), sort_keys=True, separators=(",", ":"), ensure_ascii=False, allow_nan=False).encode("utf-8")
+
+
+def payload_digest(payload: Dict[str, object]) -> str:
+    return hashlib.blake2b(canonical_json(payload), digest_size=16).hexdigest()
+
+
+class PayloadHashIndex:
+    """Conflict key -> digest of the payload last written, persisted in a local SQLite file."""
+
+    LOOKUP_CHUNK = 500
+
+    def __init__(self, path: str) -> None:
+        self.path = path
+        self._conn = open_sqlite(path)
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS payload_hashes (
+                table_name TEXT NOT NULL,
+                conflict_key TEXT NOT NULL,
+                digest TEXT NOT NULL,
+                PRIMARY KEY (table_name, conflict_key)
+            ) WITHOUT ROWID
+            """
+        )
+        self.hits = 0
+        self.misses = 0
+
+    def close(self) -> None:
+        self._conn.close()
+
+    @staticmethod
+    def conflict_key(row: Dict[str, object], columns: Sequence[str]) -> str:
+        return json.dumps([row.get(c) for c in columns], separators=(",", ":"), default=str)
+
+    @staticmethod
+    def keyed(row: Dict[str, object], discovery: DiscoveryResult) -> Tuple[str, str]:
+        """(conflict key, digest) of a payload or a stored row, normalized so the two compare equal."""
+        columns = sorted({c for c in discovery.column_mapping.values() if c} | set(discovery.on_conflict_columns))
+        normalized = normalize_row(row, discovery, columns)
+        return PayloadHashIndex.conflict_key(normalized, discovery.on_conflict_columns), payload_digest(normalized)
+
+    def filter_changed(
+        self, discovery: DiscoveryResult, payloads: Sequence[Dict[str, object]]
+    ) -> Tuple[List[Dict[str, object]], List[Tuple[str, str]]]:
+        """Return (payloads that differ from the last write, (key, digest) pairs to record once written)."""
+        table = discovery.table_name
+        keyed = [(*self.keyed(p, discovery), p) for p in payloads]
+        known: Dict[str, str] = {}
+        keys = list(dict.fromkeys(key for key, _, _ in keyed))
+        for start in range(0, len(keys), self.LOOKUP_CHUNK):
+            chunk = keys[start : start + self.LOOKUP_CHUNK]
+            rows = self._conn.execute(
+                f"SELECT conflict_key, digest FROM payload_hashes WHERE table_name = ? AND conflict_key IN ({','.join('?' * len(chunk))})",
+                (table, *chunk),
+            )
+            known.update((str(r["conflict_key"]), str(r["digest"])) for r in rows)
+        changed: List[Dict[str, object]] = []
+        pending: List[Tuple[str, str]] = []
+        for key, digest, payload in keyed:
+            if known.get(key) == digest:
+                self.hits += 1
+                continue
+            self.misses += 1
+            changed.append(payload)
+            pending.append((key, digest))
+        return changed, pending
+
+    def record(self, table: str, pending: Sequence[Tuple[str, str]]) -> None:
+        self._conn.execute("BEGIN")
+        self._conn.executemany(
+            """
+            INSERT INTO payload_hashes (table_name, conflict_key, digest) VALUES (?, ?, ?)
+            ON CONFLICT (table_name, conflict_key) DO UPDATE SET digest = excluded.digest
+            """,
+            [(table, key, digest) for key, digest in pending],
+        )
+        self._conn.execute("COMMIT")
+
+    def rebuild(self, client: "Client", discovery: DiscoveryResult, *, page_size: int = 1000) -> int:
+        """Replace this table's entries with digests of the rows currently stored, paging by primary key."""
+        pk = discovery.primary_key_columns
+        if len(pk) != 1:
+            raise RuntimeError("Rebuilding the hash index pages by primary key and needs a single-column primary key.")
+        columns = list(dict.fromkeys(c for c in discovery.column_mapping.values() if c))
+        select = ",".join(dict.fromkeys([pk[0], *columns, *discovery.on_conflict_columns]))
+        table = discovery.table_name
+        self._conn.execute("DELETE FROM payload_hashes WHERE table_name = ?", (table,))
+        total = 0
+        for rows in iter_keyset_pages(client, table, key_column=pk[0], select=select, page_size=page_size):
+            self.record(table, [self.keyed(row, discovery) for row in rows])
+            total += len(rows)
+        return total
+
+    def log_report(self, log: logging.Logger) -> None:
+        looked_up = self.hits + self.misses
+        log.info(
+            "[HashIndex] unchanged_skipped=%d written=%d skip_rate=%.1f%%",
+            self.hits,
+            self.misses,
+            self.hits / looked_up * 100 if looked_up else 0.0,
+        )
+
+
+# ----------------------------- Local mirror ----------------------------
+SQLITE_TYPES = {
+    "smallint": "INTEGER",
+    "integer": "INTEGER",
+    "bigint": "INTEGER",
+    "boolean": "INTEGER",
+    "real": "REAL",
+    "double precision": "REAL",
+    "numeric": "REAL",
+}
+
+
+# Sync cursors, best first. Update-time columns move whenever a row is edited;
+# insert-time columns (and an integer primary key) only see new rows. The
+# created_utc field is the Reddit post's time, not the row's, so it never is one:
+# backfills and dump reprocessing insert rows for old posts.
+MIRROR_UPDATE_COLUMNS = ("updated_at", "modified_at")
+
+
+MIRROR_INSERT_COLUMNS = ("inserted_at", "created_at")
+
+
+MIRROR_KEY_TYPES = ("smallint", "integer", "bigint")
+
+
+MIRROR_LOOKUP_CHUNK = 500  # keys per local IN (...) lookup, under SQLite's variable limit
+
+
+def mirror_cursor_floor(cursor: object, lookback: float) -> object:
+    """The cursor moved back by `lookback` seconds; epoch numbers and ISO timestamps are understood."""
+    if not lookback or cursor is None:
+        return cursor
+    if isinstance(cursor, (int, float)) and not isinstance(cursor, bool):
+        return type(cursor)(cursor - lookback)
+    try:
+        return (datetime.fromisoformat(str(cursor)) - timedelta(seconds=lookback)).isoformat()
+    except ValueError:
+        return cursor
+
+
+@dataclass
+class MirrorStats:
+    full: bool = False
+    pages: int = 0
+    fetched: int = 0
+    inserted: int = 0
+    changed: int = 0
+    unchanged: int = 0
+    deleted: int = 0
+    cursor: Optional[object] = None
+
+
+class TableMirror:
+    """Local SQLite copy of the moments table, so analytics never query production."""
+
+    def __init__(self, path: str, discovery: DiscoveryResult) -> None:
+        if len(discovery.primary_key_columns) != 1:
+            raise RuntimeError("The mirror pages by primary key and needs a single-column primary key.")
+        self.path = path
+        self.discovery = discovery
+        self.table = discovery.table_name
+        self.key = discovery.primary_key_columns[0]
+        self.columns = list(discovery.columns)
+        reddit_time = discovery.column_mapping.get("created_utc")
+        update_column = next((c for c in MIRROR_UPDATE_COLUMNS if c in discovery.columns), None)
+        insert_column = next((c for c in MIRROR_INSERT_COLUMNS if c in discovery.columns and c != reddit_time), None)
+        self.tracks_edits = update_column is not None
+        self.cursor_column: Optional[str] = update_column or insert_column
+        if self.cursor_column is None and (discovery.columns[self.key].data_type or "") in MIRROR_KEY_TYPES:
+            self.cursor_column = self.key
+        self.last: Optional[MirrorStats] = None
+        self._conn = open_sqlite(path)
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS mirror_meta (
+                table_name TEXT PRIMARY KEY,
+                key_column TEXT NOT NULL,
+                cursor_column TEXT NOT NULL,
+                cursor TEXT,
+                column_mapping TEXT NOT NULL,
+                synced_at REAL NOT NULL,
+                rows INTEGER NOT NULL,
+                full_synced_at REAL
+            )
+            """
+        )
+        columns = ", ".join(
+            f"{quote_ident(c)} {SQLITE_TYPES.get(info.data_type or '', 'TEXT')}" for c, info in discovery.columns.items()
+        )
+        self._conn.execute(
+            f"CREATE TABLE IF NOT EXISTS {quote_ident(self.table)} ({columns}, "
+            f"_digest TEXT NOT NULL, _mirrored_at REAL NOT NULL, _synced_at REAL NOT NULL, PRIMARY KEY ({quote_ident(self.key)}))"
+        )
+        # Columns added upstream since the mirror was created.
+        existing = {r["name"] for r in self._conn.execute(f"PRAGMA table_info({quote_ident(self.table)})")}
+        for c, info in discovery.columns.items():
+            if c not in existing:
+                self._conn.execute(
+                    f"ALTER TABLE {quote_ident(self.table)} ADD COLUMN {quote_ident(c)} {SQLITE_TYPES.get(info.data_type or '', 'TEXT')}"
+                )
+        self._conn.execute(
+            f"CREATE INDEX IF NOT EXISTS {quote_ident(self.table + '_mirrored_at_idx')} ON {quote_ident(self.table)} (_mirrored_at)"
+        )
+
+    def close(self) -> None:
+        self._conn.close()
+
+    def meta(self) -> Optional[Dict[str, Any]]:
+        row = self._conn.execute("SELECT * FROM mirror_meta WHERE table_name = ?", (self.table,)).fetchone()
+        return dict(row) if row is not None else None
+
+    def sync(self, client: "Client", *, page_size: int = 1000, full: bool = False, lookback: float = 0.0, now: Optional[float] = None) -> MirrorStats:
+        now = time.time() if now is None else now
+        meta = self.meta()
+        cursor = json.loads(meta["cursor"]) if meta and meta["cursor"] is not None else None
+        if meta is not None and meta["cursor_column"] != (self.cursor_column or ""):
+            cursor = None  # the table grew a better cursor column: start over on it
+        stats = MirrorStats(full=full or cursor is None or self.cursor_column is None, cursor=cursor)
+        filters: List[Tuple[str, str, object]] = []
+        if not stats.full:
+            floor = cursor if self.cursor_column == self.key else mirror_cursor_floor(cursor, lookback)
+            filters.append((self.cursor_column, "gte", floor))
+        for page in iter_keyset_pages(
+            client, self.table, key_column=self.key, select=",".join(self.columns), page_size=page_size, filters=filters
+        ):
+            stats.pages += 1
+            stats.fetched += len(page)
+            self._apply(page, now, stats)
+            values = [row.get(self.cursor_column) for row in page if row.get(self.cursor_column) is not None] if self.cursor_column else []
+            if values:
+                stats.cursor = max(values) if stats.cursor is None else max(stats.cursor, max(values))
+        if stats.full:
+            stats.deleted = self._conn.execute(f"DELETE FROM {quote_ident(self.table)} WHERE _synced_at != ?", (now,)).rowcount
+        rows = self._conn.execute(f"SELECT COUNT(*) FROM {quote_ident(self.table)}").fetchone()[0]
+        self._conn.execute(
+            "INSERT INTO mirror_meta (table_name, key_column, cursor_column, cursor, column_mapping, synced_at, rows, full_synced_at) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?, ?) ON CONFLICT (table_name) DO UPDATE SET key_column = excluded.key_column, "
+            "cursor_column = excluded.cursor_column, cursor = excluded.cursor, column_mapping = excluded.column_mapping, "
+            "synced_at = excluded.synced_at, rows = excluded.rows, "
+            "full_synced_at = COALESCE(excluded.full_synced_at, mirror_meta.full_synced_at)",
+            (
+                self.table,
+                self.key,
+                self.cursor_column or "",
+                json.dumps(stats.cursor) if stats.cursor is not None else None,
+                json.dumps(self.discovery.column_mapping),
+                now,
+                rows,
+                now if stats.full else None,
+            ),
+        )
+        self.last = stats
+        return stats
+
+    def _apply(self, page: List[Dict[str, object]], now: float, stats: MirrorStats) -> None:
+        keys = [row[self.key] for row in page]
+        stored: Dict[object, str] = {}
+        for start in range(0, len(keys), MIRROR_LOOKUP_CHUNK):
+            chunk = keys[start : start + MIRROR_LOOKUP_CHUNK]
+            stored.update(
+                (r[0], r[1])
+                for r in self._conn.execute(
+                    f"SELECT {quote_ident(self.key)}, _digest FROM {quote_ident(self.table)} "
+                    f"WHERE {quote_ident(self.key)} IN ({','.join('?' * len(chunk))})",
+                    chunk,
+                )
+            )
+        upserts: List[List[object]] = []
+        unchanged: List[object] = []
+        for row in page:
+            digest = payload_digest(row)
+            previous = stored.get(row[self.key])
+            if previous == digest:
+                unchanged.append(row[self.key])
+                continue
+            if previous is None:
+                stats.inserted += 1
+            else:
+                stats.changed += 1
+            values = [row.get(c) for c in self.columns]
+            upserts.append([json.dumps(v) if isinstance(v, (dict, list)) else v for v in values] + [digest, now, now])
+        stats.unchanged += len(unchanged)
+
+        names = [*map(quote_ident, self.columns), "_digest", "_mirrored_at", "_synced_at"]
+        self._conn.execute("BEGIN")
+        try:
+            self._conn.executemany(
+                f"INSERT INTO {quote_ident(self.table)} ({', '.join(names)}) VALUES ({', '.join('?' * len(names))}) "
+                f"ON CONFLICT ({quote_ident(self.key)}) DO UPDATE SET "
+                + ", ".join(f"{n} = excluded.{n}" for n in names if n != quote_ident(self.key)),
+                upserts,
+            )
+            self._conn.executemany(
+                f"UPDATE {quote_ident(self.table)} SET _synced_at = ? WHERE {quote_ident(self.key)} = ?", [(now, k) for k in unchanged]
+            )
+            self._conn.execute("COMMIT")
+        except Exception:
+            self._conn.execute("ROLLBACK")
+            raise
+
+    def log_report(self, log: logging.Logger) -> None:
+        stats, meta = self.last, self.meta() or {}
+        if stats is None:
+            return
+        log.info(
+            "[Mirror] %s sync of %s into %s: pages=%d fetched=%d inserted=%d changed=%d unchanged=%d deleted=%d rows=%s cursor=%s=%s",
+            "full" if stats.full else "incremental",
+            self.discovery.full_table_name,
+            self.path,
+            stats.pages,
+            stats.fetched,
+            stats.inserted,
+            stats.changed,
+            stats.unchanged,
+            stats.deleted,
+            meta.get("rows"),
+            self.cursor_column,
+            stats.cursor,
+        )
+        if self.cursor_column is None:
+            log.warning("[Mirror] %s has no update-time, insert-time or integer key column; every sync is a full sync", self.table)
+        elif not self.tracks_edits:
+            log.warning(
+                "[Mirror] %s has no updated_at column: incremental syncs on %s see new rows only; in-place edits "
+                "(--mode moderate status changes, score refreshes) arrive with --mirror-full (last full sync %s)",
+                self.table,
+                self.cursor_column,
+                datetime.fromtimestamp(meta["full_synced_at"], timezone.utc).isoformat() if meta.get("full_synced_at") else "never",
+            )
+
+
+# ----------------------------- Title clustering ------------------------
+TITLE_MAX_CHARS = 300  # Reddit's title limit
+
+
+# Question words, season markers and thread boilerplate that normalize_show_title
+# leaves around a show name ("Is Breaking Bad", "Breaking Bad Season 2",
+# "Rewatching Breaking Bad For The Third Time"). Words that commonly start or
+# end real show names (How I Met Your Mother, Will & Grace, That 70s Show,
+# Happily Ever After) are left out; the core is only a matching key anyway.
+TITLE_NOISE_PREFIX = re.compile(
+    r"^(?:(?:is|are|does|should|did|so|ok|okay|honestly|what episode|just started|started|rewatching|watching) )+",
+    re.I,
+)
+
+
+TITLE_NOISE_SUFFIX = re.compile(
+    r"(?: (?:season|seasons|series|tv|anime|s\d{1,2}(?:e\d{1,3})?|after\s+season\s+\d{1,2}|season\s+\d{1,2}|part\s+\d"
+    r"|-\s+it|really|actually|at\s+all|worth\s+(?:it|watching)|appreciation|thread|discussion|for\s+the\s+\w+\s+time))+$",
+    re.I,
+)
+
+
+TITLE_BLOCK_STOPWORDS = frozenset({"the", "and", "of", "a", "an", "in", "on", "to", "my", "for"})
+
+
+def title_core(title: str) -> str:
+    """Show name with question words and season markers trimmed, used only to block and match titles."""
+    collapsed = " ".join(title[:TITLE_MAX_CHARS].split())
+    core = TITLE_NOISE_SUFFIX.sub("", TITLE_NOISE_PREFIX.sub("", collapsed)).strip(" -:.,")
+    return core or title
+
+
+def title_block_keys(core: str) -> List[str]:
+    """Blocking keys: every significant token plus the first three letters, so typos in one word still share a block."""
+    lowered = core.lower()
+    tokens = [t for t in re.findall(r"[a-z0-9]+", lowered) if len(t) >= 3 and t not in TITLE_BLOCK_STOPWORDS]
+    compact = re.sub(r"[^a-z0-9]", "", lowered)
+    return list(dict.fromkeys([*(f"t:{t}" for t in tokens), f"p:{compact[:3]}"]))
+
+
+class TitleAliasStore:
+    """Maps normalized titles to one canonical title per cluster, persisted in a local SQLite file."""
+
+    MAX_BLOCK = 2_000  # blocks this large (very common tokens) are skipped unless nothing else matches
+
+    def __init__(self, path: str, *, threshold: float = 90.0, persist: bool = True) -> None:
+        self.path = path
+        self.threshold = threshold
+        self.persist = persist
+        self._conn = open_sqlite(path)
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS title_aliases (alias TEXT PRIMARY KEY, canonical TEXT NOT NULL) WITHOUT ROWID"
+        )
+        self.aliases: Dict[str, str] = {}
+        self._canonical_by_core: Dict[str, str] = {}  # lowered core -> canonical
+        self._cores: Dict[str, str] = {}  # canonical -> lowered core
+        self._blocks: Dict[str, List[str]] = {}
+        self._pending: List[Tuple[str, str]] = []
+        self.lookups = 0
+        self.new_aliases = 0
+        self.new_canonicals = 0
+        self.comparisons = 0
+        for row in self._conn.execute("SELECT alias, canonical FROM title_aliases"):
+            self.aliases[row["alias"]] = row["canonical"]
+            if row["alias"] == row["canonical"]:
+                self._index(row["canonical"])
+
+    def _index(self, canonical: str) -> None:
+        core = title_core(canonical).lower()
+        self._cores[canonical] = core
+        self._canonical_by_core.setdefault(core, canonical)
+        for key in title_block_keys(core):
+            self._blocks.setdefault(key, []).append(canonical)
+
+    def resolve(self, title: str) -> str:
+        self.lookups += 1
+        known = self.aliases.get(title)
+        if known is not None:
+            return known
+        if not title:
+            return title
+        canonical = self._match(title_core(title))
+        if canonical is None:
+            canonical = title
+            self._index(canonical)
+            self._remember(canonical, canonical)
+            self.new_canonicals += 1
+        if canonical != title:
+            self._remember(title, canonical)
+            self.new_aliases += 1
+        return canonical
+
+    def lookup(self, title: str) -> str:
+        """The canonical `title` would resolve to, without adding it to the map."""
+        known = self.aliases.get(title)
+        if known is not None or not title:
+            return known or title
+        return self._match(title_core(title)) or title
+
+    def _match(self, core: str) -> Optional[str]:
+        lowered = core.lower()
+        exact = self._canonical_by_core.get(lowered)
+        if exact is not None:
+            return exact
+        blocks = [self._blocks.get(key, []) for key in title_block_keys(lowered)]
+        usable = [b for b in blocks if len(b) <= self.MAX_BLOCK] or blocks
+        choices = {c: self._cores[c] for block in usable for c in block}
+        if not choices:
+            return None
+        from rapidfuzz import fuzz, process as rf_process
+
+        self.comparisons += len(choices)
+        # Mapping choices score the cores and hand back the canonical as the key.
+        best = rf_process.extractOne(lowered, choices, scorer=fuzz.ratio, score_cutoff=self.threshold)
+        return best[2] if best else None
+
+    def _remember(self, alias: str, canonical: str) -> None:
+        self.aliases[alias] = canonical
+        self._pending.append((alias, canonical))
+        if len(self._pending) >= 500:
+            self.flush()
+
+    def members(self, canonical: str) -> List[str]:
+        """The canonical and every alias known to resolve to it."""
+        return [canonical, *sorted(alias for alias, target in self.aliases.items() if target == canonical and alias != canonical)]
+
+    def cluster(self, titles: Iterable[str]) -> Dict[str, str]:
+        """Resolve a batch in arrival order, as the writer does; maps each distinct title to its canonical."""
+        return {title: self.resolve(title) for title in titles}
+
+    def flush(self) -> None:
+        if not self.persist:
+            self._pending = []
+        if not self._pending:
+            return
+        self._conn.execute("BEGIN")
+        self._conn.executemany(
+            "INSERT INTO title_aliases (alias, canonical) VALUES (?, ?) ON CONFLICT (alias) DO NOTHING", self._pending
+        )
+        self._conn.execute("COMMIT")
+        self._pending = []
+
+    def close(self) -> None:
+        self.flush()
+        self._conn.close()
+
+    def log_report(self, log: logging.Logger) -> None:
+        log.info(
+            "[Titles] lookups=%d new_aliases=%d new_canonicals=%d fuzzy_comparisons=%d known_titles=%d",
+            self.lookups,
+            self.new_aliases,
+            self.new_canonicals,
+            self.comparisons,
+            len(self.aliases),
+        )
+
+
+# ----------------------------- Title aggregates ------------------------
+class CountHistogram:
+    """Counts per integer value: an exact quantile summary that merges by adding counts."""
+
+    __slots__ = ("counts",)
+
+    def __init__(self, counts: Optional[Dict[int, int]] = None) -> None:
+        self.counts: Dict[int, int] = dict(counts or {})
+
+    @property
+    def total(self) -> int:
+        return sum(self.counts.values())
+
+    def add(self, value: int, n: int = 1) -> None:
+        self.counts[value] = self.counts.get(value, 0) + n
+
+    def merge(self, other: "CountHistogram") -> None:
+        for value, n in other.counts.items():
+            self.add(value, n)
+
+    def _value_at(self, index: int) -> int:
+        """Value at a 0-based index of the sorted observations."""
+        seen = 0
+        for value in sorted(self.counts):
+            seen += self.counts[value]
+            if index < seen:
+                return value
+        raise IndexError(index)
+
+    def quantile(self, q: float) -> Optional[float]:
+        """Interpolated quantile, matching Postgres percentile_cont."""
+        total = self.total
+        if not total:
+            return None
+        position = (total - 1) * q
+        lower = int(position)
+        low = self._value_at(lower)
+        high = self._value_at(min(lower + 1, total - 1))
+        return low + (high - low) * (position - lower)
+
+    def quantile_disc(self, q: float) -> Optional[int]:
+        """First observed value whose cumulative share reaches q, matching percentile_disc."""
+        total = self.total
+        if not total:
+            return None
+        return self._value_at(max(math.ceil(q * total) - 1, 0))
+
+    def mode(self) -> Optional[int]:
+        return min(self.counts, key=lambda v: (-self.counts[v], v)) if self.counts else None
+
+    def to_json(self) -> Dict[str, int]:
+        return {str(value): self.counts[value] for value in sorted(self.counts)}
+
+    @classmethod
+    def from_json(cls, data: Dict[str, int]) -> "CountHistogram":
+        return cls({int(value): int(n) for value, n in data.items()})
+
+
+def episode_position(season: Optional[int], episode: int) -> int:
+    """Sortable integer for an episode; season-less mentions sort as season 0."""
+    return (season or 0) * 1000 + episode
+
+
+def episode_label(position: Optional[int]) -> Optional[str]:
+    if position is None:
+        return None
+    season, episode = divmod(position, 1000)
+    return f"S{season}E{episode}" if season else f"E{episode}"
+
+
+@dataclass
+class TitleAggregate:
+    mentions: int = 0
+    comment_mentions: int = 0
+    post_mentions: int = 0
+    episodes: CountHistogram = field(default_factory=CountHistogram)
+    minutes: CountHistogram = field(default_factory=CountHistogram)
+
+    def add(self, kind: str, season: Optional[int], episode: Optional[int], minute: Optional[int]) -> None:
+        self.mentions += 1
+        if kind == "comment":
+            self.comment_mentions += 1
+        else:
+            self.post_mentions += 1
+        if episode is not None:
+            self.episodes.add(episode_position(season, episode))
+        if minute is not None:
+            self.minutes.add(minute)
+
+    def metrics(self, title: str) -> Dict[str, object]:
+        """Row for the Reddit metrics table."""
+        p25, p75 = self.minutes.quantile(0.25), self.minutes.quantile(0.75)
+        return {
+            "content_title": title,
+            "mentions": self.mentions,
+            "comment_mentions": self.comment_mentions,
+            "post_mentions": self.post_mentions,
+            "episode_p25": episode_label(self.episodes.quantile_disc(0.25)),
+            "episode_median": episode_label(self.episodes.quantile_disc(0.5)),
+            "episode_p75": episode_label(self.episodes.quantile_disc(0.75)),
+            "peak_episode": episode_label(self.episodes.mode()),
+            "minute_median": self.minutes.quantile(0.5),
+            "minute_iqr": None if p25 is None or p75 is None else p75 - p25,
+            "episode_histogram": {episode_label(int(k)): n for k, n in self.episodes.to_json().items()},
+            "minute_histogram": self.minutes.to_json(),
+            "updated_at": datetime.now(timezone.utc).isoformat(),
+        }
+
+
+class TitleAggregateStore:
+    """Per-title "gets good" aggregates kept up to date while crawling, in a local SQLite file."""
+
+    def __init__(self, path: str) -> None:
+        self.path = path
+        self._conn = open_sqlite(path)
+        self._conn.executescript(
+            """
+            CREATE TABLE IF NOT EXISTS title_moments (
+                moment_key TEXT PRIMARY KEY,
+                content_title TEXT NOT NULL,
+                kind TEXT NOT NULL,
+                season INTEGER,
+                episode INTEGER,
+                minute INTEGER
+            ) WITHOUT ROWID;
+            CREATE TABLE IF NOT EXISTS title_aggregates (
+                content_title TEXT PRIMARY KEY,
+                mentions INTEGER NOT NULL,
+                comment_mentions INTEGER NOT NULL,
+                post_mentions INTEGER NOT NULL,
+                episodes TEXT NOT NULL,
+                minutes TEXT NOT NULL,
+                dirty INTEGER NOT NULL DEFAULT 1
+            );
+            """
+        )
+        self.observed = 0
+        self.duplicates = 0
+
+    def close(self) -> None:
+        self._conn.close()
+
+    @staticmethod
+    def moment_key(candidate: CandidateMoment) -> str:
+        return json.dumps(
+            [candidate.source_id, candidate.content_title, candidate.season, candidate.episode, candidate.minute],
+            separators=(",", ":"),
+        )
+
+    def observe(self, candidates: Sequence[CandidateMoment]) -> int:
+        """Fold in moments not seen before; returns how many were new."""
+        rows = [
+            (self.moment_key(c), c.content_title, c.source_kind, c.season, c.episode, c.minute)
+            for c in candidates
+            if c.content_title
+        ]
+        return self._apply(rows)
+
+    def merge_from(self, path: str) -> int:
+        """Fold in another store's moments (e.g. another worker's file); returns how many were new."""
+        other = open_sqlite(path)
+        try:
+            rows = [tuple(r) for r in other.execute("SELECT moment_key, content_title, kind, season, episode, minute FROM title_moments")]
+        finally:
+            other.close()
+        return self._apply(rows)
+
+    def _apply(self, rows: Sequence[Tuple]) -> int:
+        touched: Dict[str, TitleAggregate] = {}
+        self._conn.execute("BEGIN")
+        try:
+            for key, title, kind, season, episode, minute in rows:
+                cursor = self._conn.execute(
+                    "INSERT OR IGNORE INTO title_moments VALUES (?, ?, ?, ?, ?, ?)", (key, title, kind, season, episode, minute)
+                )
+                if not cursor.rowcount:
+                    self.duplicates += 1
+                    continue
+                touched.setdefault(title, TitleAggregate()).add(kind, season, episode, minute)
+            for title, delta in touched.items():
+                current = self._load(title)
+                current.mentions += delta.mentions
+                current.comment_mentions += delta.comment_mentions
+                current.post_mentions += delta.post_mentions
+                current.episodes.merge(delta.episodes)
+                current.minutes.merge(delta.minutes)
+                self._conn.execute(
+                    """
+                    INSERT INTO title_aggregates (content_title, mentions, comment_mentions, post_mentions, episodes, minutes, dirty)
+                    VALUES (?, ?, ?, ?, ?, ?, 1)
+                    ON CONFLICT (content_title) DO UPDATE SET
+                        mentions = excluded.mentions,
+                        comment_mentions = excluded.comment_mentions,
+                        post_mentions = excluded.post_mentions,
+                        episodes = excluded.episodes,
+                        minutes = excluded.minutes,
+                        dirty = 1
+                    """,
+                    (
+                        title,
+                        current.mentions,
+                        current.comment_mentions,
+                        current.post_mentions,
+                        json.dumps(current.episodes.to_json()),
+                        json.dumps(current.minutes.to_json()),
+                    ),
+                )
+            self._conn.execute("COMMIT")
+        except Exception:
+            self._conn.execute("ROLLBACK")
+            raise
+        added = sum(a.mentions for a in touched.values())
+        self.observed += added
+        return added
+
+    def _load(self, title: str) -> TitleAggregate:
+        row = self._conn.execute("SELECT * FROM title_aggregates WHERE content_title = ?", (title,)).fetchone()
+        if row is None:
+            return TitleAggregate()
+        return TitleAggregate(
+            mentions=row["mentions"],
+            comment_mentions=row["comment_mentions"],
+            post_mentions=row["post_mentions"],
+            episodes=CountHistogram.from_json(json.loads(row["episodes"])),
+            minutes=CountHistogram.from_json(json.loads(row["minutes"])),
+        )
+
+    def get(self, title: str) -> TitleAggregate:
+        return self._load(title)
+
+    def dirty_titles(self) -> List[str]:
+        return [r["content_title"] for r in self._conn.execute("SELECT content_title FROM title_aggregates WHERE dirty = 1 ORDER BY content_title")]
+
+    def publish(self, client: "Client", table: str, *, batch_size: int = 500) -> int:
+        """Upsert metrics for dirty titles only; a failed batch stays dirty for the next run."""
+        titles = self.dirty_titles()
+        published = 0
+        for start in range(0, len(titles), batch_size):
+            chunk = titles[start : start + batch_size]
+            rows = [self._load(title).metrics(title) for title in chunk]
+            client.table(table).upsert(rows, on_conflict="content_title").execute()
+            self._conn.executemany("UPDATE title_aggregates SET dirty = 0 WHERE content_title = ?", [(t,) for t in chunk])
+            published += len(chunk)
+        return published
+
+    def log_report(self, log: logging.Logger) -> None:
+        log.info(
+            "[Aggregates] new_moments=%d duplicates=%d dirty_titles=%d",
+            self.observed,
+            self.duplicates,
+            len(self.dirty_titles()),
+        )
+
+
+# ----------------------------- Checkpoints -----------------------------
+@dataclass(frozen=True)
+class StreamCheckpoint:
+    created_utc: float
+    seen_ids: Tuple[str, ...] = ()
+
+    def covers(self, created_utc: float, item_id: str) -> bool:
+        return created_utc < self.created_utc or (created_utc == self.created_utc and item_id in self.seen_ids)
+
+    def advanced(self, created_utc: float, item_id: str) -> "StreamCheckpoint":
+        if created_utc > self.created_utc:
+            return StreamCheckpoint(created_utc, (item_id,))
+        if created_utc == self.created_utc and item_id not in self.seen_ids:
+            return StreamCheckpoint(created_utc, (*self.seen_ids, item_id))
+        return self
+
+
+class CheckpointStore:
+    """Last flushed position per stream, and last key done per keyset job, kept in a local SQLite file."""
+
+    def __init__(self, path: str) -> None:
+        self._conn = open_sqlite(path)
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS stream_checkpoints (stream TEXT PRIMARY KEY, created_utc REAL NOT NULL, seen_ids TEXT NOT NULL)"
+        )
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS keyset_checkpoints (job TEXT PRIMARY KEY, last_key TEXT NOT NULL, saved_at REAL NOT NULL)"
+        )
+
+    def close(self) -> None:
+        self._conn.close()
+
+    def get(self, stream: str) -> Optional[StreamCheckpoint]:
+        row = self._conn.execute("SELECT created_utc, seen_ids FROM stream_checkpoints WHERE stream = ?", (stream,)).fetchone()
+        if row is None:
+            return None
+        return StreamCheckpoint(float(row["created_utc"]), tuple(json.loads(row["seen_ids"])))
+
+    def streams(self, prefix: str) -> List[str]:
+        """Stored stream names starting with prefix, most recently advanced first."""
+        rows = self._conn.execute(
+            "SELECT stream FROM stream_checkpoints WHERE substr(stream, 1, ?) = ? ORDER BY created_utc DESC", (len(prefix), prefix)
+        )
+        return [r["stream"] for r in rows]
+
+    def save(self, stream: str, checkpoint: StreamCheckpoint) -> None:
+        self._conn.execute(
+            "INSERT INTO stream_checkpoints (stream, created_utc, seen_ids) VALUES (?, ?, ?) "
+            "ON CONFLICT (stream) DO UPDATE SET created_utc = excluded.created_utc, seen_ids = excluded.seen_ids",
+            (stream, checkpoint.created_utc, json.dumps(list(checkpoint.seen_ids))),
+        )
+
+    def last_key(self, job: str) -> Optional[object]:
+        """The last primary key a keyset job finished, or None when it has none saved."""
+        row = self._conn.execute("SELECT last_key FROM keyset_checkpoints WHERE job = ?", (job,)).fetchone()
+        return None if row is None else json.loads(row["last_key"])
+
+    def save_last_key(self, job: str, key: object) -> None:
+        self._conn.execute(
+            "INSERT INTO keyset_checkpoints (job, last_key, saved_at) VALUES (?, ?, ?) "
+            "ON CONFLICT (job) DO UPDATE SET last_key = excluded.last_key, saved_at = excluded.saved_at",
+            (job, json.dumps(key), time.time()),
+        )
+
+    def clear_last_key(self, job: str) -> None:
+        self._conn.execute("DELETE FROM keyset_checkpoints WHERE job = ?", (job,))
+
+
+# ----------------------------- Dump index ------------------------------
+# Byte-level probes used while indexing. Quotes inside JSON strings are escaped,
+# so these only hit real keys ("subreddit_id" never matches); a line with more
+# than one hit (a crosspost carries its parent's fields) is parsed instead.
+DUMP_SUBREDDIT_RX = re.compile(rb'"subreddit"\s*:\s*"([^"\\]*)"')
+
+
+DUMP_CREATED_RX = re.compile(rb'"created_utc"\s*:\s*"?(\d+)')
+
+
+DUMP_MONTH_RX = re.compile(r"^\d{4}-(0[1-9]|1[0-2])$")
+
+
+DUMP_INDEX_SUFFIX = ".idx"
+
+
+DUMP_STRIDE = 1000
+
+
+def dump_subreddit(name: str) -> str:
+    """Partition key for a subreddit: lowercased, without the r/ prefix."""
+    return name.replace("r/", "").lower()
+
+
+def dump_month(created_utc: float) -> str:
+    tm = time.gmtime(created_utc)
+    return f"{tm.tm_year:04d}-{tm.tm_mon:02d}"
+
+
+@dataclass(frozen=True)
+class DumpSlice:
+    """Byte range [start, end) of a dump that starts and ends on record boundaries."""
+
+    path: str
+    start: int
+    end: int
+    records: int  # records in the range that belong to the selected partitions
+
+
+class DumpIndex:
+    """Sidecar SQLite index (`<dump>.idx`) of an NDJSON dump: block offsets and the partitions each holds."""
+
+    def __init__(self, dump_path: str, index_path: Optional[str] = None) -> None:
+        self.dump_path = str(dump_path)
+        self.path = index_path or self.dump_path + DUMP_INDEX_SUFFIX
+        self._conn = open_sqlite(self.path)
+        self._conn.executescript(
+            """
+            CREATE TABLE IF NOT EXISTS dump_meta (key TEXT PRIMARY KEY, value TEXT NOT NULL);
+            CREATE TABLE IF NOT EXISTS dump_blocks (
+                block INTEGER PRIMARY KEY,
+                start_offset INTEGER NOT NULL,
+                end_offset INTEGER NOT NULL,
+                records INTEGER NOT NULL
+            );
+            CREATE TABLE IF NOT EXISTS dump_partitions (
+                subreddit TEXT NOT NULL,
+                month TEXT NOT NULL,
+                block INTEGER NOT NULL,
+                records INTEGER NOT NULL,
+                PRIMARY KEY (subreddit, month, block)
+            ) WITHOUT ROWID;
+            """
+        )
+
+    @classmethod
+    def open(cls, dump_path: str, index_path: Optional[str] = None, *, stride: int = DUMP_STRIDE, rebuild: bool = False) -> "DumpIndex":
+        index = cls(dump_path, index_path)
+        if rebuild or not index.is_current():
+            index.build(stride=stride)
+        return index
+
+    def close(self) -> None:
+        self._conn.close()
+
+    def meta(self) -> Dict[str, str]:
+        return {r["key"]: r["value"] for r in self._conn.execute("SELECT key, value FROM dump_meta")}
+
+    def _fingerprint(self) -> Dict[str, str]:
+        st = os.stat(self.dump_path)
+        return {"size": str(st.st_size), "mtime_ns": str(st.st_mtime_ns)}
+
+    def is_current(self) -> bool:
+        meta = self.meta()
+        return bool(meta) and all(meta.get(k) == v for k, v in self._fingerprint().items())
+
+    def build(self, *, stride: int = DUMP_STRIDE) -> int:
+        """Index the dump in one pass; returns the number of records."""
+        import mmap
+
+        fingerprint = self._fingerprint()
+        size = int(fingerprint["size"])
+        blocks: List[Tuple[int, int, int, int]] = []
+        partitions: Dict[Tuple[str, str, int], int] = {}
+        records = 0
+        with open(self.dump_path, "rb") as fh:
+            # mmap refuses empty files.
+            mm = mmap.mmap(fh.fileno(), 0, access=mmap.ACCESS_READ) if size else b""
+            try:
+                block_start = pos = in_block = 0
+                while pos < size:
+                    nl = mm.find(b"\n", pos)
+                    stop = size if nl < 0 else nl
+                    if stop > pos:
+                        key = (*self._partition(mm, pos, stop), len(blocks))
+                        partitions[key] = partitions.get(key, 0) + 1
+                        records += 1
+                        in_block += 1
+                    pos = stop + 1
+                    if in_block >= stride:
+                        blocks.append((len(blocks), block_start, min(pos, size), in_block))
+                        block_start, in_block = pos, 0
+                if in_block:
+                    blocks.append((len(blocks), block_start, size, in_block))
+            finally:
+                if size:
+                    mm.close()
+
+        self._conn.execute("BEGIN")
+        try:
+            for table in ("dump_meta", "dump_blocks", "dump_partitions"):
+                self._conn.execute(f"DELETE FROM {table}")
+            self._conn.executemany("INSERT INTO dump_blocks (block, start_offset, end_offset, records) VALUES (?, ?, ?, ?)", blocks)
+            self._conn.executemany(
+                "INSERT INTO dump_partitions (subreddit, month, block, records) VALUES (?, ?, ?, ?)",
+                [(*key, n) for key, n in partitions.items()],
+            )
+            self._conn.executemany(
+                "INSERT INTO dump_meta (key, value) VALUES (?, ?)",
+                [*fingerprint.items(), ("stride", str(stride)), ("records", str(records))],
+            )
+            self._conn.execute("COMMIT")
+        except Exception:
+            self._conn.execute("ROLLBACK")
+            raise
+        return records
+
+    @staticmethod
+    def _partition(mm, start: int, stop: int) -> Tuple[str, str]:
+        subs = DUMP_SUBREDDIT_RX.findall(mm, start, stop)
+        created = DUMP_CREATED_RX.findall(mm, start, stop)
+        if len(subs) == 1 and len(created) == 1:
+            return dump_subreddit(subs[0].decode("utf-8", "replace")), dump_month(int(created[0]))
+        try:
+            record = json.loads(mm[start:stop])
+        except ValueError:
+            return "", ""
+        if not isinstance(record, dict):
+            return "", ""
+        return dump_subreddit(str(record.get("subreddit") or "")), dump_month(int(float(record.get("created_utc") or 0)))
+
+    def partitions(self) -> List[Tuple[str, str, int]]:
+        """(subreddit, month, records) for every partition in the dump."""
+        rows = self._conn.execute(
+            "SELECT subreddit, month, SUM(records) AS records FROM dump_partitions GROUP BY subreddit, month ORDER BY subreddit, month"
+        )
+        return [(r["subreddit"], r["month"], r["records"]) for r in rows]
+
+    def slices(self, *, subreddits: Sequence[str] = (), months: Sequence[str] = (), shards: int = 1) -> List[DumpSlice]:
+        """Disjoint byte ranges covering every selected block, balanced across `shards` workers."""
+        clauses: List[str] = []
+        params: List[str] = []
+        for column, values in (("p.subreddit", [dump_subreddit(s) for s in subreddits]), ("p.month", list(months))):
+            if values:
+                clauses.append(f"{column} IN ({','.join('?' * len(values))})")
+                params.extend(values)
+        where = f"WHERE {' AND '.join(clauses)}" if clauses else ""
+        rows = self._conn.execute(
+            "SELECT b.block, b.start_offset, b.end_offset, SUM(p.records) AS records "
+            f"FROM dump_blocks b JOIN dump_partitions p ON p.block = b.block {where} "
+            "GROUP BY b.block ORDER BY b.block",
+            params,
+        ).fetchall()
+        target = max(1, math.ceil(sum(r["records"] for r in rows) / max(1, shards)))
+        slices: List[DumpSlice] = []
+        current: Optional[List[int]] = None
+        for row in rows:
+            if current is not None and (current[1] != row["start_offset"] or current[2] >= target):
+                slices.append(DumpSlice(self.dump_path, *current))
+                current = None
+            if current is None:
+                current = [row["start_offset"], row["end_offset"], row["records"]]
+            else:
+                current[1] = row["end_offset"]
+                current[2] += row["records"]
+        if current is not None:
+            slices.append(DumpSlice(self.dump_path, *current))
+        return slices
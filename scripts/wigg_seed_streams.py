@@ -0,0 +1,488 @@
+"""
+wigg_seed_streams.py
+
+Continuous and replayed candidate sources for wigg_reddit_seed.py: the
+batching CandidateBuffer, the live StreamDaemon (--mode daemon) and dump
+reprocessing over local NDJSON dumps (--mode dump).
+"""
+from __future__ import annotations
+
+import logging
+import time
+from dataclasses import dataclass, field
+from types import SimpleNamespace
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple
+
+try:
+    from scripts.wigg_reddit_seed import (
+        CandidateMoment,
+        RuleCounts,
+        RulesetEvaluator,
+        SupabaseWriter,
+        TopKRetainer,
+        UpsertResult,
+        build_candidate,
+        comment_score_bonus,
+        default_evaluator,
+        format_bytes,
+        install_codec,
+        json_codec,
+        load_ruleset,
+        logger,
+        make_codec,
+        normalize_show_title,
+        title_match_strength,
+    )
+    from scripts.wigg_seed_storage import (
+        DUMP_MONTH_RX,
+        DUMP_STRIDE,
+        CheckpointStore,
+        DumpIndex,
+        DumpSlice,
+        StreamCheckpoint,
+        dump_month,
+        dump_subreddit,
+    )
+except ModuleNotFoundError:  # run as `python wigg_reddit_seed.py` from scripts/
+    from wigg_reddit_seed import (  # type: ignore[no-redef]
+        CandidateMoment,
+        RuleCounts,
+        RulesetEvaluator,
+        SupabaseWriter,
+        TopKRetainer,
+        UpsertResult,
+        build_candidate,
+        comment_score_bonus,
+        default_evaluator,
+        format_bytes,
+        install_codec,
+        json_codec,
+        load_ruleset,
+        logger,
+        make_codec,
+        normalize_show_title,
+        title_match_strength,
+    )
+    from wigg_seed_storage import (  # type: ignore[no-redef]
+        DUMP_MONTH_RX,
+        DUMP_STRIDE,
+        CheckpointStore,
+        DumpIndex,
+        DumpSlice,
+        StreamCheckpoint,
+        dump_month,
+        dump_subreddit,
+    )
+
+
+
+# ----------------------------- Candidate buffer ------------------------
+class CandidateBuffer:
+    """Collects candidates and hands them to the writer in batches, by size or on a timer."""
+
+    def __init__(self, writer: SupabaseWriter, *, max_rows: int = 500, flush_interval: float = 30.0, clock=time.monotonic) -> None:
+        self.writer = writer
+        self.max_rows = max_rows
+        self.flush_interval = flush_interval
+        self.clock = clock
+        self.key_fields = writer.discovery.conflict_fields
+        self._rows: Dict[Tuple[object, ...], CandidateMoment] = {}
+        self._last_flush = clock()
+
+    def __len__(self) -> int:
+        return len(self._rows)
+
+    def add(self, candidate: CandidateMoment) -> None:
+        self._rows[tuple(getattr(candidate, name) for name in self.key_fields)] = candidate
+
+    def due(self) -> bool:
+        return len(self._rows) >= self.max_rows or (bool(self._rows) and self.clock() - self._last_flush >= self.flush_interval)
+
+    def flush(self) -> UpsertResult:
+        """Write the buffered batch. The buffer only empties once the write succeeds,
+        so a write that fails after its retries leaves the rows for the next flush."""
+        self._last_flush = self.clock()
+        if not self._rows:
+            return UpsertResult(inserted=0, updated=0)
+        batch = list(self._rows.values())
+        if getattr(self.writer, "top_k", 0):
+            retainer = TopKRetainer(self.writer.top_k, self.writer.retention, key_fields=self.writer.discovery.conflict_fields)
+            for candidate in batch:
+                retainer.offer(candidate)
+            batch = retainer.drain()
+        result = self.writer.upsert_candidates(batch)
+        self._rows.clear()
+        return result
+
+
+# ----------------------------- Stream daemon ---------------------------
+class StreamDaemon:
+    """Follows new submissions and comments in the target subreddits and seeds candidates continuously."""
+
+    STREAMS = ("submissions", "comments")
+
+    def __init__(
+        self,
+        reddit,
+        buffer: CandidateBuffer,
+        checkpoints: CheckpointStore,
+        subs: Sequence[str],
+        *,
+        min_title_strength: float = 0.3,
+        backfill_limit: int = 1000,
+        idle_sleep: float = 5.0,
+        rules: Optional[RulesetEvaluator] = None,
+        logger: Optional[logging.Logger] = None,
+    ) -> None:
+        self.reddit = reddit
+        self.buffer = buffer
+        self.checkpoints = checkpoints
+        self.subreddit_name = "+".join(sub.replace("r/", "") for sub in subs)
+        self.min_title_strength = min_title_strength
+        self.backfill_limit = backfill_limit
+        self.idle_sleep = idle_sleep
+        self.rules = rules or default_evaluator()
+        self.logger = logger or logging.getLogger("wigg.reddit_seed.daemon")
+        self._saved: Dict[str, Optional[StreamCheckpoint]] = {name: checkpoints.get(self._key(name)) for name in self.STREAMS}
+        self._pending: Dict[str, StreamCheckpoint] = {}
+        self._titles: Dict[str, str] = {}
+        self.stats: Dict[str, int] = {"seen": 0, "skipped_checkpoint": 0, "prefiltered": 0, "off_topic": 0, "candidates": 0, "flushes": 0}
+
+    def _key(self, stream: str) -> str:
+        return f"{self.subreddit_name}:{stream}"
+
+    def run(self, *, max_cycles: Optional[int] = None) -> Dict[str, int]:
+        sr = self.reddit.subreddit(self.subreddit_name)
+        self.backfill(sr)
+        streams = self._open_streams(sr)
+        cycles = 0
+        try:
+            while max_cycles is None or cycles < max_cycles:
+                cycles += 1
+                handled = 0
+                try:
+                    for name, stream in streams.items():
+                        for item in stream:
+                            if item is None:
+                                break
+                            self.handle(name, item)
+                            handled += 1
+                except Exception as exc:
+                    # Reopened streams replay recent items; the checkpoints filter those out.
+                    self.logger.warning("[Daemon] stream error: %s; reconnecting in %.0fs", exc, self.idle_sleep)
+                    time.sleep(self.idle_sleep)
+                    streams = self._open_streams(sr)
+                    continue
+                if self.buffer.due():
+                    self.flush()
+                if not handled and (max_cycles is None or cycles < max_cycles):
+                    time.sleep(self.idle_sleep)
+        except KeyboardInterrupt:
+            self.logger.info("[Daemon] interrupted; flushing %d buffered candidates", len(self.buffer))
+        finally:
+            self.flush()
+        return self.stats
+
+    @staticmethod
+    def _open_streams(sr) -> Dict[str, Iterable]:
+        return {
+            "submissions": sr.stream.submissions(pause_after=0, skip_existing=False),
+            "comments": sr.stream.comments(pause_after=0, skip_existing=False),
+        }
+
+    def backfill(self, sr) -> None:
+        listings = {"submissions": sr.new, "comments": sr.comments}
+        for name, listing in listings.items():
+            saved = self._saved[name]
+            if saved is None:
+                continue
+            missed = []
+            for item in listing(limit=self.backfill_limit):
+                if saved.covers(float(getattr(item, 'created_utc', 0) or 0), str(getattr(item, 'id', ''))):
+                    break
+                missed.append(item)
+            if len(missed) >= self.backfill_limit:
+                self.logger.warning("[Daemon] %s backfill hit the %d item listing cap; older items may be missing", name, self.backfill_limit)
+            for item in reversed(missed):
+                self.handle(name, item)
+
+    def handle(self, stream: str, item) -> None:
+        created = float(getattr(item, 'created_utc', 0) or 0)
+        item_id = str(getattr(item, 'id', ''))
+        self.stats["seen"] += 1
+        saved = self._saved.get(stream)
+        pending = self._pending.get(stream)
+        if (saved is not None and saved.covers(created, item_id)) or (pending is not None and pending.covers(created, item_id)):
+            self.stats["skipped_checkpoint"] += 1
+            return
+        self._advance(stream, created, item_id)
+
+        if stream == "submissions":
+            title: Optional[str] = getattr(item, 'title', '') or ''
+            text = f"{title}\n{getattr(item, 'selftext', '') or ''}"
+            bonus = 0.0
+        else:
+            title = None
+            text = getattr(item, 'body', '') or ''
+            bonus = comment_score_bonus(getattr(item, 'score', 0))
+        doc = self.rules.document(text)
+        if not self.rules.passes_prefilter(doc):
+            self.stats["prefiltered"] += 1
+            return
+        if title is None:
+            title = self._submission_title(item)
+        content_title = normalize_show_title(title)
+        if not content_title or title_match_strength(title) < self.min_title_strength:
+            self.stats["off_topic"] += 1
+            return
+        for (s, e, minute, conf, quote, ruleset) in self.rules.extract(doc):
+            self.buffer.add(build_candidate(content_title, s, e, minute, min(0.95, conf + bonus), item, quote, ruleset))
+            self.stats["candidates"] += 1
+
+    def flush(self) -> None:
+        if len(self.buffer):
+            # A failed write raises here, before any pending checkpoint is saved.
+            self.buffer.flush()
+            self.stats["flushes"] += 1
+        for stream, checkpoint in self._pending.items():
+            self.checkpoints.save(self._key(stream), checkpoint)
+            self._saved[stream] = checkpoint
+        self._pending = {}
+
+    def _advance(self, stream: str, created: float, item_id: str) -> None:
+        current = self._pending.get(stream) or self._saved.get(stream)
+        self._pending[stream] = StreamCheckpoint(created, (item_id,)) if current is None else current.advanced(created, item_id)
+
+    def _submission_title(self, comment) -> str:
+        link_id = str(getattr(comment, 'link_id', '') or '')
+        if link_id not in self._titles:
+            if len(self._titles) >= 10000:
+                self._titles.clear()
+            self._titles[link_id] = getattr(getattr(comment, 'submission', None), 'title', '') or ''
+        return self._titles[link_id]
+
+
+# ----------------------------- Dump reprocessing -----------------------
+@dataclass
+class DumpSliceResult:
+    records: int = 0  # lines walked
+    matched: int = 0  # records in the selected partitions
+    untitled: int = 0  # comments whose submission was not in this or an earlier dump
+    malformed: int = 0
+    candidates: List[CandidateMoment] = field(default_factory=list)
+    titles: Dict[str, str] = field(default_factory=dict)  # submission id -> show title
+    rule_counts: Optional[RuleCounts] = None
+
+
+def dump_permalink(record: Dict[str, Any], subreddit: str, link_id: str) -> str:
+    """The record's permalink; older dumps leave it out for comments."""
+    permalink = record.get("permalink")
+    if permalink:
+        return str(permalink)
+    if link_id:
+        return f"/r/{subreddit}/comments/{link_id}/_/{record.get('id', '')}/"
+    return f"/r/{subreddit}/comments/{record.get('id', '')}/"
+
+
+def process_dump_slice(
+    dump: DumpSlice,
+    rules: RulesetEvaluator,
+    *,
+    subreddits: Sequence[str] = (),
+    months: Sequence[str] = (),
+    titles: Optional[Dict[str, str]] = None,
+) -> DumpSliceResult:
+    """Extract candidates from one slice of a dump, reading lines as memoryviews into the mapping."""
+    import mmap
+
+    result = DumpSliceResult()
+    codec = json_codec()
+    wanted_subs = {dump_subreddit(s) for s in subreddits}
+    wanted_months = set(months)
+    titles = titles or {}
+    found_before = rules.counts()
+    with open(dump.path, "rb") as fh, mmap.mmap(fh.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+        view = memoryview(mm)
+        try:
+            pos = dump.start
+            while pos < dump.end:
+                nl = mm.find(b"\n", pos, dump.end)
+                stop = dump.end if nl < 0 else nl
+                if stop > pos:
+                    result.records += 1
+                    try:
+                        record = codec.loads(view[pos:stop])
+                    except ValueError:
+                        result.malformed += 1
+                        record = None
+                    if isinstance(record, dict):
+                        _dump_record_candidates(record, rules, result, titles, wanted_subs, wanted_months)
+                pos = stop + 1
+        finally:
+            view.release()
+    result.rule_counts = rules.counts_since(found_before)
+    return result
+
+
+def _dump_record_candidates(
+    record: Dict[str, Any],
+    rules: RulesetEvaluator,
+    result: DumpSliceResult,
+    titles: Dict[str, str],
+    subreddits: set,
+    months: set,
+) -> None:
+    subreddit = str(record.get("subreddit") or "")
+    if subreddits and dump_subreddit(subreddit) not in subreddits:
+        return
+    created = int(float(record.get("created_utc") or 0))
+    if months and dump_month(created) not in months:
+        return
+    result.matched += 1
+    record_id = str(record.get("id") or "")
+    score = int(record.get("score") or 0)
+    if "title" in record:
+        kind, link_id = "submission", ""
+        title = str(record.get("title") or "")
+        content_title = normalize_show_title(title)
+        if not content_title:
+            return
+        result.titles[record_id] = content_title
+        text = f"{title}\n{record.get('selftext') or ''}"
+        bonus = 0.0
+    else:
+        kind = "comment"
+        link_id = str(record.get("link_id") or "").replace("t3_", "")
+        content_title = result.titles.get(link_id) or titles.get(link_id) or ""
+        if not content_title:
+            result.untitled += 1
+            return
+        text = str(record.get("body") or "")
+        bonus = comment_score_bonus(score)
+    doc = rules.document(text)
+    if not rules.passes_prefilter(doc):
+        return
+    src = SimpleNamespace(
+        id=record_id, subreddit=subreddit, score=score, created_utc=created, permalink=dump_permalink(record, subreddit, link_id)
+    )
+    for (s, e, minute, conf, quote, ruleset) in rules.extract(doc):
+        result.candidates.append(build_candidate(content_title, s, e, minute, min(0.95, conf + bonus), src, quote, ruleset, kind))
+
+
+_DUMP_WORKER: Dict[str, Any] = {}
+
+
+def _init_dump_worker(codec: str, rule_specs: Sequence[str], options: Dict[str, Any]) -> None:
+    install_codec(make_codec(codec))
+    _DUMP_WORKER["rules"] = RulesetEvaluator([load_ruleset(spec) for spec in rule_specs])
+    _DUMP_WORKER["options"] = options
+
+
+def _dump_worker_slice(dump: DumpSlice) -> DumpSliceResult:
+    return process_dump_slice(dump, _DUMP_WORKER["rules"], **_DUMP_WORKER["options"])
+
+
+@dataclass
+class DumpStats:
+    files: int = 0
+    slices: int = 0
+    bytes_read: int = 0
+    bytes_total: int = 0
+    records: int = 0
+    matched: int = 0
+    untitled: int = 0
+    malformed: int = 0
+    candidates: int = 0
+    inserted: int = 0
+    updated: int = 0
+
+
+def reprocess_dumps(
+    paths: Sequence[str],
+    writer: SupabaseWriter,
+    *,
+    rule_specs: Sequence[str] = ("default",),
+    subreddits: Sequence[str] = (),
+    months: Sequence[str] = (),
+    workers: int = 1,
+    batch_size: int = 500,
+    stride: int = DUMP_STRIDE,
+    rebuild_index: bool = False,
+    rules: Optional[RulesetEvaluator] = None,
+    logger: logging.Logger = logger,
+) -> DumpStats:
+    """Re-run extraction over local dumps, reading only the selected partitions."""
+    for month in months:
+        if not DUMP_MONTH_RX.match(month):
+            raise SystemExit(f"Dump months must look like 2023-01, got {month!r}")
+    stats = DumpStats()
+    titles: Dict[str, str] = {}
+    buffer = CandidateBuffer(writer, max_rows=batch_size, flush_interval=float("inf"))
+
+    def write(result: UpsertResult) -> None:
+        stats.inserted += result.inserted
+        stats.updated += result.updated
+
+    for path in paths:
+        index = DumpIndex.open(path, stride=stride, rebuild=rebuild_index)
+        try:
+            slices = index.slices(subreddits=subreddits, months=months, shards=max(1, workers))
+            size = int(index.meta()["size"])
+        finally:
+            index.close()
+        read = sum(s.end - s.start for s in slices)
+        logger.info("[Dump] %s: %d slices cover %s of %s", path, len(slices), format_bytes(read), format_bytes(size))
+        stats.files += 1
+        stats.slices += len(slices)
+        stats.bytes_read += read
+        stats.bytes_total += size
+        options = {"subreddits": tuple(subreddits), "months": tuple(months), "titles": titles}
+
+        if workers <= 1 or len(slices) <= 1:
+            evaluator = RulesetEvaluator([load_ruleset(spec) for spec in rule_specs])
+            results: Iterable[DumpSliceResult] = (process_dump_slice(s, evaluator, **options) for s in slices)
+            pool = None
+        else:
+            from concurrent.futures import ProcessPoolExecutor
+
+            pool = ProcessPoolExecutor(
+                max_workers=min(workers, len(slices)),
+                initializer=_init_dump_worker,
+                initargs=(json_codec().name, tuple(rule_specs), options),
+            )
+            results = pool.map(_dump_worker_slice, slices)
+        try:
+            file_titles: Dict[str, str] = {}
+            for result in results:
+                stats.records += result.records
+                stats.matched += result.matched
+                stats.untitled += result.untitled
+                stats.malformed += result.malformed
+                stats.candidates += len(result.candidates)
+                file_titles.update(result.titles)
+                if rules is not None and result.rule_counts is not None:
+                    rules.add_counts(result.rule_counts)
+                for candidate in result.candidates:
+                    buffer.add(candidate)
+                    if buffer.due():
+                        write(buffer.flush())
+            titles.update(file_titles)
+        finally:
+            if pool is not None:
+                pool.shutdown()
+    write(buffer.flush())
+    logger.info(
+        "[Dump] files=%d slices=%d read=%s/%s records=%d matched=%d untitled=%d malformed=%d candidates=%d inserted=%d updated=%d",
+        stats.files,
+        stats.slices,
+        format_bytes(stats.bytes_read),
+        format_bytes(stats.bytes_total),
+        stats.records,
+        stats.matched,
+        stats.untitled,
+        stats.malformed,
+        stats.candidates,
+        stats.inserted,
+        stats.updated,
+    )
+    return stats
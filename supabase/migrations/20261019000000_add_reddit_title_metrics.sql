@@ -0,0 +1,25 @@
+-- Per-title "gets good" metrics derived from Reddit seed moments.
+-- Maintained incrementally by scripts/wigg_reddit_seed.py (--aggregates), which
+-- upserts only titles whose aggregates changed; nothing recomputes the table.
+create table if not exists public.reddit_title_metrics (
+  content_title text primary key,
+  mentions integer not null default 0,
+  comment_mentions integer not null default 0,
+  post_mentions integer not null default 0,
+  episode_p25 text,
+  episode_median text,
+  episode_p75 text,
+  peak_episode text,
+  minute_median numeric,
+  minute_iqr numeric,
+  episode_histogram jsonb,
+  minute_histogram jsonb,
+  updated_at timestamptz default now()
+);
+
+alter table public.reddit_title_metrics enable row level security;
+
+-- Public can read aggregated metrics (drop-and-create for idempotency)
+drop policy if exists reddit_title_metrics_read on public.reddit_title_metrics;
+create policy reddit_title_metrics_read on public.reddit_title_metrics
+  for select using (true);
@@ -0,0 +1,79 @@
+-- Read-only helpers for scripts/wigg_reddit_seed.py --index-check / --index-probe.
+-- wigg_index_health lists the indexes on a public table with validity and size;
+-- wigg_explain_lookup runs EXPLAIN ANALYZE on an equality lookup so the seeder
+-- can time the conflict-key lookup behind its upserts at startup.
+create or replace function public.wigg_index_health(p_table text)
+returns table (
+  index_name text,
+  columns text[],
+  is_unique boolean,
+  is_primary boolean,
+  is_valid boolean,
+  is_ready boolean,
+  is_partial boolean,
+  size_bytes bigint,
+  scans bigint,
+  definition text
+)
+language sql
+stable
+security definer
+set search_path = pg_catalog, public
+as $$
+  select
+    ic.relname::text,
+    array(
+      select a.attname::text
+      from unnest(i.indkey) with ordinality as k(attnum, ord)
+      join pg_attribute a on a.attrelid = i.indrelid and a.attnum = k.attnum
+      order by k.ord
+    ),
+    i.indisunique,
+    i.indisprimary,
+    i.indisvalid,
+    i.indisready,
+    i.indpred is not null,
+    pg_relation_size(i.indexrelid),
+    coalesce(s.idx_scan, 0),
+    pg_get_indexdef(i.indexrelid)
+  from pg_index i
+  join pg_class ic on ic.oid = i.indexrelid
+  join pg_class tc on tc.oid = i.indrelid
+  join pg_namespace n on n.oid = tc.relnamespace
+  left join pg_stat_user_indexes s on s.indexrelid = i.indexrelid
+  where n.nspname = 'public' and tc.relname = p_table
+  order by ic.relname;
+$$;
+
+-- p_filters is a flat {column: value} object; values are compared as literals.
+create or replace function public.wigg_explain_lookup(p_table text, p_filters jsonb)
+returns jsonb
+language plpgsql
+volatile
+security definer
+set search_path = pg_catalog, public
+as $$
+declare
+  v_where text;
+  v_plan jsonb;
+begin
+  select string_agg(
+           case when value is null then format('%I is null', key) else format('%I = %L', key, value) end,
+           ' and '
+         )
+    into v_where
+    from jsonb_each_text(p_filters);
+  execute format(
+    'explain (analyze, format json) select 1 from public.%I where %s',
+    p_table,
+    coalesce(v_where, 'true')
+  ) into v_plan;
+  return v_plan;
+end;
+$$;
+
+-- Service role only: these expose catalog details and run arbitrary lookups.
+revoke all on function public.wigg_index_health(text) from public, anon, authenticated;
+revoke all on function public.wigg_explain_lookup(text, jsonb) from public, anon, authenticated;
+grant execute on function public.wigg_index_health(text) to service_role;
+grant execute on function public.wigg_explain_lookup(text, jsonb) to service_role;